@@ -2,10 +2,18 @@ import sys
 
 import click
 
-from superduperdb.cli import app, config, info
+from superduperdb.cli import app, benchmark, config, info
 from superduperdb.cli.serve import cdc, local_cluster, ray_serve, vector_search
 
-__all__ = 'config', 'info', 'local_cluster', 'vector_search', 'cdc', 'ray_serve'
+__all__ = (
+    'benchmark',
+    'config',
+    'info',
+    'local_cluster',
+    'vector_search',
+    'cdc',
+    'ray_serve',
+)
 
 
 def run():
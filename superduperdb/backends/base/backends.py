@@ -8,6 +8,7 @@ from superduperdb.backends.mongodb.data_backend import MongoDataBackend
 from superduperdb.backends.mongodb.metadata import MongoMetaDataStore
 from superduperdb.backends.sqlalchemy.metadata import SQLAlchemyMetadata
 from superduperdb.vector_search.atlas import MongoAtlasVectorSearcher
+from superduperdb.vector_search.hnsw import HnswVectorSearcher
 from superduperdb.vector_search.in_memory import InMemoryVectorSearcher
 from superduperdb.vector_search.lance import LanceVectorSearcher
 
@@ -29,6 +30,7 @@ metadata_stores = {
 vector_searcher_implementations = {
     'lance': LanceVectorSearcher,
     'in_memory': InMemoryVectorSearcher,
+    'hnsw': HnswVectorSearcher,
     'mongodb+srv': MongoAtlasVectorSearcher,
 }
 
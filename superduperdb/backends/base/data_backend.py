@@ -80,6 +80,19 @@ class BaseDataBackend(ABC):
         """
         raise NotImplementedError
 
+    def select_ids_of_outputs_since(self, predict_id: str, since: t.Any):
+        """Select the ids of the documents whose outputs were written since.
+
+        Raises ``NotImplementedError`` if the data backend does not record
+        when outputs are written.
+
+        :param predict_id: The predict_id of the outputs
+        :param since: Only select outputs written after this time
+        """
+        raise NotImplementedError(
+            f'{type(self).__name__} does not record when outputs are written'
+        )
+
     @abstractmethod
     def drop(self, force: bool = False):
         """Drop the databackend.
@@ -0,0 +1,90 @@
+import dataclasses as dc
+import math
+import typing as t
+
+FILTER_THEN_SEARCH = 'filter_then_search'
+SEARCH_THEN_FILTER = 'search_then_filter'
+
+
+@dc.dataclass
+class LikePlan:
+    """How a ``like`` restricted by a filter is executed.
+
+    With ``filter_then_search`` the ids matching the filter are read from
+    the database, in batches of ``batch_size``, and each batch is searched.
+    With ``search_then_filter`` the best ``candidates`` of the vector index
+    are read first and filtered in the database, doubling ``candidates``
+    until ``n`` of them match the filter.
+
+    :param strategy: ``filter_then_search`` or ``search_then_filter``
+    :param n: Number of results of the ``like``, ``None`` for all results
+              within its threshold
+    :param matches: (Estimated) number of documents matching the filter,
+                    ``None`` if unknown
+    :param total: (Estimated) number of documents
+    :param exact: Whether ``matches`` was counted rather than sampled
+    :param batch_size: Number of ids searched within at a time
+    :param candidates: Number of results first read from the vector index
+    """
+
+    strategy: str
+    n: t.Optional[int]
+    matches: t.Optional[int] = None
+    total: t.Optional[int] = None
+    exact: bool = False
+    batch_size: int = 10_000
+    candidates: int = 0
+
+    @property
+    def selectivity(self) -> t.Optional[float]:
+        """Estimated fraction of the documents matching the filter."""
+        if self.matches is None or not self.total:
+            return None
+        return min(self.matches / self.total, 1.0)
+
+
+def plan_like(
+    n: t.Optional[int],
+    matches: t.Optional[int],
+    total: t.Optional[int],
+    exact: bool = False,
+    max_ids: int = 10_000,
+    min_selectivity: float = 0.01,
+    overfetch: float = 1.5,
+) -> LikePlan:
+    """Choose how to execute a ``like`` restricted by a filter.
+
+    Filters matching at most ``max_ids`` documents, or too few documents
+    for the vector index to find ``n`` of them among a few times ``n``
+    results, are applied first. Broad filters are applied to the results
+    of the vector index, so that their ids are never read. Range searches
+    without ``n`` apply the filter first.
+
+    :param n: Number of results of the ``like``, ``None`` for all results
+              within its threshold
+    :param matches: (Estimated) number of documents matching the filter,
+                    ``None`` if unknown
+    :param total: (Estimated) number of documents
+    :param exact: Whether ``matches`` was counted rather than sampled
+    :param max_ids: Maximum number of ids searched within at a time
+    :param min_selectivity: Minimum fraction of the documents matching
+                            the filter to search before filtering
+    :param overfetch: Factor applied to the expected number of results to
+                      read to find ``n`` matches
+    """
+    plan = LikePlan(
+        FILTER_THEN_SEARCH,
+        n=n,
+        matches=matches,
+        total=total,
+        exact=exact,
+        batch_size=max_ids,
+    )
+    selectivity = plan.selectivity
+    if n is None or matches is None or total is None or selectivity is None:
+        return plan
+    if matches <= max_ids or selectivity < min_selectivity:
+        return plan
+    plan.strategy = SEARCH_THEN_FILTER
+    plan.candidates = min(total, math.ceil(overfetch * n / selectivity))
+    return plan
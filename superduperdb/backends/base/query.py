@@ -77,7 +77,7 @@ class PredictOne(Predict, Serializable, ABC):
         :param db: The datalayer instance
         """
         m = db.models[self.model]
-        out = m.predict_one(*self.args, **self.kwargs)
+        out = m.predict_one_batched(*self.args, **self.kwargs)
         if isinstance(m.datatype, DataType):
             out = m.datatype(out)
         if isinstance(out, dict):
@@ -320,6 +320,22 @@ class CompoundSelect(_ReprMixin, Select, ABC):
             ),
         )
 
+    def select_missing_outputs(self, predict_id: str):
+        """Query which selects the documents/ rows where outputs are missing.
+
+        :param predict_id: The predict_id of the outputs
+        """
+        assert self.pre_like is None
+        assert self.post_like is None
+        assert self.query_linker is not None
+
+        return self._query_from_parts(
+            table_or_collection=self.table_or_collection,
+            query_linker=self.query_linker._select_missing_outputs(
+                predict_id=predict_id
+            ),
+        )
+
     def select_single_id(self, id: str):
         """
         Query which selects a single id.
@@ -349,6 +365,56 @@ class CompoundSelect(_ReprMixin, Select, ABC):
             query_linker=self.query_linker.select_using_ids(ids),
         )
 
+    def select_ids_page(self, after: t.Any, limit: int):
+        """
+        Query which selects the next page of a query of ids.
+
+        The ids are ordered by the primary id, so that pages are read with
+        range scans of its index rather than with an offset.
+
+        :param after: The last id of the previous page, ``None`` for the first
+        :param limit: The maximum number of ids of the page
+        """
+        assert self.pre_like is None
+        assert self.post_like is None
+        assert self.query_linker is not None
+
+        return self._query_from_parts(
+            table_or_collection=self.table_or_collection,
+            query_linker=self.query_linker.select_ids_page(after, limit),
+        )
+
+    def select_using_id_range(self, first: t.Any, last: t.Any):
+        """
+        Subset a query to the ids between ``first`` and ``last``, inclusive.
+
+        :param first: The first id of the range
+        :param last: The last id of the range
+        """
+        assert self.pre_like is None
+        assert self.post_like is None
+        assert self.query_linker is not None
+
+        return self._query_from_parts(
+            table_or_collection=self.table_or_collection,
+            query_linker=self.query_linker.select_using_id_range(first, last),
+        )
+
+    def select_ids_of_outputs(self, predict_id: str):
+        """
+        Query which selects the ids of documents with outputs.
+
+        :param predict_id: The predict_id of the outputs
+        """
+        assert self.pre_like is None
+        assert self.post_like is None
+        assert self.query_linker is not None
+
+        return self._query_from_parts(
+            table_or_collection=self.table_or_collection,
+            query_linker=self.query_linker.select_ids_of_outputs(predict_id),
+        )
+
     def repr_(self):
         """String representation of the query."""
         components = []
@@ -427,12 +493,28 @@ class CompoundSelect(_ReprMixin, Select, ABC):
         :param load_hybrid: Whether to load hybrid fields
         """
 
-    def like(self, r: Document, vector_index: str, n: int = 10):
+    def like(
+        self,
+        r: Document,
+        vector_index: t.Union[str, t.List[str]],
+        n: t.Optional[int] = 10,
+        min_score: t.Optional[float] = None,
+        max_distance: t.Optional[float] = None,
+        fusion: t.Optional[str] = None,
+        weights: t.Optional[t.List[float]] = None,
+    ):
         """Return a query that performs a vector search.
 
         :param r: The document to search for
-        :param vector_index: The vector index to use
-        :param n: The number of results to return
+        :param vector_index: The vector index to use, or several vector
+                             indices whose results are merged
+        :param n: The number of results to return, all results within the
+                  threshold if ``None``
+        :param min_score: The minimum score of the results
+        :param max_distance: The maximum distance of the results
+        :param fusion: How the results of several vector indices are merged,
+                       ``rrf`` (default) or ``weighted_sum``
+        :param weights: The weight of each of several vector indices
         """
         assert self.query_linker is not None
         assert self.pre_like is None
@@ -440,7 +522,15 @@ class CompoundSelect(_ReprMixin, Select, ABC):
             table_or_collection=self.table_or_collection,
             pre_like=None,
             query_linker=self.query_linker,
-            post_like=Like(r=r, n=n, vector_index=vector_index),
+            post_like=Like(
+                r=r,
+                n=n,
+                vector_index=vector_index,
+                min_score=min_score,
+                max_distance=max_distance,
+                fusion=fusion,
+                weights=weights,
+            ),
         )
 
 
@@ -709,6 +799,32 @@ class QueryLinker(_ReprMixin, Serializable, ABC):
         """
         pass
 
+    @abstractmethod
+    def select_ids_page(self, after, limit):
+        """Return a query that selects the next page of ids, in order.
+
+        :param after: The last id of the previous page, ``None`` for the first
+        :param limit: The maximum number of ids of the page
+        """
+        pass
+
+    @abstractmethod
+    def select_using_id_range(self, first, last):
+        """Return a query that selects the ids from ``first`` to ``last``.
+
+        :param first: The first id of the range
+        :param last: The last id of the range
+        """
+        pass
+
+    @abstractmethod
+    def select_ids_of_outputs(self, predict_id):
+        """Return a query that selects the ids of documents with outputs.
+
+        :param predict_id: The predict_id of the outputs
+        """
+        pass
+
     def __call__(self, *args, **kwargs):
         """Add a query to the query chain."""
         members = [*self.members[:-1], self.members[-1](*args, **kwargs)]
@@ -729,14 +845,25 @@ class Like(Serializable):
     Base class for all like (vector-search) queries.
 
     :param r: The item to be converted to a vector, to search with.
-    :param vector_index: The vector index to use
-    :param n: The number of results to return
+    :param vector_index: The vector index to use, or several vector indices
+                         whose results are merged
+    :param n: The number of results to return, all results within the
+              threshold if ``None``
+    :param min_score: The minimum score of the results
+    :param max_distance: The maximum distance of the results
+    :param fusion: How the results of several vector indices are merged,
+                   ``rrf`` or ``weighted_sum``
+    :param weights: The weight of each of several vector indices
     :param _deep_flat_encode: The method to encode the query
     """
 
     r: t.Union[t.Dict, Document]
-    vector_index: str
-    n: int = 10
+    vector_index: t.Union[str, t.List[str]]
+    n: t.Optional[int] = 10
+    min_score: t.Optional[float] = None
+    max_distance: t.Optional[float] = None
+    fusion: t.Optional[str] = None
+    weights: t.Optional[t.List[float]] = None
 
     _deep_flat_encode = _deep_flat_encode_impl
 
@@ -746,11 +873,27 @@ class Like(Serializable):
         :param db: The datalayer instance
         :param ids: The ids to search for
         """
+        if not isinstance(self.vector_index, str):
+            if self.n is None or (self.min_score, self.max_distance) != (None, None):
+                raise ValueError(
+                    'Results of several vector indices are merged by rank, '
+                    'n is required and thresholds are not supported'
+                )
+            return db.select_nearest_fused(
+                like=self.r,
+                vector_indices=self.vector_index,
+                ids=ids,
+                n=self.n,
+                fusion=self.fusion or 'rrf',
+                weights=self.weights,
+            )
         return db.select_nearest(
             like=self.r,
             vector_index=self.vector_index,
             ids=ids,
             n=self.n,
+            min_score=self.min_score,
+            max_distance=self.max_distance,
         )
 
 
@@ -826,8 +969,12 @@ class TableOrCollection(Serializable, ABC):
     def like(
         self,
         r: Document,
-        vector_index: str,
-        n: int = 10,
+        vector_index: t.Union[str, t.List[str]],
+        n: t.Optional[int] = 10,
+        min_score: t.Optional[float] = None,
+        max_distance: t.Optional[float] = None,
+        fusion: t.Optional[str] = None,
+        weights: t.Optional[t.List[float]] = None,
     ):
         """Return a query that performs a vector search.
 
@@ -835,14 +982,25 @@ class TableOrCollection(Serializable, ABC):
         for performing a vector search on the parent query chain inputs.
 
         :param r: The vector to search for
-        :param vector_index: The vector index to use
-        :param n: The number of results to return
+        :param vector_index: The vector index to use, or several vector
+                             indices whose results are merged
+        :param n: The number of results to return, all results within the
+                  threshold if ``None``
+        :param min_score: The minimum score of the results
+        :param max_distance: The maximum distance of the results
+        :param fusion: How the results of several vector indices are merged,
+                       ``rrf`` (default) or ``weighted_sum``
+        :param weights: The weight of each of several vector indices
         """
         return self._get_query(
             pre_like=Like(
                 r=r,
                 n=n,
                 vector_index=vector_index,
+                min_score=min_score,
+                max_distance=max_distance,
+                fusion=fusion,
+                weights=weights,
             ),
         )
 
@@ -281,7 +281,10 @@ class IbisCompoundSelect(CompoundSelect):
         assert self.pre_like is None
         df = self.query_linker.select_ids.execute(db)
         query_ids = [id[0] for id in df.values.tolist()]
-        similar_ids, similar_scores = self.post_like.execute(db, ids=query_ids)
+        # An empty ``ids`` would search the whole index
+        similar_ids, similar_scores = (
+            self.post_like.execute(db, ids=query_ids) if query_ids else ([], [])
+        )
         similar_scores = dict(zip(similar_ids, similar_scores))
         post_query_linker = self.query_linker.select_using_ids(similar_ids)
         return post_query_linker.execute(db), similar_scores
@@ -551,7 +554,47 @@ class IbisQueryLinker(QueryLinker, _LogicalExprMixin):
             self.__getattr__(self.table_or_collection.primary_id).isin(ids)
         )
 
+    def select_ids_page(self, after, limit: int):
+        """Return a query which selects the next page of ids, in order.
+
+        :param after: The last id of the previous page, ``None`` for the first
+        :param limit: The maximum number of ids of the page
+        """
+        primary_id = self.table_or_collection.primary_id
+        query = self
+        if after is not None:
+            query = query.filter(query.__getattr__(primary_id) > after)
+        return query.order_by(primary_id).limit(limit)
+
+    def select_using_id_range(self, first, last):
+        """Return a query which selects the ids from ``first`` to ``last``.
+
+        :param first: The first id of the range
+        :param last: The last id of the range
+        """
+        return self.filter(
+            self.__getattr__(self.table_or_collection.primary_id).between(first, last)
+        )
+
+    def select_ids_of_outputs(self, predict_id: str):
+        """Return a query which selects the ids of rows with outputs.
+
+        :param predict_id: The predict_id of the outputs
+        """
+        output_table = IbisQueryTable(
+            identifier='_outputs.' + predict_id,
+            primary_id='output_id',
+        )
+        primary_id = self.table_or_collection.primary_id
+        return self.join(
+            output_table, output_table._input_id == self[primary_id]
+        ).select(primary_id)
+
     def _select_ids_of_missing_outputs(self, predict_id: str):
+        return self._select_missing_outputs(predict_id)
+
+    def _select_missing_outputs(self, predict_id: str):
+        # The anti-join keeps the columns of the query
         output_table = IbisQueryTable(
             identifier='_outputs.' + predict_id,
             primary_id='output_id',
@@ -751,16 +794,40 @@ class Table(Component):
             identifier=self.identifier, primary_id=self.primary_id
         ).insert(documents, **kwargs)
 
-    def like(self, r: 'Document', vector_index: str, n: int = 10):
+    def like(
+        self,
+        r: 'Document',
+        vector_index: t.Union[str, t.List[str]],
+        n: t.Optional[int] = 10,
+        min_score: t.Optional[float] = None,
+        max_distance: t.Optional[float] = None,
+        fusion: t.Optional[str] = None,
+        weights: t.Optional[t.List[float]] = None,
+    ):
         """Return a query which finds similar documents to the given document.
 
         :param r: The document to find similar documents to
-        :param vector_index: The vector index to use for the search
-        :param n: The number of similar documents to find
+        :param vector_index: The vector index to use for the search, or
+                             several vector indices whose results are merged
+        :param n: The number of similar documents to find, all documents
+                  within the threshold if ``None``
+        :param min_score: The minimum score of the similar documents
+        :param max_distance: The maximum distance of the similar documents
+        :param fusion: How the results of several vector indices are merged,
+                       ``rrf`` (default) or ``weighted_sum``
+        :param weights: The weight of each of several vector indices
         """
         return IbisQueryTable(
             identifier=self.identifier, primary_id=self.primary_id
-        ).like(r=r, vector_index=vector_index, n=n)
+        ).like(
+            r=r,
+            vector_index=vector_index,
+            n=n,
+            min_score=min_score,
+            max_distance=max_distance,
+            fusion=fusion,
+            weights=weights,
+        )
 
     def outputs(self, *predict_ids):
         """Returns a query which joins a query with the model outputs.
@@ -9,6 +9,7 @@ from superduperdb.backends.base.data_backend import BaseDataBackend
 from superduperdb.backends.ibis.field_types import FieldType
 from superduperdb.backends.mongodb.artifacts import MongoArtifactStore
 from superduperdb.backends.mongodb.metadata import MongoMetaDataStore
+from superduperdb.base.document import _OUTPUTS_TIME_KEY
 from superduperdb.base.enums import DBType
 from superduperdb.base.serializable import Serializable
 from superduperdb.components.datatype import DataType
@@ -108,6 +109,42 @@ class MongoDataBackend(BaseDataBackend):
             is not None
         )
 
+    def set_outputs_time(self, predict_id: str, ids: t.Sequence, written_at):
+        """Record when the outputs of documents were written.
+
+        The times are kept in the ``_outputs_time.<predict_id>`` collection,
+        keyed by the ``_id`` of the documents, out of the documents.
+
+        :param predict_id: The predict_id of the outputs
+        :param ids: The ``_id`` of the documents
+        :param written_at: The time the outputs were written
+        """
+        if not ids:
+            return
+        self.db[f'{_OUTPUTS_TIME_KEY}.{predict_id}'].bulk_write(
+            [
+                pymongo.UpdateOne(
+                    {'_id': id}, {'$set': {'written_at': written_at}}, upsert=True
+                )
+                for id in ids
+            ],
+            ordered=False,
+        )
+
+    def select_ids_of_outputs_since(self, predict_id: str, since):
+        """Select the ids of the documents whose outputs were written since.
+
+        Documents deleted since their outputs were written may be included.
+
+        :param predict_id: The predict_id of the outputs
+        :param since: Only select outputs written after this time
+        """
+        collection = self.db[f'{_OUTPUTS_TIME_KEY}.{predict_id}']
+        return [
+            r['_id']
+            for r in collection.find({'written_at': {'$gt': since}}, {'_id': 1})
+        ]
+
     # TODO: Remove the unused function
     def unset_outputs(self, info: t.Dict):
         """Unset the output field in the data backend.
@@ -1,12 +1,15 @@
 import copy
 import dataclasses as dc
+import datetime
+import heapq
 import typing as t
 
 import mongomock
 import pymongo
-from bson import ObjectId
+from bson import ObjectId, json_util
 
 from superduperdb import CFG, logging
+from superduperdb.backends.base.planner import SEARCH_THEN_FILTER, LikePlan, plan_like
 from superduperdb.backends.base.query import (
     CompoundSelect,
     Delete,
@@ -21,8 +24,9 @@ from superduperdb.backends.base.query import (
     Write,
 )
 from superduperdb.base.cursor import SuperDuperCursor
-from superduperdb.base.document import Document
+from superduperdb.base.document import _OUTPUTS_KEY, Document
 from superduperdb.components.schema import Schema
+from superduperdb.misc.data import ibatch
 from superduperdb.misc.files import load_uris
 
 SCHEMA_KEY = '_schema'
@@ -41,7 +45,7 @@ class FindOne(QueryComponent):
         :param ids: The ids to select
         """
         ids = [ObjectId(id) for id in ids]
-        args = list(self.args)[:]
+        args = copy.deepcopy(list(self.args[:]))
         if not args:
             args = [{}]
         args[0].update({'_id': {'$in': ids}})
@@ -93,15 +97,13 @@ class Find(QueryComponent):
     @property
     def select_ids(self):
         """Select ids."""
-        args = list(self.args)[:]
+        args = copy.deepcopy(list(self.args[:]))
         if not args:
             args = [{}]
-        else:
-            args = list(self.args)
         if not args[1:]:
             args.append({})
 
-        args[1].update({'_id': 1})
+        args[1] = {'_id': 1}
         return Find(
             name=self.name,
             type=self.type,
@@ -137,7 +139,7 @@ class Find(QueryComponent):
         :param ids: The ids to select
         """
         ids = [ObjectId(id) for id in ids]
-        args = list(self.args)[:]
+        args = copy.deepcopy(list(self.args[:]))
         if not args:
             args = [{}]
         args[0].update({'_id': {'$in': ids}})
@@ -148,8 +150,39 @@ class Find(QueryComponent):
             kwargs=self.kwargs,
         )
 
-    def select_ids_of_missing_outputs(self, predict_id: str):
-        """Select ids of missing outputs.
+    def select_ids_page(self, after, limit: int):
+        """Select the next page of ids, ordered by ``_id``.
+
+        :param after: The last ``_id`` of the previous page, ``None`` for the first
+        :param limit: The maximum number of ids of the page
+        """
+        args = copy.deepcopy(list(self.args[:]))
+        if not args:
+            args = [{}]
+        if after is not None:
+            args[0] = {'$and': [args[0], {'_id': {'$gt': after}}]}
+        return Find(
+            name=self.name,
+            type=self.type,
+            args=args,
+            kwargs={**self.kwargs, 'sort': [('_id', 1)], 'limit': limit},
+        )
+
+    def select_ids_of_outputs(self, predict_id: str):
+        """Select ids of documents with outputs.
+
+        :param predict_id: The predict id of the outputs
+        """
+        condition = {f'{_OUTPUTS_KEY}.{predict_id}': {'$exists': 1}}
+        args = copy.deepcopy(list(self.args[:]))
+        args[:1] = [{'$and': [args[0], condition]} if args else condition]
+        if len(args) == 1:
+            args.append({})
+        args[1] = {'_id': 1}
+        return Find(name=self.name, type=self.type, args=args, kwargs=self.kwargs)
+
+    def select_missing_outputs(self, predict_id: str):
+        """Select documents with missing outputs.
 
         :param predict_id: The predict id to select
         """
@@ -167,6 +200,20 @@ class Find(QueryComponent):
         else:
             args = [{f'_outputs.{predict_id}': {'$exists': 0}}]
 
+        return Find(
+            name='find',
+            type=QueryType.QUERY,
+            args=args,
+            kwargs=self.kwargs,
+        )
+
+    def select_ids_of_missing_outputs(self, predict_id: str):
+        """Select ids of missing outputs.
+
+        :param predict_id: The predict id to select
+        """
+        query = self.select_missing_outputs(predict_id)
+        args = list(query.args)
         if len(args) == 1:
             args.append({})
 
@@ -179,6 +226,23 @@ class Find(QueryComponent):
             kwargs=self.kwargs,
         )
 
+    def select_using_id_range(self, first, last):
+        """Select documents with ids from ``first`` to ``last``, inclusive.
+
+        :param first: The first ``_id`` of the range
+        :param last: The last ``_id`` of the range
+        """
+        args = copy.deepcopy(list(self.args[:]))
+        if not args:
+            args = [{}]
+        args[0] = {'$and': [args[0], {'_id': {'$gte': first, '$lte': last}}]}
+        return Find(
+            name=self.name,
+            type=self.type,
+            args=args,
+            kwargs=self.kwargs,
+        )
+
     def select_single_id(self, id):
         """Select a single document by id.
 
@@ -414,14 +478,127 @@ class MongoCompoundSelect(CompoundSelect):
             return query_linker.execute(db), similar_scores
 
         assert self.pre_like is None
-        cursor = query_linker.select_ids.execute(db)
-        query_ids = [str(document[self.primary_id]) for document in cursor]
-        similar_ids, similar_scores = self.post_like.execute(db, ids=query_ids)
-        similar_scores = dict(zip(similar_ids, similar_scores))
+        assert query_linker is not None
+        plan = self.plan(db)
+        logging.info(f'Executing like on {self.post_like.vector_index} with {plan}')
+        if plan.strategy == SEARCH_THEN_FILTER:
+            ranked = self._search_then_filter(db, plan, self.post_like, query_linker)
+        else:
+            ranked = self._filter_then_search(db, plan, self.post_like, query_linker)
+        similar_ids = [_id for _id, _ in ranked]
+        similar_scores = dict(ranked)
 
-        post_query_linker = self.query_linker.select_using_ids(similar_ids)
+        post_query_linker = query_linker.select_using_ids(similar_ids)
         return post_query_linker.execute(db), similar_scores
 
+    def plan(self, db) -> LikePlan:
+        """Choose how to execute the ``like`` of a ``find(...).like(...)`` query.
+
+        The documents matching the filter are counted up to
+        ``like_max_ids``, and their number is estimated from a sample
+        beyond that. The counts are cached for ``like_estimate_ttl``
+        seconds, by collection and filter. Filters of queries other than a
+        single ``find`` are applied first.
+
+        :param db: The datalayer instance
+        """
+        assert self.post_like is not None
+        cfg = CFG.cluster.vector_search
+        n = self.post_like.n
+        members = self.query_linker.members if self.query_linker else []
+        if len(members) != 1 or members[0].name != 'find':
+            return plan_like(n, None, None, max_ids=cfg.like_max_ids)
+        if not isinstance(self.post_like.vector_index, str):
+            # Merged results of several vector indices are not ranked by score
+            return plan_like(n, None, None, max_ids=cfg.like_max_ids)
+
+        filter = members[0].args[0] if members[0].args else {}
+        key = (self.table_or_collection.identifier, json_util.dumps(filter))
+        estimate = db.like_estimate_cache.get(key)
+        if estimate is None:
+            estimate = self._estimate_matches(db, filter)
+            db.like_estimate_cache.put(key, estimate)
+        matches, total, exact = estimate
+        return plan_like(
+            n,
+            matches,
+            total,
+            exact=exact,
+            max_ids=cfg.like_max_ids,
+            min_selectivity=cfg.like_min_selectivity,
+        )
+
+    def _estimate_matches(self, db, filter: t.Dict) -> t.Tuple[int, int, bool]:
+        # Number of documents matching ``filter``, number of documents and
+        # whether the first is exact
+        cfg = CFG.cluster.vector_search
+        collection = db.databackend.get_table_or_collection(
+            self.table_or_collection.identifier
+        )
+        total = collection.estimated_document_count()
+        matches = collection.count_documents(filter, limit=cfg.like_max_ids + 1)
+        exact = matches <= cfg.like_max_ids
+        if not exact:
+            sampled = min(cfg.like_sample_size, total)
+            counts = list(
+                collection.aggregate(
+                    [
+                        {'$sample': {'size': sampled}},
+                        {'$match': filter},
+                        {'$count': 'n'},
+                    ]
+                )
+            )
+            estimate = round(total * counts[0]['n'] / sampled) if counts else 0
+            matches = max(matches, estimate)
+        return matches, total, exact
+
+    def _filter_then_search(
+        self, db, plan: LikePlan, like: Like, query_linker: QueryLinker
+    ):
+        cursor = query_linker.select_ids.execute(db)
+        ids = (str(document[self.primary_id]) for document in cursor)
+        ranked: t.List[t.Tuple[str, float]] = []
+        # An empty ``ids`` would search the whole index, so that empty
+        # batches are never searched
+        for batch in ibatch(ids, plan.batch_size):
+            ranked.extend(zip(*like.execute(db, ids=batch)))
+        if plan.n is None:
+            return sorted(ranked, key=lambda x: -x[1])
+        return heapq.nlargest(plan.n, ranked, key=lambda x: x[1])
+
+    def _search_then_filter(
+        self, db, plan: LikePlan, like: Like, query_linker: QueryLinker
+    ):
+        n = plan.n
+        if n is None:
+            # Range searches have no number of results to stop at
+            return self._filter_then_search(db, plan, like, query_linker)
+        k = plan.candidates
+        seen: t.Set[str] = set()
+        ranked: t.List[t.Tuple[str, float]] = []
+        while True:
+            ids, scores = db.select_nearest(
+                like=like.r,
+                vector_index=like.vector_index,
+                n=k,
+                min_score=like.min_score,
+                max_distance=like.max_distance,
+            )
+            # Results are ranked, so that the new candidates score lower
+            # than those of the previous rounds
+            new = [(_id, score) for _id, score in zip(ids, scores) if _id not in seen]
+            seen.update(_id for _id, _ in new)
+            if new:
+                select_ids = query_linker.select_ids.select_using_ids(
+                    [_id for _id, _ in new]
+                )
+                found = {str(r[self.primary_id]) for r in select_ids.execute(db)}
+                ranked.extend((_id, score) for _id, score in new if _id in found)
+            if len(ranked) >= n or len(ids) < k:
+                return ranked[:n]
+            k *= 2
+
     def execute(self, db, reference=False):
         """Execute the query.
 
@@ -555,6 +732,42 @@ class MongoQueryLinker(QueryLinker):
             members=new_members,
         )
 
+    def select_ids_page(self, after, limit: int):
+        """Select the next page of ids, ordered by ``_id``.
+
+        :param after: The last ``_id`` of the previous page, ``None`` for the first
+        :param limit: The maximum number of ids of the page
+        """
+        return self._map_members('select_ids_page', after, limit)
+
+    def select_using_id_range(self, first, last):
+        """Select documents with ids from ``first`` to ``last``, inclusive.
+
+        :param first: The first ``_id`` of the range
+        :param last: The last ``_id`` of the range
+        """
+        return self._map_members('select_using_id_range', first, last)
+
+    def select_ids_of_outputs(self, predict_id: str):
+        """Select ids of documents with outputs.
+
+        :param predict_id: The predict id of the outputs
+        """
+        return self._map_members('select_ids_of_outputs', predict_id)
+
+    def _map_members(self, method: str, *args):
+        if len(self.members) != 1 or not isinstance(self.members[0], Find):
+            raise NotImplementedError(
+                f'{method} is only supported for queries with a single find'
+            )
+        return MongoQueryLinker(
+            table_or_collection=self.table_or_collection,
+            members=[getattr(self.members[0], method)(*args)],
+        )
+
+    def _select_missing_outputs(self, predict_id: str):
+        return self._map_members('select_missing_outputs', predict_id)
+
     def _select_ids_of_missing_outputs(self, predict_id: str):
         new_members = []
         for member in self.members:
@@ -1097,10 +1310,14 @@ class Collection(TableOrCollection):
                     'Please use `document_embedded = False` option with flatten = True'
                 )
             assert self.collection is not None
+            # Snapshots of vector indices replay the outputs written since
+            written_at = datetime.datetime.now(datetime.timezone.utc)
             bulk_operations = []
             for i, id in enumerate(ids):
                 mongo_filter = {'_id': ObjectId(id)}
-                update = Document({'$set': {f'_outputs.{predict_id}': outputs[i]}})
+                update = Document(
+                    {'$set': {f'{_OUTPUTS_KEY}.{predict_id}': outputs[i]}}
+                )
                 bulk_operations.append(
                     MongoUpdate(
                         filter=mongo_filter,
@@ -1111,6 +1328,9 @@ class Collection(TableOrCollection):
                 )
 
             db.execute(self.bulk_write(bulk_operations))
+            db.databackend.set_outputs_time(
+                predict_id, [ObjectId(id) for id in ids], written_at
+            )
 
         else:
             collection = Collection(f'_outputs.{predict_id}')
@@ -124,11 +124,55 @@ class VectorSearch(BaseConfig):
     :param uri: The URI for the vector search service
     :param type: The type of vector search service
     :param backfill_batch_size: The size of the backfill batch
+    :param snapshot_dir: Directory in which snapshots of ``in_memory``
+                         vector indices are saved and restored from
+    :param wire_format: Encoding of vectors sent to the service
+                        (``binary`` float32 or ``json``)
+    :param shards: Number of local shard worker processes over which
+                   vector indices are partitioned, ``0`` disables sharding
+    :param shard_uris: Addresses (``host:port``) of shard workers started
+                       with ``superduperdb vector-search-shard``
+    :param shard_authkey: Key shared with the shard workers at ``shard_uris``
+    :param query_cache_size: Number of query embeddings of ``like`` queries
+                             which are cached, ``0`` disables the cache
+    :param query_cache_ttl: Seconds after which cached query embeddings
+                            expire, ``None`` for never
+    :param result_cache_size: Number of results of ``like`` queries which
+                              are cached, ``0`` disables the cache
+    :param result_cache_ttl: Seconds after which cached results expire,
+                             ``None`` for never
+    :param like_max_ids: Maximum number of ids matching the filter of a
+                         ``find(...).like(...)`` query which are searched
+                         within at a time
+    :param like_min_selectivity: Minimum fraction of the documents matching
+                                 the filter of a ``find(...).like(...)``
+                                 query to search before filtering
+    :param like_sample_size: Number of documents sampled to estimate the
+                             fraction of documents matching a filter
+    :param like_estimate_cache_size: Number of estimates of the documents
+                                     matching a filter which are cached,
+                                     ``0`` disables the cache
+    :param like_estimate_ttl: Seconds after which cached estimates expire,
+                              ``None`` for never
     """
 
     uri: t.Optional[str] = None  # None implies local mode
-    type: str = 'in_memory'  # in_memory|lance
+    type: str = 'in_memory'  # in_memory|hnsw|lance
     backfill_batch_size: int = 100
+    snapshot_dir: t.Optional[str] = None
+    wire_format: str = 'binary'  # binary|json
+    shards: int = 0
+    shard_uris: t.List[str] = dc.field(default_factory=list)
+    shard_authkey: t.Optional[str] = None
+    query_cache_size: int = 1024
+    query_cache_ttl: t.Optional[float] = None
+    result_cache_size: int = 0
+    result_cache_ttl: t.Optional[float] = None
+    like_max_ids: int = 10_000
+    like_min_selectivity: float = 0.01
+    like_sample_size: int = 1000
+    like_estimate_cache_size: int = 1024
+    like_estimate_ttl: t.Optional[float] = 60.0
 
 
 @dc.dataclass
@@ -1,12 +1,16 @@
 import dataclasses as dc
+import datetime
+import os
 import random
+import time
 import typing as t
 import warnings
 from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 import networkx
-import tqdm
+import numpy
 
 import superduperdb as s
 from superduperdb import logging
@@ -29,6 +33,7 @@ from superduperdb.backends.local.compute import LocalComputeBackend
 from superduperdb.base import exceptions, serializable
 from superduperdb.base.cursor import SuperDuperCursor
 from superduperdb.base.document import Document
+from superduperdb.base.enums import DBType
 from superduperdb.base.superduper import superduper
 from superduperdb.cdc.cdc import DatabaseChangeDataCapture
 from superduperdb.components.component import Component
@@ -37,11 +42,19 @@ from superduperdb.components.schema import Schema
 from superduperdb.jobs.job import ComponentJob, FunctionJob, Job
 from superduperdb.jobs.task_workflow import TaskWorkflow
 from superduperdb.misc.annotations import deprecated
+from superduperdb.misc.cache import LRUCache
 from superduperdb.misc.colors import Colors
-from superduperdb.misc.data import ibatch
+from superduperdb.misc.compat import to_thread
+from superduperdb.misc.data import ibatch, pipeline
 from superduperdb.misc.download import download_content, download_from_one
+from superduperdb.misc.hash import hash_item
+from superduperdb.vector_search import sharded
 from superduperdb.vector_search.base import BaseVectorSearcher, VectorItem
+from superduperdb.vector_search.fusion import fuse
+from superduperdb.vector_search.in_memory import InMemoryVectorSearcher
 from superduperdb.vector_search.interface import FastVectorSearcher
+from superduperdb.vector_search.multi_vector import MultiVectorSearcher, chunk_id
+from superduperdb.vector_search.rebuild import VectorSearchRebuild
 from superduperdb.vector_search.update_tasks import copy_vectors, delete_vectors
 
 DBResult = t.Any
@@ -75,6 +88,9 @@ class Datalayer:
         'vector_index': 'vector_indices',
         'schema': 'schemas',
     }
+    # Outputs written up to this long before a vector snapshot was read are
+    # replayed on restore, in case the clocks of the writers are behind
+    _REPLAY_MARGIN = datetime.timedelta(minutes=1)
 
     def __init__(
         self,
@@ -104,6 +120,26 @@ class Datalayer:
         self.fast_vector_searchers = LoadDict(
             self, callable=self.initialize_vector_searcher
         )
+        self.vector_search_rebuilds: t.Dict[str, VectorSearchRebuild] = {}
+        # Embeddings of ``like`` queries, by model, version and input hash
+        self.query_cache = LRUCache(
+            s.CFG.cluster.vector_search.query_cache_size,
+            s.CFG.cluster.vector_search.query_cache_ttl,
+        )
+        # Results of ``like`` queries, by vector index, generation and query
+        self.result_cache = LRUCache(
+            s.CFG.cluster.vector_search.result_cache_size,
+            s.CFG.cluster.vector_search.result_cache_ttl,
+        )
+        self.vector_search_generations: t.Dict[str, int] = {}
+        # Documents matching the filters of ``like`` queries, by collection
+        # and filter
+        self.like_estimate_cache = LRUCache(
+            s.CFG.cluster.vector_search.like_estimate_cache_size,
+            s.CFG.cluster.vector_search.like_estimate_ttl,
+        )
+        # Prediction caches of models in the data backend, by uri
+        self.prediction_caches: t.Dict[str, t.Any] = {}
         self.metadata = metadata
         self.artifact_store = artifact_store
         self.artifact_store.serializers = self.datatypes
@@ -147,22 +183,96 @@ class Datalayer:
         assert isinstance(vi, VectorIndex)
 
         clt = vi.indexing_listener.select.table_or_collection
+        assert isinstance(clt.identifier, str), 'clt.identifier must be a string'
+
+        vector_comparison = self._create_vector_searcher(vi, searcher_type)
+        self.backfill_vector_search(vi, vector_comparison)
+
+        return FastVectorSearcher(
+            self,
+            vector_comparison,
+            vi.identifier,
+            predict_id=vi.indexing_listener.predict_id,
+        )
 
+    def _create_vector_searcher(self, vi, searcher_type: str) -> BaseVectorSearcher:
         vector_search_cls = vector_searcher_implementations[searcher_type]
         vector_comparison = vector_search_cls.from_component(vi)
 
-        assert isinstance(clt.identifier, str), 'clt.identifier must be a string'
-
-        self.backfill_vector_search(vi, vector_comparison)
+        config = s.CFG.cluster.vector_search
+        if config.shards or config.shard_uris:
+            shards = sharded.connect(
+                config.shards, tuple(config.shard_uris), config.shard_authkey
+            )
+            vector_comparison = sharded.ShardedVectorSearcher(vector_comparison, shards)
+        if vi.multi_vector:
+            vector_comparison = MultiVectorSearcher(vector_comparison, vi.multi_vector)
+        return vector_comparison
 
-        return FastVectorSearcher(self, vector_comparison, vi.identifier)
+    def rebuild_vector_search(
+        self,
+        identifier: str,
+        searcher_type: t.Optional[str] = None,
+        background: bool = True,
+    ) -> VectorSearchRebuild:
+        """
+        Rebuild the searcher of a vector index next to the live one.
+
+        The vector index is reloaded, e.g. after its indexing model was
+        replaced, and a new searcher is built from the outputs of its
+        listener. Queries are served by the live searcher and the previous
+        version of the vector index until the new searcher has caught up
+        with the vectors copied and deleted meanwhile; then both are
+        swapped at once. See ``VectorSearchRebuild``.
+
+        :param identifier: Identifier of the vector index.
+        :param searcher_type: Searcher type, ``CFG.cluster.vector_search.type``
+                              by default.
+        :param background: Run the rebuild in a background thread, the data
+                           backend must then allow reads from other threads.
+        """
+        if s.CFG.cluster.vector_search.uri is not None:
+            raise NotImplementedError(
+                'Vector indices of the vector-search service cannot be rebuilt'
+            )
+        if identifier in self.vector_search_rebuilds:
+            raise exceptions.ComponentInUseError(
+                f"Vector-index '{identifier}' is already being rebuilt"
+            )
+        searcher_type = searcher_type or s.CFG.cluster.vector_search.type
+        live = self.vector_indices.get(identifier)
+        vi = self.load('vector_index', identifier)
+        from superduperdb import VectorIndex
 
-    def backfill_vector_search(self, vi, searcher):
+        assert isinstance(vi, VectorIndex)
+        if live is not None:
+            # Queries use the previous version until the swap
+            self.vector_indices[identifier] = live
+        searcher = FastVectorSearcher(
+            self,
+            self._create_vector_searcher(vi, searcher_type),
+            identifier,
+            predict_id=vi.indexing_listener.predict_id,
+        )
+        rebuild = VectorSearchRebuild(self, vi, searcher)
+        self.vector_search_rebuilds[identifier] = rebuild
+        if background:
+            return rebuild.start()
+        rebuild.run()
+        return rebuild
+
+    def backfill_vector_search(self, vi, searcher, progress=None):
         """
         Backfill vector search from model outputs of a given vector index.
 
+        If ``CFG.cluster.vector_search.snapshot_dir`` is set and the searcher
+        supports snapshots, the searcher is restored from its last snapshot
+        and only the differences to the data backend are replayed.
+
         :param vi: Identifier of vector index.
         :param searcher: FastVectorSearch instance to load model outputs as vectors.
+        :param progress: (Optional) Dictionary updated with the number of
+                         vectors ``loaded`` and the ``total`` to load.
         """
         if s.CFG.cluster.vector_search.type == 'native':
             return
@@ -175,33 +285,140 @@ class Datalayer:
         if vi.indexing_listener.select is None:
             raise ValueError('.select must be set')
 
-        key = vi.indexing_listener.key
-        if key.startswith('_outputs.'):
-            key = key.split('.')[1]
-
-        query = vi.indexing_listener.select.outputs(vi.indexing_listener.predict_id)
-
-        logging.info(str(query))
-
-        id_field = query.table_or_collection.primary_id
+        predict_id = vi.indexing_listener.predict_id
+        path = self._vector_snapshot_path(vi, searcher)
+        # Outputs written from here on are replayed from the next snapshot
+        read_at = datetime.datetime.now(datetime.timezone.utc)
+        restored = searcher.load(path) if path is not None else None
+        if restored is not None:
+            if self._replay_vector_search(vi, searcher, *restored):
+                logging.info(f"Restored vectors of '{vi.identifier}' from {path}")
+                searcher.save(path, predict_id=predict_id, read_at=read_at.isoformat())
+                return
+            logging.info(f"Reloading vectors of '{vi.identifier}' instead of {path}")
+            searcher.delete(restored[0])
+
+        select = vi.indexing_listener.select
+        total = self._estimate_count(select)
+        query = select.select_ids.outputs(predict_id)
+        if vi.multi_vector and select.DB_TYPE != 'SQL':
+            # Flattened outputs are stored in their own collection
+            query = vi.indexing_listener.outputs_select
+        self._load_vectors(vi, searcher, [query], total=total, progress=progress)
+        if path is not None:
+            searcher.save(path, predict_id=predict_id, read_at=read_at.isoformat())
+
+    def _estimate_count(self, select) -> t.Optional[int]:
+        # An upper bound of the number of vectors to load, for progress
+        # reports only: the collection is not read, and documents without
+        # outputs or outside of the filter are counted too
+        if self.databackend.db_type != DBType.MONGODB:
+            return None
+        collection = self.databackend.db[select.table_or_collection.identifier]
+        return collection.estimated_document_count()
+
+    def _vector_snapshot_path(self, vi, searcher) -> t.Optional[str]:
+        snapshot_dir = s.CFG.cluster.vector_search.snapshot_dir
+        if snapshot_dir is None or not isinstance(searcher, InMemoryVectorSearcher):
+            return None
+        return os.path.join(snapshot_dir, vi.identifier)
+
+    def _load_vectors(self, vi, searcher, queries, total=None, progress=None):
+        id_field = queries[0].table_or_collection.primary_id
+        key = f'_outputs.{vi.indexing_listener.predict_id}'
+        dimensions = searcher.dimensions
+
+        def fetch():
+            for query in queries:
+                logging.info(str(query))
+                yield from self.execute(query)
+
+        offsets: t.Dict[str, int] = {}
+
+        def decode(record_batch):
+            ids, sources = [], []
+            h = numpy.empty((len(record_batch), dimensions), dtype=numpy.float32)
+            for i, record in enumerate(record_batch):
+                ids.append(str(record[id_field]))
+                sources.append(None)
+                if vi.multi_vector:
+                    ids[i], sources[i] = chunk_id(record, ids[i], offsets)
+                vector = record[key]
+                if isinstance(vector, _BaseEncodable):
+                    vector = vector.unpack(db=self)
+                h[i] = BaseVectorSearcher.to_numpy(vector)
+            return ids, sources, h
+
+        start = time.time()
+        progress = {} if progress is None else progress
+        progress.update(loaded=0, total=total)
+        logged = {'at': start}
+
+        def add(batch):
+            ids, sources, h = batch
+            searcher.add(
+                [
+                    VectorItem(id=id, vector=v, source=source)
+                    for id, source, v in zip(ids, sources, h)
+                ]
+            )
+            progress['loaded'] += len(ids)
+            if time.time() - logged['at'] > 10:
+                logged['at'] = time.time()
+                _log_progress(
+                    vi.identifier, progress['loaded'], total, time.time() - start
+                )
 
-        progress = tqdm.tqdm(desc='Loading vectors into vector-table...')
-        for record_batch in ibatch(
-            self.execute(query),
-            s.CFG.cluster.vector_search.backfill_batch_size,
-        ):
-            items = []
-            for record in record_batch:
-                id = record[id_field]
-                assert not isinstance(vi.indexing_listener.model, str)
-                h = record[f'_outputs.{vi.indexing_listener.predict_id}']
-                if isinstance(h, _BaseEncodable):
-                    h = h.unpack(db=self)
-                items.append(VectorItem.create(id=str(id), vector=h))
-
-            searcher.add(items)
-            progress.update(len(items))
+        # The data backend is read in this thread, decoding and adding run
+        # concurrently in their own threads.
+        batches = ibatch(fetch(), s.CFG.cluster.vector_search.backfill_batch_size)
+        pipeline(batches, decode, add)
         searcher.post_create()
+        _log_progress(vi.identifier, progress['loaded'], None, time.time() - start)
+
+    def _replay_vector_search(self, vi, searcher, restored_ids, watermark) -> bool:
+        # Vectors are loaded for the outputs written since the snapshot was
+        # read, and ids are read to find the documents deleted since.
+        # Returns ``False`` if the snapshot cannot be brought up to date.
+        select = vi.indexing_listener.select
+        listener = vi.indexing_listener
+        if (
+            watermark.get('predict_id') != listener.predict_id
+            or 'read_at' not in watermark
+            or vi.multi_vector
+            or not listener.model.model_update_kwargs.get('document_embedded', True)
+        ):
+            return False
+        # Margin for the clocks of the processes writing outputs
+        since = datetime.datetime.fromisoformat(watermark['read_at'])
+        since -= self._REPLAY_MARGIN
+        try:
+            changed = self.databackend.select_ids_of_outputs_since(
+                listener.predict_id, since
+            )
+        except NotImplementedError:
+            return False
+
+        id_field = select.table_or_collection.primary_id
+        ids = {
+            str(r[id_field])
+            for r in self._select(select.select_ids_of_outputs(listener.predict_id))
+        }
+        deleted = [id for id in restored_ids if id not in ids]
+        logging.info(
+            f"Replaying {len(changed)} written and {len(deleted)} deleted "
+            f"vectors of '{vi.identifier}'"
+        )
+
+        if deleted:
+            searcher.delete(deleted)
+        if changed:
+            queries = [
+                select.select_using_ids(batch).select_ids.outputs(listener.predict_id)
+                for batch in ibatch(changed, 10000)
+            ]
+            self._load_vectors(vi, searcher, queries, total=len(changed))
+        return True
 
     def set_compute(self, new: ComputeBackend):
         """
@@ -397,7 +614,7 @@ class Datalayer:
         :param select: The select query object specifying the data to be retrieved.
         """
         if select.variables:
-            select = select.set_variables(self)  # type: ignore[assignment]
+            select = select.set_variables(self)
         return select.execute(self, reference=reference)
 
     def refresh_after_delete(
@@ -659,10 +876,17 @@ class Datalayer:
         m.on_load(self)
 
         if cm := self.type_id_to_cache_mapping.get(type_id):
+            cache = getattr(self, cm)
+            previous = cache.get(m.identifier)
             try:
-                getattr(self, cm)[m.identifier] = m
+                cache[m.identifier] = m
             except KeyError:
                 raise exceptions.ComponentException('%s not found in %s cache'.format())
+            if type_id == 'model' and previous is not None and previous is not m:
+                # The worker processes of the replaced model are stopped, also
+                # when it is reloaded to be removed
+                if hasattr(previous, 'cleanup'):
+                    previous.cleanup(self)
         return m
 
     def _build_delete_task_workflow(
@@ -963,6 +1187,14 @@ class Datalayer:
                 # TODO - is there an abstract method thingy for this?
                 component.cleanup(self)
 
+            if type_id == 'model':
+                self.query_cache.invalidate(lambda key: key[0] == identifier)
+            if type_id == 'vector_index':
+                self.invalidate_vector_search(identifier)
+                searcher = self.fast_vector_searchers.pop(identifier, None)
+                if searcher is not None:
+                    searcher.drop()
+
             if type_id in self.type_id_to_cache_mapping:
                 try:
                     del getattr(self, self.type_id_to_cache_mapping[type_id])[
@@ -1022,6 +1254,9 @@ class Datalayer:
 
         # If object has no version, update the last version
         object.version = info['version']
+        self.query_cache.invalidate(lambda key: key[0] == object.identifier)
+        # Results depend on the embeddings of the queries
+        self.result_cache.invalidate(lambda key: True)
         self.artifact_store.delete(info)
         new_info = self.artifact_store.save(object.dict().encode())
         self.metadata.replace_object(
@@ -1037,21 +1272,38 @@ class Datalayer:
         vector_index: str,
         ids: t.Optional[t.Sequence[str]] = None,
         outputs: t.Optional[Document] = None,
-        n: int = 100,
+        n: t.Optional[int] = 100,
+        min_score: t.Optional[float] = None,
+        max_distance: t.Optional[float] = None,
     ) -> t.Tuple[t.List[str], t.List[float]]:
         """
         Performs a vector search query on the given vector index.
 
+        With ``min_score`` or ``max_distance``, all results within the
+        threshold are returned, up to ``n`` of them.
+
         :param like: Vector search document to search.
         :param vector_index: Vector index to search.
         :param ids: (Optional) IDs to search within.
         :param outputs: (Optional) Seed outputs dictionary.
-        :param n: Get top k results from vector search.
+        :param n: Get top k results from vector search, all results within
+                  the threshold if ``None``.
+        :param min_score: (Optional) Minimum score of the results.
+        :param max_distance: (Optional) Maximum distance of the results,
+                             for the ``l2`` and ``cosine`` measures.
         """
         # TODO - make this un-ambiguous
         if not isinstance(like, Document):
             assert isinstance(like, dict)
             like = Document(like)
+        cache_key = None
+        if outputs is None:
+            cache_key = self._result_cache_key(
+                vector_index, like, ids, n, min_score, max_distance
+            )
+            result = self._cached_result(cache_key)
+            if result is not None:
+                return result
         like = self._get_content_for_filter(like)
         vi = self.vector_indices[vector_index]
         if outputs is None:
@@ -1061,7 +1313,192 @@ class Datalayer:
             if not isinstance(outs, dict):
                 raise TypeError(f'Expected dict, got {type(outputs)}')
         logging.info(str(outs))
-        return vi.get_nearest(like, db=self, ids=ids, n=n, outputs=outs)
+        result = vi.get_nearest(
+            like,
+            db=self,
+            ids=ids,
+            n=n,
+            outputs=outs,
+            min_score=min_score,
+            max_distance=max_distance,
+        )
+        self._cache_result(cache_key, result)
+        return result
+
+    def invalidate_vector_search(self, vector_index: str):
+        """
+        Invalidate the cached results of queries on a vector index.
+
+        The generation of the vector index is part of the keys of
+        ``result_cache``, so that bumping it makes the previous results
+        unreachable; they are evicted as new results are cached.
+
+        :param vector_index: Identifier of the vector index.
+        """
+        generations = self.vector_search_generations
+        generations[vector_index] = generations.get(vector_index, 0) + 1
+
+    def _result_cache_key(self, vector_index, like, ids, *args):
+        # ``None`` if the cache is disabled or the query cannot be hashed
+        if self.result_cache.maxsize <= 0:
+            return None
+        generation = self.vector_search_generations.get(vector_index, 0)
+        try:
+            query = hash_item([like.unpack(db=self), list(ids or ()), *args])
+        except TypeError:
+            return None
+        return vector_index, generation, query
+
+    def _cached_result(self, cache_key):
+        if cache_key is None:
+            return None
+        result = self.result_cache.get(cache_key)
+        if result is None:
+            return None
+        # Copies, so that callers cannot modify the cached result
+        return list(result[0]), list(result[1])
+
+    def _cache_result(self, cache_key, result):
+        if cache_key is not None:
+            self.result_cache.put(cache_key, (list(result[0]), list(result[1])))
+
+    async def aselect_nearest(
+        self,
+        like: t.Union[t.Dict, Document],
+        vector_index: str,
+        ids: t.Optional[t.Sequence[str]] = None,
+        outputs: t.Optional[Document] = None,
+        n: int = 100,
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Performs a vector search query on the given vector index, asynchronously.
+
+        Downloads, model predictions and local searches are run in threads,
+        and remote searches are sent with an asynchronous client, so that
+        the event loop is not blocked.
+
+        :param like: Vector search document to search.
+        :param vector_index: Vector index to search.
+        :param ids: (Optional) IDs to search within.
+        :param outputs: (Optional) Seed outputs dictionary.
+        :param n: Get top k results from vector search.
+        """
+        if not isinstance(like, Document):
+            assert isinstance(like, dict)
+            like = Document(like)
+        cache_key = None
+        if outputs is None:
+            cache_key = self._result_cache_key(vector_index, like, ids, n, None, None)
+            result = self._cached_result(cache_key)
+            if result is not None:
+                return result
+        like = await to_thread(self._get_content_for_filter, like)
+        vi = self.vector_indices[vector_index]
+        if outputs is None:
+            outs: t.Dict = {}
+        else:
+            outs = outputs.encode()
+            if not isinstance(outs, dict):
+                raise TypeError(f'Expected dict, got {type(outputs)}')
+        result = await vi.aget_nearest(like, db=self, ids=ids, n=n, outputs=outs)
+        self._cache_result(cache_key, result)
+        return result
+
+    def select_nearest_many(
+        self,
+        likes: t.Sequence[t.Union[t.Dict, Document]],
+        vector_index: str,
+        ids: t.Optional[t.Sequence[str]] = None,
+        outputs: t.Optional[Document] = None,
+        n: int = 100,
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """
+        Performs a batch of vector search queries on the given vector index.
+
+        Query vectors are computed and searched in batch; the results are
+        returned in the order of ``likes``.
+
+        :param likes: Vector search documents to search.
+        :param vector_index: Vector index to search.
+        :param ids: (Optional) IDs to search within.
+        :param outputs: (Optional) Seed outputs dictionary.
+        :param n: Get top k results from vector search for each document.
+        """
+        documents = []
+        for like in likes:
+            if not isinstance(like, Document):
+                assert isinstance(like, dict)
+                like = Document(like)
+            documents.append(self._get_content_for_filter(like))
+        vi = self.vector_indices[vector_index]
+        if outputs is None:
+            outs: t.Dict = {}
+        else:
+            outs = outputs.encode()
+            if not isinstance(outs, dict):
+                raise TypeError(f'Expected dict, got {type(outputs)}')
+        return vi.get_nearest_many(documents, db=self, ids=ids, n=n, outputs=outs)
+
+    def select_nearest_fused(
+        self,
+        like: t.Union[t.Dict, Document],
+        vector_indices: t.Sequence[str],
+        ids: t.Optional[t.Sequence[str]] = None,
+        outputs: t.Optional[Document] = None,
+        n: int = 100,
+        fusion: str = 'rrf',
+        weights: t.Optional[t.Sequence[float]] = None,
+        rrf_k: int = 60,
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Performs a vector search query on several vector indices at once.
+
+        The top ``n`` results of each vector index are searched in parallel
+        threads and merged with ``superduperdb.vector_search.fusion.fuse``.
+        Components are loaded in the calling thread beforehand, so that the
+        threads only predict and search.
+
+        :param like: Vector search document to search.
+        :param vector_indices: Vector indices to search.
+        :param ids: (Optional) IDs to search within.
+        :param outputs: (Optional) Seed outputs dictionary.
+        :param n: Get top k results of each vector index, and of the merge.
+        :param fusion: ``rrf`` (reciprocal rank fusion) or ``weighted_sum``
+                       of the scores normalized per measure.
+        :param weights: (Optional) Weight of each vector index.
+        :param rrf_k: Constant of the reciprocal rank fusion.
+        """
+        if not isinstance(like, Document):
+            assert isinstance(like, dict)
+            like = Document(like)
+        like = self._get_content_for_filter(like)
+        if outputs is None:
+            outs: t.Dict = {}
+        else:
+            outs = outputs.encode()
+            if not isinstance(outs, dict):
+                raise TypeError(f'Expected dict, got {type(outputs)}')
+
+        indices = [self.vector_indices[identifier] for identifier in vector_indices]
+        # Loaded here, since the data backend may not be shared by threads
+        for vi in indices:
+            self.fast_vector_searchers[vi.identifier]
+            for model in vi.models_keys[0]:
+                self.models[model]
+
+        def search(vi):
+            return vi.get_nearest(like, db=self, ids=ids, n=n, outputs=outs)
+
+        with ThreadPoolExecutor(max_workers=len(indices) or 1) as pool:
+            results = list(pool.map(search, indices))
+        return fuse(
+            results,
+            [vi.measure for vi in indices],
+            fusion=fusion,
+            weights=weights,
+            rrf_k=rrf_k,
+            n=n,
+        )
 
     def close(self):
         """Gracefully shutdown the Datalayer."""
@@ -1103,6 +1540,14 @@ class Datalayer:
         return self.databackend.infer_schema(data, identifier)
 
 
+def _log_progress(identifier, loaded, total, elapsed):
+    rate = loaded / elapsed if elapsed > 0 else 0.0
+    message = f"Loaded {loaded} vectors of '{identifier}' ({rate:.0f} rows/s"
+    if total and rate:
+        message += f', ETA {max(total - loaded, 0) / rate:.0f}s'
+    logging.info(message + ')')
+
+
 @dc.dataclass
 class LoadDict(dict):
     """
@@ -32,6 +32,9 @@ _LEAF_TYPES = {
 }
 _LEAF_TYPES.update(_ENCODABLES)
 _OUTPUTS_KEY = '_outputs'
+# Prefix of the collections recording when outputs embedded in documents
+# were last written
+_OUTPUTS_TIME_KEY = '_outputs_time'
 
 
 class Document(MongoStyleDict):
@@ -0,0 +1,50 @@
+import json
+import typing as t
+
+from typer import Option
+
+from . import command
+
+
+def _ints(value: str) -> t.List[int]:
+    return [int(x) for x in value.split(',') if x]
+
+
+@command(help='Benchmark the vector searchers on synthetic embeddings')
+def vector_search_benchmark(
+    searchers: str = Option('', help='Comma-separated searcher types, all if empty'),
+    sizes: str = Option('10000', help='Comma-separated numbers of vectors'),
+    dimensions: str = Option('64', help='Comma-separated dimensions'),
+    n: str = Option('10', help='Comma-separated numbers of results per query'),
+    concurrency: str = Option('1,4', help='Comma-separated numbers of threads'),
+    queries: int = Option(100, help='Number of queries'),
+    measure: str = Option('cosine', help='Measure: l2, dot or cosine'),
+    updates: int = Option(1000, help='Number of vectors added and deleted'),
+    output: str = Option('vector_search_benchmark.json', help='JSON report path'),
+):
+    """Benchmark the vector searchers on synthetic embeddings.
+
+    :param searchers: Comma-separated searcher types, all if empty.
+    :param sizes: Comma-separated numbers of vectors.
+    :param dimensions: Comma-separated dimensions.
+    :param n: Comma-separated numbers of results per query.
+    :param concurrency: Comma-separated numbers of threads searching at once.
+    :param queries: Number of queries.
+    :param measure: Measure: l2, dot or cosine.
+    :param updates: Number of vectors added and deleted after the build.
+    :param output: Path of the JSON report.
+    """
+    from superduperdb.vector_search.benchmark import run_benchmark
+
+    report = run_benchmark(
+        searchers=[x for x in searchers.split(',') if x] or None,
+        sizes=_ints(sizes),
+        dimensions=_ints(dimensions),
+        ns=_ints(n),
+        concurrency=_ints(concurrency),
+        queries=queries,
+        measure=measure,
+        updates=updates,
+        output=output,
+    )
+    print(json.dumps(report['results'], indent=2))
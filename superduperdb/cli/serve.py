@@ -31,6 +31,23 @@ def vector_search():
     app.start()
 
 
+@command(help='Start a vector search shard worker')
+def vector_search_shard(address: str):
+    """Start a vector search shard worker.
+
+    The worker is used by clients which list ``address`` in
+    ``CFG.cluster.vector_search.shard_uris``.
+
+    :param address: Address to listen at, as ``host:port``.
+    """
+    from superduperdb import CFG
+    from superduperdb.vector_search.sharded import serve_remote
+
+    if CFG.cluster.vector_search.shard_authkey is None:
+        raise ValueError('Set `cluster.vector_search.shard_authkey`')
+    serve_remote(address, CFG.cluster.vector_search.shard_authkey)
+
+
 @command(help='Start standalone change data capture')
 def cdc():
     """Start standalone change data capture."""
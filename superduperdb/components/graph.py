@@ -472,7 +472,7 @@ class Graph(Model):
                 args, kwargs = self._fetch_input(
                     args, kwargs, edges=edges, outputs=outputs
                 )
-                cache[node] = self.nodes[node].predict_one(*args, **kwargs)
+                cache[node] = self.nodes[node].predict_one_batched(*args, **kwargs)
             else:
                 dataset = self._fetch_inputs(
                     args[0], edges=edges, outputs=outputs, node=node
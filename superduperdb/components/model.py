@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import collections
 import concurrent.futures
 import dataclasses as dc
+import functools
 import inspect
-import multiprocessing
+import math
 import os
 import re
+import threading
 import typing as t
 from abc import ABC, abstractmethod
 
@@ -29,6 +32,9 @@ from superduperdb.components.metric import Metric
 from superduperdb.components.schema import Schema
 from superduperdb.jobs.job import ComponentJob, Job
 from superduperdb.misc.annotations import public_api
+from superduperdb.misc.batching import MicroBatcher
+from superduperdb.misc.prediction_cache import CacheLookup, get_prediction_cache
+from superduperdb.misc.worker_pool import WorkerPool
 from superduperdb.rest.utils import parse_query
 
 if t.TYPE_CHECKING:
@@ -40,6 +46,11 @@ EncoderArg = t.Union[DataType, FieldType, None]
 ModelInputType = t.Union[str, t.List[str], t.Tuple[t.List[str], t.Dict[str, str]]]
 Signature = t.Literal['*args', '**kwargs', '*args,**kwargs', 'singleton']
 
+# Guards the lazy creation of the micro-batchers of models
+_MICRO_BATCHER_LOCK = threading.Lock()
+# Guards the lazy creation of the worker pools of models
+_WORKER_POOL_LOCK = threading.Lock()
+
 
 def objectmodel(
     item: t.Optional[t.Callable] = None,
@@ -489,6 +500,13 @@ class Model(Component):
                            compute_kwargs = dict(resources=...).
     :param validation: The validation ``Dataset`` instances to use.
     :param metric_values: The metrics to evaluate on.
+    :param micro_batch_size: Maximum number of concurrent ``predict_one_batched``
+                             calls run as one ``predict``, ``0`` to disable.
+    :param micro_batch_wait_ms: Maximum time a ``predict_one_batched`` call
+                                waits for others to join its batch.
+    :param prediction_cache: Uri of the cache of the outputs of ``predict_in_db``
+                             by inputs, e.g. ``memory``, ``file://<path>``
+                             or ``db://<collection-or-table>``.
     """
 
     type_id: t.ClassVar[str] = 'model'
@@ -507,6 +525,9 @@ class Model(Component):
     compute_kwargs: t.Dict = dc.field(default_factory=dict)
     validation: t.Optional[Validation] = None
     metric_values: t.Dict = dc.field(default_factory=dict)
+    micro_batch_size: int = 0
+    micro_batch_wait_ms: float = 5.0
+    prediction_cache: t.Optional[str] = None
 
     def __post_init__(self, artifacts):
         super().__post_init__(artifacts)
@@ -535,6 +556,54 @@ class Model(Component):
         """
         pass
 
+    @ensure_initialized
+    def predict_one_batched(self, *args, **kwargs):
+        """Predict on a single data point, batched with concurrent calls.
+
+        With ``micro_batch_size``, calls from concurrent threads are queued
+        for up to ``micro_batch_wait_ms`` and run as one ``predict`` in a
+        background thread. Otherwise, and for arguments which do not match
+        ``signature``, this is ``predict_one``.
+
+        :param args: Positional arguments of ``predict_one``
+        :param kwargs: Keyword arguments of ``predict_one``
+        """
+        if self.micro_batch_size > 0:
+            batchable, item = self._item_of_one(args, kwargs)
+            if batchable:
+                return self._get_micro_batcher()(item)
+        return self.predict_one(*args, **kwargs)
+
+    @property
+    def _batch_signature(self) -> Signature:
+        # Signature of the data points of ``predict``
+        return self.signature
+
+    def _item_of_one(self, args, kwargs) -> t.Tuple[bool, t.Any]:
+        # The data point of ``predict`` of ``predict_one(*args, **kwargs)``
+        signature = self._batch_signature
+        if signature == 'singleton' and len(args) == 1 and not kwargs:
+            return True, args[0]
+        if signature == '*args' and not kwargs:
+            return True, args
+        if signature == '**kwargs' and not args:
+            return True, kwargs
+        if signature == '*args,**kwargs':
+            return True, (args, kwargs)
+        return False, None
+
+    def _get_micro_batcher(self) -> MicroBatcher:
+        with _MICRO_BATCHER_LOCK:
+            batcher = getattr(self, '_micro_batcher', None)
+            if batcher is None:
+                batcher = self._micro_batcher = MicroBatcher(
+                    self.predict,
+                    max_batch_size=self.micro_batch_size,
+                    max_wait_ms=self.micro_batch_wait_ms,
+                    name=f'micro-batcher-{self.identifier}',
+                )
+            return batcher
+
     def _prepare_select_for_predict(self, select, db):
         if isinstance(select, dict):
             select = Serializable.decode(select)
@@ -564,6 +633,8 @@ class Model(Component):
         dependencies: t.Sequence[Job] = (),
         in_memory: bool = True,
         overwrite: bool = False,
+        pipeline_depth: int = 0,
+        stream_ids: bool = False,
     ):
         """Run a prediction job in the database.
 
@@ -579,6 +650,9 @@ class Model(Component):
         :param dependencies: List of dependencies (jobs)
         :param in_memory: Load data into memory or not
         :param overwrite: Overwrite all documents or only new documents
+        :param pipeline_depth: Number of chunks fetched ahead of the chunk
+                               being predicted, ``0`` to run chunks one by one
+        :param stream_ids: Read the ids in pages of ``max_chunk_size``
         """
         job = ComponentJob(
             component_identifier=self.identifier,
@@ -592,16 +666,17 @@ class Model(Component):
                 'max_chunk_size': max_chunk_size,
                 'in_memory': in_memory,
                 'overwrite': overwrite,
+                'pipeline_depth': pipeline_depth,
+                'stream_ids': stream_ids,
             },
             compute_kwargs=self.compute_kwargs,
         )
         job(db, dependencies=dependencies)
         return job
 
-    def _get_ids_from_select(
+    def _get_ids_query(
         self,
         *,
-        X,
         select,
         db: 'Datalayer',
         ids,
@@ -609,22 +684,62 @@ class Model(Component):
         overwrite: bool = False,
     ):
         if not db.databackend.check_output_dest(predict_id):
-            query = select.select_ids
-
+            return select.select_ids
         elif not overwrite:
             if ids:
                 select = select.select_using_ids(ids)
-            if '_outputs' in X:
-                X = X.split('.')[1]
-            query = select.select_ids_of_missing_outputs(predict_id=predict_id)
-        else:
+            return select.select_ids_of_missing_outputs(predict_id=predict_id)
+        elif ids:
+            return None
+        return select.select_ids
+
+    def _get_documents_query(
+        self,
+        *,
+        select,
+        db: 'Datalayer',
+        ids,
+        predict_id: str,
+        overwrite: bool = False,
+    ):
+        # The documents of the ids selected by ``_get_ids_query``
+        if not db.databackend.check_output_dest(predict_id):
+            return select
+        elif not overwrite:
             if ids:
-                return ids
-            query = select.select_ids
+                select = select.select_using_ids(ids)
+            return select.select_missing_outputs(predict_id=predict_id)
+        elif ids:
+            return None
+        return select
+
+    @staticmethod
+    def _get_id_field(db: 'Datalayer', query):
         try:
-            id_field = db.databackend.id_field
+            return db.databackend.id_field
         except AttributeError:
-            id_field = query.table_or_collection.primary_id
+            return query.table_or_collection.primary_id
+
+    def _get_ids_from_select(
+        self,
+        *,
+        X,
+        select,
+        db: 'Datalayer',
+        ids,
+        predict_id: str,
+        overwrite: bool = False,
+    ):
+        query = self._get_ids_query(
+            select=select,
+            db=db,
+            ids=ids,
+            predict_id=predict_id,
+            overwrite=overwrite,
+        )
+        if query is None:
+            return ids
+        id_field = self._get_id_field(db, query)
 
         # TODO: Find better solution to support in-memory (pandas)
         # Since pandas has a bug, it cannot join on empty table.
@@ -648,12 +763,22 @@ class Model(Component):
         max_chunk_size: t.Optional[int] = None,
         in_memory: bool = True,
         overwrite: bool = False,
+        pipeline_depth: int = 0,
+        stream_ids: bool = False,
     ) -> t.Any:
         """Predict on the data points in the database.
 
         Execute a single prediction on a data point
         given by positional and keyword arguments as a job.
 
+        With ``pipeline_depth`` and ``max_chunk_size``, chunks are read from
+        the database while the previous chunks are predicted on, and the
+        outputs are written while the next chunk is predicted on.
+
+        With ``stream_ids``, the ids to predict on are read in pages of
+        ``max_chunk_size`` ordered by primary id, rather than all at once,
+        and each chunk is read with a range of ids.
+
         :param X: combination of input keys to be mapped to the model
         :param db: Datalayer instance
         :param predict_id: Identifier for saving outputs.
@@ -662,7 +787,12 @@ class Model(Component):
         :param max_chunk_size: Chunks of data
         :param in_memory: Load data into memory or not
         :param overwrite: Overwrite all documents or only new documents
+        :param pipeline_depth: Number of chunks fetched ahead of the chunk
+                               being predicted, ``0`` to run chunks one by one
+        :param stream_ids: Read the ids in pages of ``max_chunk_size``
         """
+        if stream_ids and max_chunk_size is None:
+            raise ValueError('Reading ids in pages requires `max_chunk_size`')
         if isinstance(select, dict):
             select = Serializable.decode(select)
         if isinstance(select, Table):
@@ -676,6 +806,38 @@ class Model(Component):
         assert isinstance(
             self.version, int
         ), 'Something has gone wrong setting `self.version`'
+        if stream_ids:
+            query = self._get_ids_query(
+                select=select,
+                db=db,
+                ids=ids,
+                predict_id=predict_id,
+                overwrite=overwrite,
+            )
+            if query is not None:
+                assert max_chunk_size is not None
+                documents = self._get_documents_query(
+                    select=select,
+                    db=db,
+                    ids=ids,
+                    predict_id=predict_id,
+                    overwrite=overwrite,
+                )
+                return self._predict_chunks(
+                    self._chunks_from_id_pages(
+                        X=X,
+                        db=db,
+                        select=select,
+                        query=query,
+                        documents=documents,
+                        page_size=max_chunk_size,
+                        in_memory=in_memory,
+                    ),
+                    predict_id=predict_id,
+                    db=db,
+                    select=select,
+                    pipeline_depth=pipeline_depth,
+                )
         predict_ids = self._get_ids_from_select(
             X=X,
             select=select,
@@ -693,6 +855,7 @@ class Model(Component):
             db=db,
             max_chunk_size=max_chunk_size,
             in_memory=in_memory,
+            pipeline_depth=pipeline_depth,
         )
 
     def _prepare_inputs_from_select(
@@ -759,7 +922,20 @@ class Model(Component):
         ids: t.List[str],
         in_memory: bool = True,
         max_chunk_size: t.Optional[int] = None,
+        pipeline_depth: int = 0,
     ):
+        if max_chunk_size is not None and pipeline_depth > 0:
+            if in_memory:
+                return self._predict_chunks(
+                    self._chunks_from_ids(
+                        X=X, db=db, select=select, ids=ids, chunk_size=max_chunk_size
+                    ),
+                    predict_id=predict_id,
+                    db=db,
+                    select=select,
+                    pipeline_depth=pipeline_depth,
+                )
+            logging.warn('Chunks are not pipelined unless loaded in memory')
         if max_chunk_size is not None:
             it = 0
             for i in range(0, len(ids), max_chunk_size):
@@ -783,7 +959,143 @@ class Model(Component):
             ids=ids,
             in_memory=in_memory,
         )
-        outputs = self.predict(dataset)
+        outputs = self._predict_with_cache(dataset, db)
+        self._save_outputs(
+            outputs, predict_id=predict_id, db=db, select=select, ids=ids
+        )
+
+    def _chunks_from_ids(
+        self,
+        X: t.Any,
+        db: Datalayer,
+        select: CompoundSelect,
+        ids: t.List[str],
+        chunk_size: int,
+    ) -> t.Iterator[t.Tuple[t.List[str], t.Any]]:
+        n_chunks = math.ceil(len(ids) / chunk_size)
+        for it, i in enumerate(range(0, len(ids), chunk_size)):
+            logging.info(f'Computing chunk {it}/{n_chunks}')
+            chunk = ids[i : i + chunk_size]
+            dataset, _ = self._prepare_inputs_from_select(
+                X=X, db=db, select=select, ids=chunk
+            )
+            yield chunk, dataset
+
+    def _chunks_from_id_pages(
+        self,
+        X: t.Any,
+        db: Datalayer,
+        select: CompoundSelect,
+        query: CompoundSelect,
+        documents: CompoundSelect,
+        page_size: int,
+        in_memory: bool = True,
+    ) -> t.Iterator[t.Tuple[t.List[str], t.Any]]:
+        # Pages of ``query`` are read after the last id of the previous page,
+        # so that outputs written meanwhile do not shift the pages. The
+        # documents of a page are read from ``documents``, which selects the
+        # same documents as ``query``, within the id range of the page
+        id_field = self._get_id_field(db, query)
+        mapping = Mapping(X, self.signature)
+        after = None
+        it = 0
+        while True:
+            records = list(db.execute(query.select_ids_page(after, page_size)))
+            page = [r[id_field] for r in records]
+            if not page:
+                return
+            logging.info(f'Computing chunk {it} of {len(page)} ids')
+            ids = [str(_id) for _id in page]
+            if in_memory:
+                docs = list(
+                    db.execute(documents.select_using_id_range(page[0], page[-1]))
+                )
+                if docs:
+                    yield [str(r[id_field]) for r in docs], [mapping(r) for r in docs]
+            else:
+                dataset, _ = self._prepare_inputs_from_select(
+                    X=X, db=db, select=select, ids=ids, in_memory=False
+                )
+                yield ids, dataset
+            if len(page) < page_size:
+                return
+            after = page[-1]
+            it += 1
+
+    def _predict_chunks(
+        self,
+        chunks: t.Iterable[t.Tuple[t.List[str], t.Any]],
+        predict_id: str,
+        db: Datalayer,
+        select: CompoundSelect,
+        pipeline_depth: int = 0,
+    ):
+        if pipeline_depth <= 0:
+            for ids, dataset in chunks:
+                outputs = self._predict_with_cache(dataset, db)
+                self._save_outputs(
+                    outputs, predict_id=predict_id, db=db, select=select, ids=ids
+                )
+            return
+
+        # Only ``predict`` runs in the worker thread; the data backend and
+        # the prediction cache are read and written in the calling thread,
+        # since connections may be bound to it. At most
+        # ``pipeline_depth + 1`` chunks are in memory.
+        pending: t.Deque = collections.deque()
+
+        def save(ids, lookup, future):
+            outputs = future.result()
+            if lookup is not None:
+                outputs = lookup.merge(outputs)
+            self._save_outputs(
+                outputs, predict_id=predict_id, db=db, select=select, ids=ids
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f'predict-{self.identifier}'
+        ) as executor:
+            for ids, dataset in chunks:
+                lookup = self._lookup_predictions(dataset, db)
+                if lookup is not None:
+                    dataset = [dataset[i] for i in lookup.missing]
+                future = executor.submit(self._predict_some, dataset)
+                pending.append((ids, lookup, future))
+                if len(pending) > pipeline_depth:
+                    save(*pending.popleft())
+            while pending:
+                save(*pending.popleft())
+
+    def _predict_some(self, dataset) -> t.List:
+        # Chunks may be found in the prediction cache entirely
+        return self.predict(dataset) if len(dataset) else []
+
+    def _lookup_predictions(self, dataset, db: Datalayer) -> t.Optional[CacheLookup]:
+        # Datasets which are not loaded in memory are not looked up
+        if self.prediction_cache is None or not isinstance(dataset, list):
+            return None
+        cache = get_prediction_cache(self.prediction_cache, db)
+        lookup = CacheLookup(cache, f'{self.identifier}/{self.version}', dataset)
+        logging.info(
+            f'Found {len(dataset) - len(lookup.missing)}/{len(dataset)} outputs '
+            f'of {self.identifier} in the prediction cache'
+        )
+        return lookup
+
+    def _predict_with_cache(self, dataset, db: Datalayer) -> t.List:
+        lookup = self._lookup_predictions(dataset, db)
+        if lookup is None:
+            return self.predict(dataset)
+        return lookup.merge(self._predict_some([dataset[i] for i in lookup.missing]))
+
+    def _save_outputs(
+        self,
+        outputs: t.List,
+        predict_id: str,
+        db: Datalayer,
+        select: CompoundSelect,
+        ids: t.List[str],
+    ):
         self._infer_auto_schema(outputs, predict_id)
         outputs = self.encode_outputs(outputs)
 
@@ -1019,16 +1331,25 @@ class IndexableNode:
         return _Node(item)
 
 
+def _call_object(object, signature, data):
+    args, kwargs = Model.handle_input_type(data, signature)
+    return object(*args, **kwargs)
+
+
 @public_api(stability='stable')
 @dc.dataclass(kw_only=True)
 class _ObjectModel(Model, ABC):
     __doc__ = Model.__doc__
     __doc__ = __doc__.format(_model=Model.__doc__)  # type: ignore[union-attr]
     num_workers: int = 0
+    worker_chunksize: int = 0
+    threads_per_worker: int = 1
     object: t.Any
 
     ui_schema: t.ClassVar[t.List[t.Dict]] = [
         {'name': 'num_workers', 'type': 'int', 'default': '0'},
+        {'name': 'worker_chunksize', 'type': 'int', 'default': '0'},
+        {'name': 'threads_per_worker', 'type': 'int', 'default': '1'},
         {'name': 'signature', 'type': 'str', 'default': '*args,**kwargs'},
     ]
 
@@ -1058,8 +1379,7 @@ class _ObjectModel(Model, ABC):
         return out
 
     def _wrapper(self, data):
-        args, kwargs = self.handle_input_type(data, self.signature)
-        return self.object(*args, **kwargs)
+        return _call_object(self.object, self.signature, data)
 
     @ensure_initialized
     def predict_one(self, *args, **kwargs):
@@ -1070,24 +1390,55 @@ class _ObjectModel(Model, ABC):
         """
         return self.object(*args, **kwargs)
 
+    def _get_worker_pool(self) -> WorkerPool:
+        # Workers hold a copy of the object, taken when they start
+        key = (id(self.object), self.signature, self.num_workers)
+        with _WORKER_POOL_LOCK:
+            pool = getattr(self, '_worker_pool', None)
+            if pool is not None and self._worker_pool_key != key:
+                pool.close()
+                pool = None
+            if pool is None:
+                pool = self._worker_pool = WorkerPool(
+                    functools.partial(_call_object, self.object, self.signature),
+                    processes=self.num_workers,
+                    chunksize=self.worker_chunksize,
+                    threads_per_worker=self.threads_per_worker,
+                )
+                self._worker_pool_key = key
+            return pool
+
     @ensure_initialized
     def predict(self, dataset: t.Union[t.List, QueryDataset]) -> t.List:
         """Run the predict on series of Model inputs (dataset).
 
+        With ``num_workers``, data points are sent in chunks of
+        ``worker_chunksize`` to worker processes, which are started on the
+        first call and kept until ``cleanup``.
+
         :param dataset: series of data points.
         """
-        outputs = []
         if self.num_workers:
-            pool = multiprocessing.Pool(processes=self.num_workers)
-            for r in pool.map(self._wrapper, dataset):  # type: ignore[arg-type]
-                outputs.append(r)
-            pool.close()
-            pool.join()
-        else:
-            for i in range(len(dataset)):
-                outputs.append(self._wrapper(dataset[i]))
+            # Data points are read in this thread, since the connections of
+            # ``QueryDataset`` may be bound to it
+            items = [dataset[i] for i in range(len(dataset))]
+            return self._get_worker_pool().map(items)
+        outputs = []
+        for i in range(len(dataset)):
+            outputs.append(self._wrapper(dataset[i]))
         return outputs
 
+    def cleanup(self, db: Datalayer) -> None:
+        """Stop the worker processes of the model.
+
+        :param db: Datalayer instance
+        """
+        with _WORKER_POOL_LOCK:
+            pool = getattr(self, '_worker_pool', None)
+            self._worker_pool = None
+        if pool is not None:
+            pool.close()
+
 
 @public_api(stability='stable')
 @dc.dataclass(kw_only=True)
@@ -13,8 +13,15 @@ from superduperdb.components.model import Mapping, ModelInputType
 from superduperdb.ext.utils import str_shape
 from superduperdb.jobs.job import FunctionJob
 from superduperdb.misc.annotations import public_api, ui
+from superduperdb.misc.compat import to_thread
+from superduperdb.misc.hash import hash_item
 from superduperdb.misc.special_dicts import MongoStyleDict
-from superduperdb.vector_search.base import VectorIndexMeasureType
+from superduperdb.vector_search.base import (
+    BaseVectorSearcher,
+    VectorIndexMeasureType,
+    VectorSearchConfig,
+    score_threshold,
+)
 from superduperdb.vector_search.update_tasks import copy_vectors
 
 KeyType = t.Union[str, t.List, t.Dict]
@@ -33,12 +40,25 @@ class VectorIndex(Component):
     :param compatible_listener: Listener which is applied to vectors to be compared
     :param measure: Measure to use for comparison
     :param metric_values: Metric values for this index
+    :param searcher_parameters: Keyword arguments passed to the vector searcher
+                                (e.g. ``M``/``ef_search`` for ``hnsw``)
+    :param multi_vector: Aggregation (``max`` or ``sum``) of the scores of the
+                         vectors of each document, for listeners whose model
+                         has ``flatten=True``. Searches then return the top
+                         documents instead of the top vectors.
     """
 
     ui_schema: t.ClassVar[t.List[t.Dict]] = [
         {'name': 'indexing_listener', 'type': 'component/listener'},
         {'name': 'compatible_listener', 'type': 'component/listener', 'optional': True},
         {'name': 'measure', 'type': 'str', 'choices': ['cosine', 'dot', 'l2']},
+        {'name': 'searcher_parameters', 'type': 'json', 'default': {}},
+        {
+            'name': 'multi_vector',
+            'type': 'str',
+            'choices': ['max', 'sum'],
+            'optional': True,
+        },
     ]
 
     __doc__ = __doc__.format(component_parameters=Component.__doc__)
@@ -49,6 +69,8 @@ class VectorIndex(Component):
     compatible_listener: t.Optional[Listener] = None
     measure: VectorIndexMeasureType = VectorIndexMeasureType.cosine
     metric_values: t.Optional[t.Dict] = dc.field(default_factory=dict)
+    searcher_parameters: t.Dict = dc.field(default_factory=dict)
+    multi_vector: t.Optional[str] = None
 
     @override
     def on_load(self, db: Datalayer) -> None:
@@ -69,33 +91,18 @@ class VectorIndex(Component):
                 Listener, db.load('listener', self.compatible_listener)
             )
 
-    def get_vector(
-        self,
-        like: Document,
-        models: t.List[str],
-        keys: KeyType,
-        db: t.Any = None,
-        outputs: t.Optional[t.Dict] = None,
-    ):
-        """Peform vector search.
-
-        Perform vector search with query `like` from outputs in db
-        on `self.identifier` vector index.
-
-        :param like: The document to compare against
-        :param models: List of models to retrieve outputs
-        :param keys: Keys available to retrieve outputs of model
-        :param db: A datalayer instance.
-        :param outputs: (optional) update `like` with outputs
-
-        """
+    @staticmethod
+    def _prepare_document(like: Document, outputs: t.Optional[t.Dict] = None):
         document = MongoStyleDict(like.unpack())
         if outputs is not None:
             outputs = outputs or {}
             if '_outputs' not in document:
                 document['_outputs'] = {}
             document['_outputs'].update(outputs)
-            assert not isinstance(self.indexing_listener, str)
+        return document
+
+    @staticmethod
+    def _select_model_key(document, models: t.List[str], keys: KeyType):
         available_keys = list(document.keys())
 
         key: t.Optional[t.Any] = None
@@ -118,18 +125,132 @@ class VectorIndex(Component):
                 model_name, key = models[kix], keys[kix]
             except ValueError:
                 raise Exception(
-                    f'Keys in provided {like} don\'t match'
+                    f'Keys in provided {document} don\'t match'
                     f'VectorIndex keys: {keys}, with model: {models}'
                 )
+        return model_name, key
+
+    def get_vector(
+        self,
+        like: Document,
+        models: t.List[str],
+        keys: KeyType,
+        db: t.Any = None,
+        outputs: t.Optional[t.Dict] = None,
+    ):
+        """Peform vector search.
+
+        Perform vector search with query `like` from outputs in db
+        on `self.identifier` vector index.
+
+        :param like: The document to compare against
+        :param models: List of models to retrieve outputs
+        :param keys: Keys available to retrieve outputs of model
+        :param db: A datalayer instance.
+        :param outputs: (optional) update `like` with outputs
+
+        """
+        model, key, data, cache_key, vector = self._lookup_vector(
+            like, models, keys, db, outputs
+        )
+        if vector is None:
+            args, kwargs = model.handle_input_type(data, model.signature)
+            vector = model.predict_one_batched(*args, **kwargs)
+            if cache_key is not None:
+                db.query_cache.put(cache_key, vector)
+        return vector, model.identifier, key
+
+    async def aget_vector(
+        self,
+        like: Document,
+        models: t.List[str],
+        keys: KeyType,
+        db: t.Any = None,
+        outputs: t.Optional[t.Dict] = None,
+    ):
+        """Asynchronous ``get_vector``.
+
+        The model is loaded in the calling thread, and predicts in another
+        thread so that the event loop is not blocked.
+
+        :param like: The document to compare against
+        :param models: List of models to retrieve outputs
+        :param keys: Keys available to retrieve outputs of model
+        :param db: A datalayer instance.
+        :param outputs: (optional) update `like` with outputs
+        """
+        model, key, data, cache_key, vector = self._lookup_vector(
+            like, models, keys, db, outputs
+        )
+        if vector is None:
+            args, kwargs = model.handle_input_type(data, model.signature)
+            vector = await to_thread(model.predict_one_batched, *args, **kwargs)
+            if cache_key is not None:
+                db.query_cache.put(cache_key, vector)
+        return vector, model.identifier, key
+
+    def _lookup_vector(self, like, models, keys, db, outputs):
+        # The model and input of a query, and its vector if it is cached
+        document = self._prepare_document(like, outputs)
+        model_name, key = self._select_model_key(document, models, keys)
 
         model = db.models[model_name]
         data = Mapping(key, model.signature)(document)
-        args, kwargs = model.handle_input_type(data, model.signature)
-        return (
-            model.predict_one(*args, **kwargs),
-            model.identifier,
-            key,
-        )
+        cache_key = self._query_cache_key(model, data)
+        vector = None if cache_key is None else db.query_cache.get(cache_key)
+        return model, key, data, cache_key, vector
+
+    def get_vectors(
+        self,
+        likes: t.Sequence[Document],
+        models: t.List[str],
+        keys: KeyType,
+        db: t.Any = None,
+        outputs: t.Optional[t.Dict] = None,
+    ) -> t.List[t.Any]:
+        """Compute the query vectors of several documents.
+
+        Documents resolving to the same model and key are predicted
+        together with a single ``model.predict`` call, apart from those
+        whose vectors are in ``db.query_cache``.
+
+        :param likes: The documents to compare against
+        :param models: List of models to retrieve outputs
+        :param keys: Keys available to retrieve outputs of model
+        :param db: A datalayer instance.
+        :param outputs: (optional) update each of `likes` with outputs
+        """
+        groups: t.Dict[str, t.Tuple[str, t.Any, t.List[int], t.List]] = {}
+        vectors: t.List[t.Any] = [None] * len(likes)
+        cache_keys: t.List[t.Any] = [None] * len(likes)
+        for i, like in enumerate(likes):
+            document = self._prepare_document(like, outputs)
+            model_name, key = self._select_model_key(document, models, keys)
+            model = db.models[model_name]
+            data = Mapping(key, model.signature)(document)
+            cache_keys[i] = self._query_cache_key(model, data)
+            if cache_keys[i] is not None:
+                vectors[i] = db.query_cache.get(cache_keys[i])
+                if vectors[i] is not None:
+                    continue
+            group = groups.setdefault(f'{model_name}/{key}', (model_name, key, [], []))
+            group[2].append(i)
+            group[3].append(data)
+
+        for model_name, _, positions, data in groups.values():
+            for i, vector in zip(positions, db.models[model_name].predict(data)):
+                vectors[i] = vector
+                if cache_keys[i] is not None:
+                    db.query_cache.put(cache_keys[i], vector)
+        return vectors
+
+    @staticmethod
+    def _query_cache_key(model, data) -> t.Optional[t.Tuple[str, t.Any, str]]:
+        try:
+            return model.identifier, model.version, hash_item(data)
+        except TypeError:
+            # Inputs which cannot be hashed reliably are not cached
+            return None
 
     def get_nearest(
         self,
@@ -138,29 +259,45 @@ class VectorIndex(Component):
         id_field: str = '_id',
         outputs: t.Optional[t.Dict] = None,
         ids: t.Optional[t.Sequence[str]] = None,
-        n: int = 100,
+        n: t.Optional[int] = 100,
+        min_score: t.Optional[float] = None,
+        max_distance: t.Optional[float] = None,
     ) -> t.Tuple[t.List[str], t.List[float]]:
         """Get nearest results in this vector index.
 
         Given a document, find the nearest results in this vector index, returned as
         two parallel lists of result IDs and scores.
 
+        With ``min_score`` or ``max_distance``, all results within the
+        threshold are returned, up to ``n`` of them.
+
         :param like: The document to compare against
         :param db: The datalayer to use
         :param id_field: Identifier field
         :param outputs: An optional dictionary
         :param ids: A list of ids to match
-        :param n: Number of items to return
+        :param n: Number of items to return, all results within the
+                  threshold if ``None``
+        :param min_score: Minimum score of the results
+        :param max_distance: Maximum distance of the results, for the
+                             ``l2`` and ``cosine`` measures
         """
         models, keys = self.models_keys
         if len(models) != len(keys):
             raise ValueError(f'len(model={models}) != len(keys={keys})')
         within_ids = ids or ()
+        threshold = score_threshold(self.measure, min_score, max_distance)
+        if threshold is None and n is None:
+            raise ValueError('n is required unless min_score or max_distance is set')
+        searcher = db.fast_vector_searchers[self.identifier]
 
         if isinstance(like, dict) and id_field in like:
-            return db.fast_vector_searchers[self.identifier].find_nearest_from_id(
-                str(like[id_field]), within_ids=within_ids, limit=n
-            )
+            _id = str(like[id_field])
+            if threshold is not None:
+                return searcher.find_in_range_from_id(
+                    _id, threshold, within_ids=within_ids, n=n
+                )
+            return searcher.find_nearest_from_id(_id, within_ids=within_ids, n=n)
         h = self.get_vector(
             like=like,
             models=models,
@@ -169,9 +306,101 @@ class VectorIndex(Component):
             outputs=outputs,
         )[0]
 
+        if threshold is not None:
+            return searcher.find_in_range_from_array(
+                h, threshold, within_ids=within_ids, n=n
+            )
+        return searcher.find_nearest_from_array(h, within_ids=within_ids, n=n)
+
+    async def aget_nearest(
+        self,
+        like: Document,
+        db: t.Any,
+        id_field: str = '_id',
+        outputs: t.Optional[t.Dict] = None,
+        ids: t.Optional[t.Sequence[str]] = None,
+        n: int = 100,
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """Asynchronous ``get_nearest``.
+
+        :param like: The document to compare against
+        :param db: The datalayer to use
+        :param id_field: Identifier field
+        :param outputs: An optional dictionary
+        :param ids: A list of ids to match
+        :param n: Number of items to return
+        """
+        models, keys = self.models_keys
+        if len(models) != len(keys):
+            raise ValueError(f'len(model={models}) != len(keys={keys})')
+        within_ids = ids or ()
+        searcher = db.fast_vector_searchers[self.identifier]
+
+        if isinstance(like, dict) and id_field in like:
+            return await searcher.afind_nearest_from_id(
+                str(like[id_field]), within_ids=within_ids, n=n
+            )
+        h = (
+            await self.aget_vector(
+                like=like,
+                models=models,
+                keys=keys,
+                db=db,
+                outputs=outputs,
+            )
+        )[0]
+        return await searcher.afind_nearest_from_array(h, within_ids=within_ids, n=n)
+
+    def get_nearest_many(
+        self,
+        likes: t.Sequence[Document],
+        db: t.Any,
+        id_field: str = '_id',
+        outputs: t.Optional[t.Dict] = None,
+        ids: t.Optional[t.Sequence[str]] = None,
+        n: int = 100,
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """Get nearest results in this vector index for several documents.
+
+        Query vectors are computed in batch and searched with a single
+        ``find_nearest_from_arrays`` call.
+
+        :param likes: The documents to compare against
+        :param db: The datalayer to use
+        :param id_field: Identifier field
+        :param outputs: An optional dictionary
+        :param ids: A list of ids to match
+        :param n: Number of items to return per document
+        """
+        models, keys = self.models_keys
+        if len(models) != len(keys):
+            raise ValueError(f'len(model={models}) != len(keys={keys})')
+        within_ids = ids or ()
         searcher = db.fast_vector_searchers[self.identifier]
 
-        return searcher.find_nearest_from_array(h, within_ids=within_ids, n=n)
+        results: t.List[t.Any] = [None] * len(likes)
+        by_vector = []
+        for i, like in enumerate(likes):
+            if isinstance(like, dict) and id_field in like:
+                results[i] = searcher.find_nearest_from_id(
+                    str(like[id_field]), within_ids=within_ids, n=n
+                )
+            else:
+                by_vector.append(i)
+
+        if by_vector:
+            vectors = self.get_vectors(
+                likes=[likes[i] for i in by_vector],
+                models=models,
+                keys=keys,
+                db=db,
+                outputs=outputs,
+            )
+            h = np.stack([BaseVectorSearcher.to_numpy(v) for v in vectors])
+            found = searcher.find_nearest_from_arrays(h, within_ids=within_ids, n=n)
+            for i, result in zip(by_vector, found):
+                results[i] = result
+        return results
 
     @property
     def models_keys(self) -> t.Tuple[t.List[str], t.List[ModelInputType]]:
@@ -200,6 +429,16 @@ class VectorIndex(Component):
             return shape[-1]
         raise ValueError('Couldn\'t get shape of model outputs from model encoder')
 
+    @property
+    def vector_search_config(self) -> VectorSearchConfig:
+        """Get the configuration used to initiate a vector searcher."""
+        return VectorSearchConfig(
+            id=self.identifier,
+            dimensions=self.dimensions,
+            measure=self.measure,
+            parameters=self.searcher_parameters,
+        )
+
     @override
     def schedule_jobs(
         self,
@@ -260,6 +260,13 @@ class TorchModel(Model, _Fittable, _DeviceManaged):
                     io.BytesIO(state.pop('object_bytes'))
                 )
 
+    @property
+    def _batch_signature(self):
+        # Data points of ``predict`` are the inputs of ``preprocess``
+        if self.preprocess is not None:
+            return self.preprocess_signature
+        return self.signature
+
     @ensure_initialized
     def predict_one(self, *args, **kwargs):
         """Predict on a single input.
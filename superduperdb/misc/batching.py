@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+import typing as t
+from concurrent.futures import Future
+
+from superduperdb import logging
+
+
+class MicroBatcher:
+    """Run concurrent calls on single items as calls on batches.
+
+    Items submitted from any thread are queued, and a background thread
+    collects them until ``max_batch_size`` items are queued or
+    ``max_wait_ms`` milliseconds have passed since the first one, then
+    calls ``function`` once on all of them. Each caller receives the
+    output of its own item, or the error raised on the batch.
+
+    :param function: Function of a list of items, returning one output per item
+    :param max_batch_size: Maximum number of items of a batch
+    :param max_wait_ms: Maximum time an item waits for others to join its batch
+    :param name: Name of the background thread
+    """
+
+    def __init__(
+        self,
+        function: t.Callable[[t.List], t.Sequence],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = 'micro-batcher',
+    ):
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be at least 1')
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: t.Optional[threading.Thread] = None
+
+    def __getstate__(self):
+        # Copies start their own queue and thread
+        state = self.__dict__.copy()
+        state.update(_queue=None, _lock=None, _thread=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def submit(self, item: t.Any) -> Future:
+        """Queue an item, and return the future of its output.
+
+        :param item: Item to call ``function`` on
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: t.Any) -> t.Any:
+        """Call ``function`` on an item, batched with concurrent calls.
+
+        :param item: Item to call ``function`` on
+        """
+        return self.submit(item).result()
+
+    @property
+    def mean_batch_size(self) -> t.Optional[float]:
+        """Average number of items of the batches run so far."""
+        return self.items / self.batches if self.batches else None
+
+    def _collect(self) -> t.List[t.Tuple[t.Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return [(item, f) for item, f in batch if f.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                outputs = self.function(items)
+                if len(outputs) != len(items):
+                    raise ValueError(
+                        f'Expected {len(items)} outputs, got {len(outputs)}'
+                    )
+            except Exception as e:
+                logging.error(f'Batch of {len(items)} items failed: {e}')
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
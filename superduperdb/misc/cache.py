@@ -0,0 +1,82 @@
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with an optional time-to-live.
+
+    :param maxsize: Maximum number of entries, ``0`` disables the cache
+    :param ttl: Seconds after which an entry expires, ``None`` for never
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: t.Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: t.Hashable, default: t.Any = None) -> t.Any:
+        """Get the value cached for ``key`` and mark it as recently used.
+
+        :param key: Key of the entry
+        :param default: Value returned if there is no live entry for ``key``
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                self.ttl is None or time.monotonic() - entry[0] < self.ttl
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: t.Hashable, value: t.Any):
+        """Cache ``value`` for ``key``, evicting the least recently used entry.
+
+        :param key: Key of the entry
+        :param value: Value to cache
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: t.Callable[[t.Any], bool]):
+        """Remove the entries whose key satisfies ``predicate``.
+
+        :param predicate: Function of the key of an entry
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the lookups which were hits, ``0.0`` before any lookup."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def stats(self) -> t.Dict[str, int]:
+        """Number of entries, hits and misses of the cache."""
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses}
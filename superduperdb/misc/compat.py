@@ -1,8 +1,11 @@
 """Functions from later standard libraries not available in Python 3.8."""
 
+import asyncio
+import contextvars
+import functools
 from functools import lru_cache
 
-__all__ = ('cache',)
+__all__ = ('cache', 'to_thread')
 
 
 # Implements functools.cache from Python 3.9
@@ -16,3 +19,17 @@ def cache(user_function, /):
     :param user_function: Function to cache
     """
     return lru_cache(maxsize=None)(user_function)
+
+
+# Implements asyncio.to_thread from Python 3.9
+async def to_thread(func, /, *args, **kwargs):
+    """Run ``func`` in the default executor without blocking the event loop.
+
+    :param func: Function to run
+    :param *args: Positional arguments of ``func``
+    :param **kwargs: Keyword arguments of ``func``
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(None, call)
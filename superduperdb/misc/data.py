@@ -1,4 +1,6 @@
 import itertools
+import queue
+import threading
 import typing as t
 
 T = t.TypeVar('T')
@@ -16,3 +18,58 @@ def ibatch(iterable: t.Iterable[T], batch_size: int) -> t.Iterator[t.List[T]]:
         if not batch:
             break
         yield batch
+
+
+def pipeline(
+    iterable: t.Iterable[t.Any], *stages: t.Callable, maxsize: int = 2
+) -> None:
+    """Feed `iterable` through `stages`, each running in its own thread.
+
+    The iterable is read in the calling thread, so that it may hold resources
+    bound to that thread (e.g. database connections). Each stage is called
+    with the output of the previous one; stages are connected by queues
+    holding at most `maxsize` items. The first exception raised by a stage
+    is re-raised once all threads have stopped.
+
+    :param iterable: the items to feed into the first stage
+    :param *stages: the functions to apply in turn
+    :param maxsize: the number of items buffered between two stages
+    """
+    done = object()
+    errors: t.List[BaseException] = []
+    queues: t.List[queue.Queue] = [queue.Queue(maxsize=maxsize) for _ in stages]
+
+    def work(i, stage):
+        while True:
+            item = queues[i].get()
+            if item is done:
+                break
+            if errors:
+                continue
+            try:
+                out = stage(item)
+            except BaseException as e:
+                errors.append(e)
+                continue
+            if i + 1 < len(queues):
+                queues[i + 1].put(out)
+        if i + 1 < len(queues):
+            queues[i + 1].put(done)
+
+    threads = [
+        threading.Thread(target=work, args=(i, stage), daemon=True)
+        for i, stage in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for item in iterable:
+            if errors:
+                break
+            queues[0].put(item)
+    finally:
+        queues[0].put(done)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
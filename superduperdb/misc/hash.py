@@ -1,5 +1,8 @@
 import hashlib
 import os
+import typing as t
+
+import numpy
 
 
 def hash_string(string: str):
@@ -34,3 +37,52 @@ def random_sha1():
     sha1 = hashlib.sha1()
     sha1.update(random_data)
     return sha1.hexdigest()
+
+
+def _update(digest, item):
+    # Every item is prefixed with its type, so that e.g. ``1`` and ``'1'``
+    # or ``[1]`` and ``(1,)`` hash differently
+    digest.update(type(item).__qualname__.encode())
+    if item is None or isinstance(item, (bool, int, float, complex)):
+        digest.update(repr(item).encode())
+    elif isinstance(item, str):
+        digest.update(item.encode())
+    elif isinstance(item, bytes):
+        digest.update(item)
+    elif isinstance(item, (list, tuple)):
+        digest.update(str(len(item)).encode())
+        for x in item:
+            _update(digest, x)
+    elif isinstance(item, dict):
+        digest.update(str(len(item)).encode())
+        for key in sorted(item, key=repr):
+            _update(digest, key)
+            _update(digest, item[key])
+    elif hasattr(item, 'dtype') and hasattr(item, 'shape'):
+        # ``numpy`` arrays, and ``torch`` tensors via ``numpy``
+        array = numpy.asarray(item.detach().cpu() if hasattr(item, 'detach') else item)
+        if array.dtype == object:
+            raise TypeError('Cannot hash an array of objects')
+        digest.update(f'{array.dtype.str}{array.shape}'.encode())
+        digest.update(numpy.ascontiguousarray(array).tobytes())
+    elif hasattr(item, 'tobytes') and hasattr(item, 'mode'):
+        # ``PIL`` images
+        digest.update(f'{item.mode}{item.size}'.encode())
+        digest.update(item.tobytes())
+    else:
+        raise TypeError(f'Cannot hash item of type {type(item)}')
+
+
+def hash_item(item: t.Any) -> str:
+    """Hash nested data, such as the inputs of a model.
+
+    Unlike ``hash_dict``, equal arrays, tensors and images have equal hashes
+    regardless of how they are printed.
+
+    :param item: Strings, bytes, numbers, arrays, tensors and images,
+                 optionally nested in lists, tuples and dicts
+    :raises TypeError: if ``item`` contains other types
+    """
+    digest = hashlib.sha256()
+    _update(digest, item)
+    return digest.hexdigest()
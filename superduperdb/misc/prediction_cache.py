@@ -0,0 +1,269 @@
+import os
+import pickle
+import threading
+import typing as t
+import uuid
+from abc import ABC, abstractmethod
+
+from superduperdb.base.enums import DBType
+from superduperdb.misc.cache import LRUCache
+from superduperdb.misc.hash import hash_item, hash_string
+
+if t.TYPE_CHECKING:
+    from superduperdb.base.datalayer import Datalayer
+
+_MISSING = object()
+
+
+class PredictionCache(ABC):
+    """Store of model outputs, keyed by the hash of their inputs."""
+
+    @abstractmethod
+    def get_many(self, keys: t.Sequence[str]) -> t.Dict[str, t.Any]:
+        """Get the outputs cached for ``keys``, missing keys are left out.
+
+        :param keys: Keys of the outputs
+        """
+
+    @abstractmethod
+    def put_many(self, entries: t.Dict[str, t.Any]):
+        """Cache outputs.
+
+        :param entries: Outputs by key
+        """
+
+
+class InMemoryPredictionCache(PredictionCache):
+    """Least-recently-used cache of outputs in the memory of the process.
+
+    :param maxsize: Maximum number of outputs
+    :param ttl: Seconds after which an output expires, ``None`` for never
+    """
+
+    def __init__(self, maxsize: int = 100_000, ttl: t.Optional[float] = None):
+        self.cache = LRUCache(maxsize, ttl)
+
+    def get_many(self, keys: t.Sequence[str]) -> t.Dict[str, t.Any]:
+        """Get the outputs cached for ``keys``, missing keys are left out.
+
+        :param keys: Keys of the outputs
+        """
+        found = {key: self.cache.get(key, _MISSING) for key in keys}
+        return {key: value for key, value in found.items() if value is not _MISSING}
+
+    def put_many(self, entries: t.Dict[str, t.Any]):
+        """Cache outputs.
+
+        :param entries: Outputs by key
+        """
+        for key, value in entries.items():
+            self.cache.put(key, value)
+
+
+class DiskPredictionCache(PredictionCache):
+    """Cache of pickled outputs in a local directory, one file per output.
+
+    :param path: Directory of the cache
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        name = hash_string(key)
+        return os.path.join(self.path, name[:2], name)
+
+    def get_many(self, keys: t.Sequence[str]) -> t.Dict[str, t.Any]:
+        """Get the outputs cached for ``keys``, missing keys are left out.
+
+        :param keys: Keys of the outputs
+        """
+        found = {}
+        for key in keys:
+            try:
+                with open(self._file(key), 'rb') as f:
+                    found[key] = pickle.load(f)
+            except FileNotFoundError:
+                continue
+        return found
+
+    def put_many(self, entries: t.Dict[str, t.Any]):
+        """Cache outputs.
+
+        :param entries: Outputs by key
+        """
+        for key, value in entries.items():
+            file = self._file(key)
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            # Written to a temporary file first, so that readers never see
+            # partial outputs
+            tmp = f'{file}.{uuid.uuid4().hex}.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f)
+            os.replace(tmp, file)
+
+
+class DatabackendPredictionCache(PredictionCache):
+    """Cache of pickled outputs in a collection or table of the data backend.
+
+    Like other queries, the cache must be used in the thread of the
+    connection of the data backend.
+
+    :param db: Datalayer instance
+    :param name: Name of the collection or table
+    """
+
+    def __init__(self, db: 'Datalayer', name: str = '_prediction_cache'):
+        self.db = db
+        self.name = name
+        self.mongodb = db.databackend.db_type == DBType.MONGODB
+        if not self.mongodb:
+            db.databackend.create_table_and_schema(
+                name, {'key': 'String', 'value': 'Bytes'}
+            )
+
+    def get_many(self, keys: t.Sequence[str]) -> t.Dict[str, t.Any]:
+        """Get the outputs cached for ``keys``, missing keys are left out.
+
+        :param keys: Keys of the outputs
+        """
+        if not keys:
+            return {}
+        if self.mongodb:
+            rows = self.db.databackend.db[self.name].find({'_id': {'$in': list(keys)}})
+            return {r['_id']: pickle.loads(r['value']) for r in rows}
+        table = self.db.databackend.conn.table(self.name)
+        rows = table.filter(table.key.isin(list(keys))).execute()
+        recover = self.db.databackend.db_helper.recover_data_format
+        return {k: pickle.loads(recover(v)) for k, v in zip(rows['key'], rows['value'])}
+
+    def put_many(self, entries: t.Dict[str, t.Any]):
+        """Cache outputs.
+
+        :param entries: Outputs by key
+        """
+        if not entries:
+            return
+        values = {key: pickle.dumps(value) for key, value in entries.items()}
+        if self.mongodb:
+            from pymongo import ReplaceOne
+
+            self.db.databackend.db[self.name].bulk_write(
+                [
+                    ReplaceOne({'_id': k}, {'_id': k, 'value': v}, upsert=True)
+                    for k, v in values.items()
+                ]
+            )
+            return
+        import sqlalchemy
+
+        # Tables have no unique keys, so that cached outputs are replaced by
+        # deleting their rows first
+        table = sqlalchemy.table(self.name, sqlalchemy.column('key'))
+        with self.db.databackend.conn.begin() as conn:
+            conn.execute(sqlalchemy.delete(table).where(table.c.key.in_(list(values))))
+        self.db.databackend.insert(
+            self.name, [{'key': k, 'value': v} for k, v in values.items()]
+        )
+
+
+def _in_memory(location: str, db: 'Datalayer') -> PredictionCache:
+    return InMemoryPredictionCache(int(location) if location else 100_000)
+
+
+def _disk(location: str, db: 'Datalayer') -> PredictionCache:
+    return DiskPredictionCache(location)
+
+
+def _databackend(location: str, db: 'Datalayer') -> PredictionCache:
+    return DatabackendPredictionCache(db, location or '_prediction_cache')
+
+
+# Factories of prediction caches by scheme, from the location of the uri
+# and the datalayer
+prediction_cache_implementations: t.Dict[
+    str, t.Callable[[str, 'Datalayer'], PredictionCache]
+] = {
+    'memory': _in_memory,
+    'file': _disk,
+    'db': _databackend,
+}
+
+_caches: t.Dict[str, PredictionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_prediction_cache(uri: str, db: 'Datalayer') -> PredictionCache:
+    """Get the prediction cache of a uri, shared by the models using it.
+
+    The uri is ``<scheme>://<location>``, e.g. ``memory://10000`` (the
+    maximum number of outputs), ``file:///tmp/cache`` or ``db://my_cache``
+    (the name of a collection or table), or only the scheme for defaults.
+
+    :param uri: Uri of the cache, with a scheme of
+                ``prediction_cache_implementations``
+    :param db: Datalayer instance
+    """
+    scheme, _, location = uri.partition('://')
+    if scheme not in prediction_cache_implementations:
+        raise ValueError(
+            f'Unknown prediction cache {uri!r}, expected one of '
+            f'{sorted(prediction_cache_implementations)}'
+        )
+    # Caches in the data backend live as long as their datalayer
+    caches = db.prediction_caches if scheme == 'db' else _caches
+    with _caches_lock:
+        if uri not in caches:
+            caches[uri] = prediction_cache_implementations[scheme](location, db)
+        return caches[uri]
+
+
+class CacheLookup:
+    """Outputs of a batch of data points found in a prediction cache.
+
+    Data points with equal inputs are predicted on once. Data points
+    whose inputs cannot be hashed are always predicted on.
+
+    :param cache: Prediction cache
+    :param prefix: Prefix of the keys, e.g. the model and its version
+    :param dataset: Data points
+    """
+
+    def __init__(self, cache: PredictionCache, prefix: str, dataset: t.Sequence):
+        self.cache = cache
+        self.keys: t.List[t.Optional[str]] = []
+        for x in dataset:
+            try:
+                self.keys.append(f'{prefix}/{hash_item(x)}')
+            except TypeError:
+                self.keys.append(None)
+        self.found = cache.get_many(list({k for k in self.keys if k is not None}))
+        self.missing: t.List[int] = []
+        seen = set()
+        for i, key in enumerate(self.keys):
+            if key is None:
+                self.missing.append(i)
+            elif key not in self.found and key not in seen:
+                seen.add(key)
+                self.missing.append(i)
+
+    def merge(self, outputs: t.Sequence) -> t.List:
+        """Cache the outputs of the missing data points, and return all outputs.
+
+        :param outputs: Outputs of the data points at positions ``missing``
+        """
+        computed = {}
+        new = {}
+        for i, output in zip(self.missing, outputs):
+            key = self.keys[i]
+            if key is None:
+                computed[i] = output
+            else:
+                new[key] = output
+        self.cache.put_many(new)
+        found = {**self.found, **new}
+        return [
+            computed[i] if key is None else found[key]
+            for i, key in enumerate(self.keys)
+        ]
@@ -1,12 +1,20 @@
+import asyncio
 import base64
+import importlib.util
 import json
+import typing as t
+import weakref
 from functools import lru_cache
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from superduperdb import CFG, logging
 from superduperdb.base import exceptions
 from superduperdb.ext.utils import superduperencode
+from superduperdb.misc.compat import to_thread
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
 
 
 @lru_cache(maxsize=None)
@@ -16,9 +24,18 @@ def _handshake(service: str):
     _request_server(service, args={'cfg': cfg}, endpoint=endpoint)
 
 
-def _request_server(
-    service: str = 'vector_search', data=None, endpoint='add', args={}, type='post'
-):
+@lru_cache(maxsize=None)
+def _session() -> requests.Session:
+    # One pooled session per process, so that connections to the services
+    # are kept alive and reused between requests.
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _url(service: str, endpoint: str) -> str:
     if service == 'cdc':
         service_uri = CFG.cluster.cdc.uri
     elif service == 'vector_search':
@@ -28,31 +45,50 @@ def _request_server(
 
     assert isinstance(service_uri, str)
     service_uri = 'http://' + ''.join(service_uri.split('://')[1:])
+    return service_uri + '/' + endpoint
 
-    url = service_uri + '/' + endpoint
-    logging.debug(f'Trying to connect {service} at {url} method: {type}')
 
-    if type == 'post':
-        data = superduperencode(data)
-        if isinstance(data, dict):
-            if '_content' in data:
-                try:
-                    data['_content']['bytes'] = base64.b64encode(
-                        data['_content']['bytes']
-                    ).decode()
-                except Exception as e:
-                    logging.error(str(data))
-                    raise e
-        response = requests.post(url, json=data, params=args)
-        result = json.loads(response.content)
-    else:
-        response = requests.get(url, params=args)
-        result = None
+def _encode(data):
+    data = superduperencode(data)
+    if isinstance(data, dict):
+        if '_content' in data:
+            try:
+                data['_content']['bytes'] = base64.b64encode(
+                    data['_content']['bytes']
+                ).decode()
+            except Exception as e:
+                logging.error(str(data))
+                raise e
+    return data
+
+
+def _result(service: str, response, type: str):
     if response.status_code != 200:
         error = json.loads(response.content)
         msg = f'Server error at {service} with {response.status_code} :: {error}'
         raise exceptions.ServiceRequestException(msg)
-    return result
+    if type != 'post':
+        return None
+    if response.headers.get('Content-Type') == BINARY_CONTENT_TYPE:
+        return response.content
+    return json.loads(response.content)
+
+
+def _request_server(
+    service: str = 'vector_search', data=None, endpoint='add', args={}, type='post'
+):
+    url = _url(service, endpoint)
+    logging.debug(f'Trying to connect {service} at {url} method: {type}')
+
+    if type == 'post' and isinstance(data, bytes):
+        response = _session().post(
+            url, data=data, params=args, headers={'Content-Type': BINARY_CONTENT_TYPE}
+        )
+    elif type == 'post':
+        response = _session().post(url, json=_encode(data), params=args)
+    else:
+        response = _session().get(url, params=args)
+    return _result(service, response, type)
 
 
 def request_server(
@@ -61,7 +97,8 @@ def request_server(
     """Request server with data.
 
     :param service: Service name
-    :param data: Data to send
+    :param data: Data to send, ``bytes`` are sent as ``application/octet-stream``
+                 and binary responses are returned as ``bytes``
     :param endpoint: Endpoint to hit
     :param args: Arguments to pass
     :param type: Type of request
@@ -70,3 +107,79 @@ def request_server(
     return _request_server(
         service=service, data=data, endpoint=endpoint, args=args, type=type
     )
+
+
+# ``httpx.AsyncClient`` is bound to the event loop in which it is used,
+# so that one pooled client is kept per running loop.
+_async_clients: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_async_handshakes: t.Set[str] = set()
+
+
+def _async_client():
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        limits = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+        _async_clients[loop] = httpx.AsyncClient(limits=limits, timeout=None)
+    return _async_clients[loop]
+
+
+async def _ahandshake(service: str):
+    if service in _async_handshakes:
+        return
+    endpoint = 'handshake/config'
+    cfg = json.dumps(CFG.comparables)
+    await _arequest_server(service, args={'cfg': cfg}, endpoint=endpoint)
+    _async_handshakes.add(service)
+
+
+async def _arequest_server(
+    service: str = 'vector_search', data=None, endpoint='add', args={}, type='post'
+):
+    url = _url(service, endpoint)
+    logging.debug(f'Trying to connect {service} at {url} method: {type}')
+
+    client = _async_client()
+    if type == 'post' and isinstance(data, bytes):
+        response = await client.post(
+            url,
+            content=data,
+            params=args,
+            headers={'Content-Type': BINARY_CONTENT_TYPE},
+        )
+    elif type == 'post':
+        response = await client.post(url, json=_encode(data), params=args)
+    else:
+        response = await client.get(url, params=args)
+    return _result(service, response, type)
+
+
+async def arequest_server(
+    service: str = 'vector_search', data=None, endpoint='add', args={}, type='post'
+):
+    """Request server with data without blocking the event loop.
+
+    Requests are sent with a pooled ``httpx.AsyncClient``. Without
+    ``httpx`` installed, ``request_server`` is run in a thread instead.
+
+    :param service: Service name
+    :param data: Data to send, ``bytes`` are sent as ``application/octet-stream``
+                 and binary responses are returned as ``bytes``
+    :param endpoint: Endpoint to hit
+    :param args: Arguments to pass
+    :param type: Type of request
+    """
+    if importlib.util.find_spec('httpx') is None:
+        return await to_thread(
+            request_server,
+            service=service,
+            data=data,
+            endpoint=endpoint,
+            args=args,
+            type=type,
+        )
+    await _ahandshake(service)
+    return await _arequest_server(
+        service=service, data=data, endpoint=endpoint, args=args, type=type
+    )
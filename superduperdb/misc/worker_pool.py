@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import sys
+import threading
+import typing as t
+import weakref
+
+import dill
+
+from superduperdb import logging
+
+# Environment variables limiting the threads of BLAS and OpenMP libraries
+THREAD_LIMIT_VARIABLES = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+
+# Function of the current worker process, loaded once by ``_init_worker``
+_worker_function: t.Optional[t.Callable] = None
+
+
+def _limit_threads(threads: int):
+    for variable in THREAD_LIMIT_VARIABLES:
+        os.environ[variable] = str(threads)
+    # Libraries loaded before the worker started (e.g. inherited on fork)
+    # ignore the environment, and are limited at runtime
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        pass
+    else:
+        threadpool_limits(threads)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+
+
+def _init_worker(function: bytes, threads: int):
+    global _worker_function
+    if threads:
+        _limit_threads(threads)
+    _worker_function = dill.loads(function)
+
+
+def _call_worker(item):
+    assert _worker_function is not None
+    return _worker_function(item)
+
+
+def _terminate(pool):
+    pool.terminate()
+
+
+class WorkerPool:
+    """Pool of long-lived processes calling a function on items.
+
+    The function is serialized once, when the pool starts, and each worker
+    loads it once, instead of with every call. Workers keep running until
+    the pool is closed.
+
+    :param function: Function of a single item
+    :param processes: Number of worker processes
+    :param chunksize: Number of items sent to a worker at once, ``0`` to
+                      split each call in about 4 chunks per worker
+    :param threads_per_worker: Maximum number of BLAS and OpenMP threads of
+                               each worker, ``0`` for no limit
+    """
+
+    def __init__(
+        self,
+        function: t.Callable,
+        processes: int,
+        chunksize: int = 0,
+        threads_per_worker: int = 1,
+    ):
+        if processes < 1:
+            raise ValueError('processes must be at least 1')
+        self.function = function
+        self.processes = processes
+        self.chunksize = chunksize
+        self.threads_per_worker = threads_per_worker
+        self._pool: t.Optional[t.Any] = None
+        self._finalizer: t.Optional[weakref.finalize] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Copies start their own workers
+        state = self.__dict__.copy()
+        state.update(_pool=None, _finalizer=None, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether the worker processes are started."""
+        return self._pool is not None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                logging.info(f'Starting {self.processes} worker processes')
+                self._pool = multiprocessing.Pool(
+                    processes=self.processes,
+                    initializer=_init_worker,
+                    initargs=(dill.dumps(self.function), self.threads_per_worker),
+                )
+                # Workers of pools which are not closed are stopped on
+                # garbage collection and at exit
+                self._finalizer = weakref.finalize(self, _terminate, self._pool)
+            return self._pool
+
+    def map(self, items: t.Sequence) -> t.List:
+        """Call the function on items in the workers, keeping their order.
+
+        :param items: Items to call the function on
+        """
+        if not len(items):
+            return []
+        chunksize = self.chunksize
+        if not chunksize:
+            chunksize = max(1, -(-len(items) // (4 * self.processes)))
+        pool = self._get_pool()
+        return list(pool.imap(_call_worker, items, chunksize=chunksize))
+
+    def close(self):
+        """Stop the workers, after they finish the items already sent."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            if self._finalizer is not None:
+                self._finalizer.detach()
+                self._finalizer = None
+        if pool is not None:
+            pool.close()
+            pool.join()
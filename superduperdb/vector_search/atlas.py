@@ -4,6 +4,7 @@ import re
 import typing as t
 from functools import cached_property
 
+import numpy
 import pymongo
 
 from superduperdb import CFG, logging
@@ -143,8 +144,19 @@ class MongoAtlasVectorSearcher(BaseVectorSearcher):
         :param n: number of nearest vectors to return
         :param within_ids: list of IDs to search within
         """
-        h = self.index.find_one({'id': id})
-        return self.find_nearest_from_array(h, n=n, within_ids=within_ids)
+        return self.find_nearest_from_array(
+            self.get_vector(id), n=n, within_ids=within_ids
+        )
+
+    def get_vector(self, _id: str) -> numpy.ndarray:
+        """Get the vector stored for an id.
+
+        :param _id: id of the vector
+        """
+        document = self.index.find_one({'id': _id})
+        if document is None:
+            raise KeyError(_id)
+        return numpy.array(document['vector'])
 
     def find_nearest_from_array(self, h, n=100, within_ids=None):
         """Find the nearest vectors to the given vector.
@@ -8,6 +8,8 @@ from dataclasses import dataclass, field
 import numpy
 import numpy.typing
 
+from superduperdb.vector_search import kernels
+
 if t.TYPE_CHECKING:
     from superduperdb.components.vector_index import VectorIndex
 
@@ -22,6 +24,9 @@ class BaseVectorSearcher(ABC):
     :param measure: measure to assess similarity
     """
 
+    # Number of results first searched by ``find_in_range_from_arrays``
+    _RANGE_FETCH = 100
+
     @abstractmethod
     def __init__(
         self,
@@ -88,6 +93,13 @@ class BaseVectorSearcher(ABC):
         :param ids: t.Sequence of ids of vectors.
         """
 
+    @abstractmethod
+    def get_vector(self, _id: str) -> numpy.ndarray:
+        """Get the vector stored for an id.
+
+        :param _id: id of the vector
+        """
+
     @abstractmethod
     def find_nearest_from_id(
         self,
@@ -118,6 +130,114 @@ class BaseVectorSearcher(ABC):
         :param within_ids: list of ids to search within
         """
 
+    def find_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """
+        Find the nearest vectors to each of the given vectors.
+
+        Searchers which can score several queries at once should override this.
+
+        :param h: 2-d array of vectors, one query per row
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        return [
+            self.find_nearest_from_array(x, n=n, within_ids=within_ids)
+            for x in self.to_numpy(h)
+        ]
+
+    def find_in_range_from_id(
+        self,
+        _id,
+        min_score: float,
+        n: t.Optional[int] = None,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the vectors scoring at least ``min_score`` with the given id.
+
+        :param _id: id of the vector
+        :param min_score: minimum score of the results
+        :param n: maximum number of results, all if ``None``
+        :param within_ids: list of ids to search within
+        """
+        return self._find_in_range(
+            lambda _, k: [self.find_nearest_from_id(_id, n=k, within_ids=within_ids)],
+            1,
+            min_score,
+            n,
+            len(within_ids) if within_ids else len(self),
+        )[0]
+
+    def find_in_range_from_array(
+        self,
+        h: numpy.typing.ArrayLike,
+        min_score: float,
+        n: t.Optional[int] = None,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the vectors scoring at least ``min_score`` with the given vector.
+
+        :param h: vector
+        :param min_score: minimum score of the results
+        :param n: maximum number of results, all if ``None``
+        :param within_ids: list of ids to search within
+        """
+        h = self.to_numpy(h)[None, :]
+        return self.find_in_range_from_arrays(h, min_score, n=n, within_ids=within_ids)[
+            0
+        ]
+
+    def find_in_range_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        min_score: float,
+        n: t.Optional[int] = None,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """
+        Find the vectors scoring at least ``min_score`` with each given vector.
+
+        Results are ranked by score. The nearest ``_RANGE_FETCH`` vectors
+        are searched first, and twice as many until the last of them
+        scores below ``min_score``. Searchers which can select by score
+        directly should override this.
+
+        :param h: 2-d array of vectors, one query per row
+        :param min_score: minimum score of the results
+        :param n: maximum number of results per query, all if ``None``
+        :param within_ids: list of ids to search within
+        """
+        arr: numpy.ndarray = numpy.asarray(self.to_numpy(h))
+        return self._find_in_range(
+            lambda queries, k: self.find_nearest_from_arrays(
+                arr[queries], n=k, within_ids=within_ids
+            ),
+            arr.shape[0],
+            min_score,
+            n,
+            len(within_ids) if within_ids else len(self),
+        )
+
+    def _find_in_range(self, search, n_queries, min_score, n, size):
+        results: t.List[t.Any] = [([], [])] * n_queries
+        k = min(self._RANGE_FETCH if n is None else n, size)
+        pending = list(range(n_queries)) if k > 0 else []
+        while pending:
+            retry = []
+            for q, (ids, scores) in zip(pending, search(pending, k)):
+                keep = [i for i, score in enumerate(scores) if score >= min_score]
+                results[q] = [ids[i] for i in keep], [scores[i] for i in keep]
+                if len(keep) == len(ids) == k and k < size and k != n:
+                    retry.append(q)
+            pending, k = retry, min(2 * k, size if n is None else n, size)
+        return results
+
     def post_create(self):
         """Post create method.
 
@@ -125,6 +245,13 @@ class BaseVectorSearcher(ABC):
         to perform a task after all vectors have been added
         """
 
+    def drop(self):
+        """Release the vectors held by the searcher.
+
+        The searcher must not be used afterwards. Searchers which only hold
+        memory have nothing to release beyond their references.
+        """
+
 
 class VectorIndexMeasureType(str, enum.Enum):
     """Enum for vector index measure types."""
@@ -157,10 +284,12 @@ class VectorItem:
 
     :param id: ID of the vector
     :param vector: Vector of the item
+    :param source: ID of the source document, if it has several vectors
     """
 
     id: str
     vector: numpy.ndarray
+    source: t.Optional[str] = None
 
     @classmethod
     def create(
@@ -168,13 +297,17 @@ class VectorItem:
         *,
         id: str,
         vector: numpy.typing.ArrayLike,
+        source: t.Optional[str] = None,
     ) -> VectorItem:
         """Creates a vector item from id and vector.
 
         :param id: ID of the vector
         :param vector: Vector of the item
+        :param source: ID of the source document, if it has several vectors
         """
-        return VectorItem(id=id, vector=BaseVectorSearcher.to_numpy(vector))
+        return VectorItem(
+            id=id, vector=BaseVectorSearcher.to_numpy(vector), source=source
+        )
 
     def to_dict(self) -> t.Dict:
         """Converts the vector item to a dictionary."""
@@ -199,7 +332,7 @@ def l2(x, y):
     :param x: numpy.ndarray
     :param y: numpy.ndarray
     """
-    return numpy.array([-numpy.linalg.norm(x - y, axis=1)])
+    return kernels.similarities(x, y, 'l2')
 
 
 def dot(x, y):
@@ -217,10 +350,36 @@ def cosine(x, y):
     :param x: numpy.ndarray
     :param y: numpy.ndarray, y should be normalized!
     """
-    x = x / numpy.linalg.norm(x, axis=1)[:, None]
     # y which implies all vectors in vectordatabase
     # has normalized vectors.
-    return dot(x, y)
+    return kernels.similarities(x, y, 'cosine')
 
 
 measures = {'cosine': cosine, 'dot': dot, 'l2': l2}
+
+
+def score_threshold(
+    measure: t.Any,
+    min_score: t.Optional[float] = None,
+    max_distance: t.Optional[float] = None,
+) -> t.Optional[float]:
+    """Minimum score of a range search.
+
+    Scores of ``l2`` are negative distances, and scores of ``cosine`` are
+    one minus the cosine distance, so that ``max_distance`` can be
+    converted to a minimum score. If both are given, the stricter applies.
+
+    :param measure: Measure of the vector index
+    :param min_score: Minimum score of the results
+    :param max_distance: Maximum distance of the results
+    """
+    if max_distance is None:
+        return min_score
+    measure = getattr(measure, 'value', measure)
+    if measure == 'l2':
+        threshold = -max_distance
+    elif measure == 'cosine':
+        threshold = 1 - max_distance
+    else:
+        raise ValueError(f'max_distance is not defined for measure {measure!r}')
+    return threshold if min_score is None else max(threshold, min_score)
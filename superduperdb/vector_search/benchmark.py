@@ -0,0 +1,250 @@
+import json
+import platform
+import tempfile
+import time
+import typing as t
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+import superduperdb as s
+from superduperdb import logging
+from superduperdb.vector_search import kernels
+from superduperdb.vector_search.base import BaseVectorSearcher, VectorItem
+
+# Searchers which need an external service are not benchmarked
+EXCLUDED = ('mongodb+srv',)
+
+
+def clustered_embeddings(
+    size: int,
+    dimensions: int,
+    clusters: int = 100,
+    spread: float = 0.1,
+    seed: int = 0,
+) -> numpy.ndarray:
+    """Generate ``float32`` embeddings drawn around random cluster centres.
+
+    :param size: Number of embeddings
+    :param dimensions: Dimensions of the embeddings
+    :param clusters: Number of clusters
+    :param spread: Standard deviation of the embeddings around their centre
+    :param seed: Seed of the random generator
+    """
+    rng = numpy.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions))
+    h = centres[rng.integers(0, clusters, size=size)]
+    h += rng.normal(scale=spread, size=(size, dimensions))
+    return h.astype(numpy.float32)
+
+
+def ground_truth(
+    h: numpy.ndarray, queries: numpy.ndarray, n: int, measure: str
+) -> numpy.ndarray:
+    """Positions of the exact ``n`` nearest rows of ``h`` to each query.
+
+    :param h: 2-d array of vectors
+    :param queries: 2-d array of queries
+    :param n: Number of nearest rows
+    :param measure: ``l2``, ``dot`` or ``cosine``
+    """
+    if measure == 'cosine':
+        h = h / numpy.linalg.norm(h, axis=1)[:, None]
+    scores = kernels.similarities(queries, h, measure)
+    n = min(n, h.shape[0])
+    top = numpy.argpartition(-scores, n - 1, axis=1)[:, :n]
+    order = numpy.argsort(-numpy.take_along_axis(scores, top, axis=1), axis=1)
+    return numpy.take_along_axis(top, order, axis=1)
+
+
+def _percentile(latencies: t.Sequence[float], q: float) -> float:
+    return float(numpy.percentile(latencies, q) * 1000) if latencies else 0.0
+
+
+def benchmark_searcher(
+    searcher_cls: t.Type[BaseVectorSearcher],
+    h: numpy.ndarray,
+    queries: numpy.ndarray,
+    truth: numpy.ndarray,
+    n: int = 10,
+    concurrency: t.Sequence[int] = (1,),
+    measure: str = 'cosine',
+    updates: int = 1000,
+    batch_size: int = 100,
+) -> t.Dict[str, t.Any]:
+    """Measure the build time, throughput, recall and latency of a searcher.
+
+    The searcher is built from all rows of ``h`` at once. ``updates``
+    further vectors are then added and deleted in batches of
+    ``batch_size``, and the queries are searched once per level of
+    ``concurrency``.
+
+    :param searcher_cls: Searcher class, built with ``identifier``,
+                         ``dimensions`` and ``measure``
+    :param h: 2-d array of vectors
+    :param queries: 2-d array of queries
+    :param truth: Positions in ``h`` of the nearest rows to each query
+    :param n: Number of results per query
+    :param concurrency: Numbers of threads searching at the same time
+    :param measure: ``l2``, ``dot`` or ``cosine``
+    :param updates: Number of vectors added and deleted
+    :param batch_size: Number of vectors added or deleted at a time
+    """
+    ids = [str(i) for i in range(h.shape[0])]
+    start = time.perf_counter()
+    searcher = searcher_cls(
+        identifier=f'benchmark-{uuid.uuid4().hex}',
+        dimensions=h.shape[1],
+        measure=measure,
+    )
+    searcher.add([VectorItem(id=i, vector=v) for i, v in zip(ids, h)])
+    searcher.post_create()
+    build = time.perf_counter() - start
+
+    extra = clustered_embeddings(updates, h.shape[1], seed=1)
+    extra_ids = [f'update-{i}' for i in range(updates)]
+    start = time.perf_counter()
+    for i in range(0, updates, batch_size):
+        searcher.add(
+            [
+                VectorItem(id=_id, vector=v)
+                for _id, v in zip(
+                    extra_ids[i : i + batch_size], extra[i : i + batch_size]
+                )
+            ]
+        )
+    searcher.post_create()
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(0, updates, batch_size):
+        searcher.delete(extra_ids[i : i + batch_size])
+    deleted = time.perf_counter() - start
+
+    expected = [{ids[j] for j in row} for row in truth]
+    result = {
+        'searcher': searcher_cls.__name__,
+        'size': h.shape[0],
+        'dimensions': h.shape[1],
+        'n': n,
+        'measure': measure,
+        'build_seconds': build,
+        'add_per_second': updates / added if added else None,
+        'delete_per_second': updates / deleted if deleted else None,
+        'searches': [],
+    }
+
+    def search(q):
+        start = time.perf_counter()
+        found, _ = searcher.find_nearest_from_array(q, n=n)
+        return found, time.perf_counter() - start
+
+    for threads in concurrency:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            found = list(pool.map(search, queries))
+        elapsed = time.perf_counter() - start
+        latencies = [latency for _, latency in found]
+        hits = sum(len(set(f) & e) for (f, _), e in zip(found, expected))
+        result['searches'].append(
+            {
+                'concurrency': threads,
+                'recall': hits / sum(len(e) for e in expected),
+                'p50_ms': _percentile(latencies, 50),
+                'p99_ms': _percentile(latencies, 99),
+                'qps': len(queries) / elapsed if elapsed else None,
+            }
+        )
+    return result
+
+
+def run_benchmark(
+    searchers: t.Optional[t.Sequence[str]] = None,
+    sizes: t.Sequence[int] = (10_000,),
+    dimensions: t.Sequence[int] = (64,),
+    ns: t.Sequence[int] = (10,),
+    concurrency: t.Sequence[int] = (1, 4),
+    queries: int = 100,
+    measure: str = 'cosine',
+    updates: int = 1000,
+    output: t.Optional[str] = None,
+) -> t.Dict[str, t.Any]:
+    """Benchmark the registered vector searchers on synthetic embeddings.
+
+    Every searcher is benchmarked with ``benchmark_searcher`` for each
+    combination of ``sizes``, ``dimensions`` and ``ns``. The report is
+    written as JSON to ``output``, so that runs can be compared.
+
+    :param searchers: Types of searchers, e.g. ``in_memory``, all if ``None``
+    :param sizes: Numbers of vectors
+    :param dimensions: Dimensions of the vectors
+    :param ns: Numbers of results per query
+    :param concurrency: Numbers of threads searching at the same time
+    :param queries: Number of queries
+    :param measure: ``l2``, ``dot`` or ``cosine``
+    :param updates: Number of vectors added and deleted after the build
+    :param output: Path of the JSON report
+    """
+    from superduperdb.backends.base.backends import vector_searcher_implementations
+
+    if searchers is None:
+        searchers = [k for k in vector_searcher_implementations if k not in EXCLUDED]
+    report: t.Dict[str, t.Any] = {
+        'environment': {
+            'superduperdb': s.__version__,
+            'numpy': numpy.__version__,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+        },
+        'config': {
+            'searchers': list(searchers),
+            'sizes': list(sizes),
+            'dimensions': list(dimensions),
+            'ns': list(ns),
+            'concurrency': list(concurrency),
+            'queries': queries,
+            'measure': measure,
+            'updates': updates,
+        },
+        'results': [],
+    }
+
+    lance_home = s.CFG.lance_home
+    with tempfile.TemporaryDirectory() as directory:
+        # Searchers writing to disk do so in a temporary directory
+        s.CFG.lance_home = directory
+        try:
+            for size in sizes:
+                for d in dimensions:
+                    h = clustered_embeddings(size, d)
+                    if measure == 'cosine':
+                        # Not all searchers normalize their rows, so that
+                        # cosine is benchmarked on unit vectors
+                        h /= numpy.linalg.norm(h, axis=1)[:, None]
+                    q = clustered_embeddings(queries, d, seed=2)
+                    for n in ns:
+                        truth = ground_truth(h, q, n, measure)
+                        for name in searchers:
+                            logging.info(f'Benchmarking {name}: {size} x {d}, n={n}')
+                            cls: t.Type[
+                                BaseVectorSearcher
+                            ] = vector_searcher_implementations[name]
+                            result = benchmark_searcher(
+                                cls,
+                                h,
+                                q,
+                                truth,
+                                n=n,
+                                concurrency=concurrency,
+                                measure=measure,
+                                updates=updates,
+                            )
+                            result['type'] = name
+                            report['results'].append(result)
+        finally:
+            s.CFG.lance_home = lance_home
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,73 @@
+import typing as t
+
+ResultType = t.Tuple[t.List[str], t.List[float]]
+
+FUSIONS = ('rrf', 'weighted_sum')
+
+
+def normalize_scores(scores: t.Sequence[float], measure: t.Any) -> t.List[float]:
+    """Map the scores of a vector index to ``[0, 1]``, higher is better.
+
+    ``cosine`` scores are mapped from ``[-1, 1]`` and ``l2`` scores, which
+    are negative distances, to ``1 / (1 + distance)``. Scores of ``dot``
+    and custom measures are unbounded, and are min-max scaled within the
+    results.
+
+    :param scores: Scores of the results of a query
+    :param measure: Measure of the vector index
+    """
+    measure = getattr(measure, 'value', measure)
+    if measure == 'cosine':
+        return [(score + 1) / 2 for score in scores]
+    if measure == 'l2':
+        return [1 / (1 - score) for score in scores]
+    if not scores:
+        return []
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0 for _ in scores]
+    return [(score - low) / (high - low) for score in scores]
+
+
+def fuse(
+    results: t.Sequence[ResultType],
+    measures: t.Sequence[t.Any],
+    fusion: str = 'rrf',
+    weights: t.Optional[t.Sequence[float]] = None,
+    rrf_k: int = 60,
+    n: t.Optional[int] = None,
+) -> ResultType:
+    """Merge the results of several vector indices into one ranking.
+
+    With ``rrf`` (reciprocal rank fusion) a result scores
+    ``sum(weight / (rrf_k + rank))`` over the indices which found it,
+    ranks starting at 1, so that only the ranks matter. With
+    ``weighted_sum`` the scores normalized with ``normalize_scores`` are
+    summed, weighted per index. Results missing from an index score
+    nothing for it.
+
+    :param results: Ids and scores found by each index, ranked
+    :param measures: Measure of each index
+    :param fusion: ``rrf`` or ``weighted_sum``
+    :param weights: Weight of each index, ``1`` by default
+    :param rrf_k: Constant damping the weight of the first ranks of ``rrf``
+    :param n: Number of merged results, all if ``None``
+    """
+    if fusion not in FUSIONS:
+        raise ValueError(f'Unknown fusion {fusion!r}, expected one of {FUSIONS}')
+    if weights is None:
+        weights = [1.0] * len(results)
+    if not len(weights) == len(measures) == len(results):
+        raise ValueError('Expected one measure and weight per index')
+
+    fused: t.Dict[str, float] = {}
+    for (ids, scores), measure, weight in zip(results, measures, weights):
+        if fusion == 'rrf':
+            contributions = [weight / (rrf_k + rank) for rank in range(1, len(ids) + 1)]
+        else:
+            contributions = [weight * s for s in normalize_scores(scores, measure)]
+        for _id, contribution in zip(ids, contributions):
+            fused[_id] = fused.get(_id, 0.0) + contribution
+
+    ranked = sorted(fused.items(), key=lambda x: -x[1])[:n]
+    return [_id for _id, _ in ranked], [score for _, score in ranked]
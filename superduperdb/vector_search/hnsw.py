@@ -0,0 +1,327 @@
+import heapq
+import math
+import typing as t
+
+import numpy
+
+from superduperdb import logging
+from superduperdb.vector_search.base import (
+    BaseVectorSearcher,
+    VectorIndexMeasureType,
+    VectorItem,
+)
+
+if t.TYPE_CHECKING:
+    from superduperdb.components.vector_index import VectorIndex
+
+
+class HnswVectorSearcher(BaseVectorSearcher):
+    """
+    Approximate nearest neighbour search over a hierarchical small-world graph.
+
+    Pure ``numpy`` implementation of HNSW (Malkov & Yashunin, 2016).
+    Deleted vectors are tombstoned: they keep routing queries through the
+    graph but are never returned.
+
+    :param identifier: Unique string identifier of index
+    :param dimensions: Dimension of the vector embeddings
+    :param h: Seed vectors ``numpy.ndarray``
+    :param index: list of IDs
+    :param measure: measure to assess similarity
+    :param M: Maximum number of links per node on the upper layers
+              (``2 * M`` on the bottom layer)
+    :param ef_construction: Size of the candidate list while building the graph
+    :param ef_search: Size of the candidate list while searching
+    :param seed: Seed for the random level generator
+    """
+
+    name = 'hnsw'
+
+    def __init__(
+        self,
+        identifier: str,
+        dimensions: int,
+        h: t.Optional[numpy.ndarray] = None,
+        index: t.Optional[t.List[str]] = None,
+        measure: t.Union[str, VectorIndexMeasureType] = 'cosine',
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 50,
+        seed: t.Optional[int] = None,
+    ):
+        self.identifier = identifier
+        self.dimensions = dimensions
+        self.measure = (
+            measure.value if isinstance(measure, VectorIndexMeasureType) else measure
+        )
+        if self.measure not in ('cosine', 'dot', 'l2'):
+            raise ValueError(f'Measure {measure!r} is not supported by HNSW')
+
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_multiplier = 1 / math.log(max(M, 2))
+        self._rng = numpy.random.default_rng(seed)
+        self._BRUTE_FORCE_SELECTIVITY = 0.1
+
+        self._vectors = numpy.empty((0, dimensions), dtype=numpy.float32)
+        self._deleted = numpy.zeros(0, dtype=bool)
+        self._ids: t.List[str] = []
+        self._links: t.List[t.List[t.List[int]]] = []
+        self.lookup: t.Dict[str, int] = {}
+        self._entry_point: t.Optional[int] = None
+        self._max_level = -1
+
+        if h is not None:
+            assert index is not None
+            self.add([VectorItem.create(id=_id, vector=v) for _id, v in zip(index, h)])
+
+    @classmethod
+    def from_component(cls, vi: 'VectorIndex'):
+        """Create a vector searcher from a vector index.
+
+        ``M``, ``ef_construction`` and ``ef_search`` are read from
+        ``vi.vector_search_config.parameters``.
+
+        :param vi: VectorIndex instance
+        """
+        config = vi.vector_search_config
+        parameters = {
+            k: v
+            for k, v in config.parameters.items()
+            if k in ('M', 'ef_construction', 'ef_search', 'seed')
+        }
+        return cls(
+            identifier=config.id,
+            dimensions=config.dimensions,
+            measure=config.measure,
+            **parameters,
+        )
+
+    def __len__(self):
+        return len(self.lookup)
+
+    def _prepare(self, h) -> numpy.ndarray:
+        h = numpy.asarray(self.to_numpy(h), dtype=numpy.float32).reshape(-1)
+        if self.measure == 'cosine':
+            norm = numpy.linalg.norm(h)
+            if norm > 0:
+                h = h / norm
+        return h
+
+    def _scores(self, q: numpy.ndarray, nodes) -> numpy.ndarray:
+        vectors = self._vectors[nodes]
+        if self.measure == 'l2':
+            return -numpy.linalg.norm(vectors - q, axis=1)
+        return vectors @ q
+
+    def _random_level(self) -> int:
+        return int(-math.log(1.0 - self._rng.random()) * self._level_multiplier)
+
+    def _search_layer(
+        self, q: numpy.ndarray, entry_points: t.List[int], ef: int, level: int
+    ) -> t.List[t.Tuple[float, int]]:
+        # ``candidates`` is a min-heap on distance, ``found`` a max-heap holding
+        # the ``ef`` closest nodes seen so far; distance is the negated score.
+        distances = -self._scores(q, entry_points)
+        visited = set(entry_points)
+        candidates = [(float(d), node) for d, node in zip(distances, entry_points)]
+        heapq.heapify(candidates)
+        found = [(-d, node) for d, node in candidates]
+        heapq.heapify(found)
+        while len(found) > ef:
+            heapq.heappop(found)
+
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if distance > -found[0][0]:
+                break
+            neighbours = [n for n in self._links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            for d, n in zip((-self._scores(q, neighbours)).tolist(), neighbours):
+                if len(found) < ef or d < -found[0][0]:
+                    heapq.heappush(candidates, (d, n))
+                    heapq.heappush(found, (-d, n))
+                    if len(found) > ef:
+                        heapq.heappop(found)
+        return sorted((-d, n) for d, n in found)
+
+    def _select_neighbours(
+        self, candidates: t.List[t.Tuple[float, int]], m: int
+    ) -> t.List[int]:
+        # Heuristic selection from the HNSW paper: keep a candidate only if it
+        # is closer to the base node than to every neighbour already kept.
+        if len(candidates) <= m:
+            return [n for _, n in candidates]
+        nodes = [n for _, n in candidates]
+        vectors = self._vectors[nodes]
+        if self.measure == 'l2':
+            squared = (vectors**2).sum(axis=1)
+            pairwise = numpy.sqrt(
+                numpy.maximum(
+                    squared[:, None] + squared[None, :] - 2 * vectors @ vectors.T, 0
+                )
+            )
+        else:
+            pairwise = -(vectors @ vectors.T)
+
+        selected: t.List[int] = []
+        pruned: t.List[int] = []
+        for i, (distance, _) in enumerate(candidates):
+            if len(selected) >= m:
+                break
+            if all(pairwise[i, j] > distance for j in selected):
+                selected.append(i)
+            else:
+                pruned.append(i)
+        selected.extend(pruned[: m - len(selected)])
+        return [nodes[i] for i in selected]
+
+    def _shrink(self, node: int, level: int):
+        m = self.M0 if level == 0 else self.M
+        links = self._links[node][level]
+        if len(links) <= m:
+            return
+        distances = -self._scores(self._vectors[node], links)
+        candidates = sorted(zip(distances.tolist(), links))
+        self._links[node][level] = self._select_neighbours(candidates, m)
+
+    def _allocate(self, n: int):
+        required = len(self._ids) + n
+        capacity = self._vectors.shape[0]
+        if required <= capacity:
+            return
+        capacity = max(required, 2 * capacity, 1024)
+        vectors = numpy.empty((capacity, self.dimensions), dtype=numpy.float32)
+        vectors[: len(self._ids)] = self._vectors[: len(self._ids)]
+        deleted = numpy.zeros(capacity, dtype=bool)
+        deleted[: len(self._ids)] = self._deleted[: len(self._ids)]
+        self._vectors, self._deleted = vectors, deleted
+
+    def _insert(self, _id: str, vector: numpy.ndarray):
+        if _id in self.lookup:
+            self._deleted[self.lookup.pop(_id)] = True
+
+        node = len(self._ids)
+        level = self._random_level()
+        self._vectors[node] = vector
+        self._ids.append(_id)
+        self._links.append([[] for _ in range(level + 1)])
+        self.lookup[_id] = node
+
+        if self._entry_point is None:
+            self._entry_point, self._max_level = node, level
+            return
+
+        entry_points = [self._entry_point]
+        for lc in range(self._max_level, level, -1):
+            entry_points = [self._search_layer(vector, entry_points, 1, lc)[0][1]]
+
+        for lc in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(vector, entry_points, self.ef_construction, lc)
+            neighbours = self._select_neighbours(found, self.M)
+            self._links[node][lc] = neighbours
+            for neighbour in neighbours:
+                self._links[neighbour][lc].append(node)
+                self._shrink(neighbour, lc)
+            entry_points = [n for _, n in found]
+
+        if level > self._max_level:
+            self._entry_point, self._max_level = node, level
+
+    def add(self, items: t.Sequence[VectorItem]) -> None:
+        """Add vectors to the graph.
+
+        Existing IDs are replaced.
+
+        :param items: List of vectors to add
+        """
+        self._allocate(len(items))
+        for item in items:
+            self._insert(item.id, self._prepare(item.vector))
+
+    def delete(self, ids: t.Sequence[str]) -> None:
+        """Delete vectors from the index.
+
+        :param ids: List of IDs to delete
+        """
+        for _id in ids:
+            node = self.lookup.pop(_id, None)
+            if node is not None:
+                self._deleted[node] = True
+
+    def get_vector(self, _id):
+        """Get the vector stored for an id.
+
+        :param _id: ID of the vector
+        """
+        return self._vectors[self.lookup[_id]]
+
+    def find_nearest_from_id(self, _id, n=100, within_ids=()):
+        """Find the nearest vectors to the given ID.
+
+        :param _id: ID of the vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of IDs to search within
+        """
+        return self.find_nearest_from_array(
+            self.get_vector(_id), n=n, within_ids=within_ids
+        )
+
+    def find_nearest_from_array(self, h, n=100, within_ids=()):
+        """Find the nearest vectors to the given vector.
+
+        ``within_ids`` is applied as a boolean mask over the nodes during the
+        graph search. Filters keeping at most ``_BRUTE_FORCE_SELECTIVITY`` of
+        the nodes are scored exhaustively instead.
+
+        :param h: vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of IDs to search within
+        """
+        if not self.lookup:
+            logging.error(
+                'Tried to search on an empty vector database',
+                'Vectors are not yet loaded in vector database.',
+                '\nPlease check if model outputs are ready.',
+            )
+            return [], []
+
+        q = self._prepare(h)
+
+        allowed = ~self._deleted
+        n_allowed = len(self.lookup)
+        if within_ids:
+            nodes = [self.lookup[_id] for _id in within_ids if _id in self.lookup]
+            allowed = numpy.zeros(len(self._deleted), dtype=bool)
+            allowed[nodes] = True
+            n_allowed = int(allowed.sum())
+            if n_allowed <= self._BRUTE_FORCE_SELECTIVITY * len(self.lookup):
+                nodes = numpy.flatnonzero(allowed)
+                scores = self._scores(q, nodes)
+                top = numpy.argsort(-scores)[:n]
+                return [self._ids[i] for i in nodes[top]], scores[top].tolist()
+
+        assert self._entry_point is not None
+        n = min(n, n_allowed)
+        ef = max(self.ef_search, n)
+        while True:
+            entry_points = [self._entry_point]
+            for lc in range(self._max_level, 0, -1):
+                entry_points = [self._search_layer(q, entry_points, 1, lc)[0][1]]
+            found = [
+                (d, node)
+                for d, node in self._search_layer(q, entry_points, ef, 0)
+                if allowed[node]
+            ]
+            # Tombstones and filtered nodes may crowd out allowed results:
+            # widen the beam and retry.
+            if len(found) >= n or ef >= len(self._ids):
+                break
+            ef *= 2
+
+        found = found[:n]
+        return [self._ids[node] for _, node in found], [-d for d, _ in found]
@@ -1,20 +1,50 @@
+import copy
+import datetime
+import json
+import os
 import typing as t
 
 import numpy
 
 from superduperdb import logging
+from superduperdb.vector_search import kernels
 from superduperdb.vector_search.base import BaseVectorSearcher, VectorItem, measures
+from superduperdb.vector_search.quantization import quantizers
+
+if t.TYPE_CHECKING:
+    from superduperdb.components.vector_index import VectorIndex
 
 
 class InMemoryVectorSearcher(BaseVectorSearcher):
     """
     Simple hash-set for looking up with vector similarity.
 
+    Vectors are stored in a preallocated buffer which doubles in capacity
+    when full. Updates overwrite rows in place, deletes are tombstoned and
+    the buffer is compacted once the tombstones exceed
+    ``_COMPACTION_THRESHOLD`` of the rows.
+
+    Named measures are scored with the kernels of
+    ``superduperdb.vector_search.kernels``, ``_BLOCK_SIZE`` rows at a time,
+    using the squared norms of the rows which are kept next to the buffer.
+
+    With ``quantization`` set, the buffer holds ``float16`` or ``int8`` codes
+    and queries are scored against the codes directly.
+
+    The index can be written to a snapshot directory with ``save`` and
+    restored with ``load``, which memory-maps the vectors instead of
+    reading them into memory.
+
     :param identifier: Unique string identifier of index
     :param dimensions: Dimension of the vector embeddings
     :param h: array/ tensor of vectors
     :param index: list of IDs
     :param measure: measure to assess similarity
+    :param quantization: Storage mode of the vectors (``float16`` or ``int8``),
+                         ``None`` keeps full precision
+    :param rerank_factor: If set, keep a ``float32`` copy of the vectors and
+                          re-score the top ``n * rerank_factor`` quantized
+                          candidates exactly
     """
 
     name = 'vanilla'
@@ -26,51 +56,270 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
         h: t.Optional[numpy.ndarray] = None,
         index: t.Optional[t.List[str]] = None,
         measure: t.Union[str, t.Callable] = 'cosine',
+        quantization: t.Optional[str] = None,
+        rerank_factor: int = 0,
     ):
         self.identifier = identifier
         self.dimensions = dimensions
         self._cache: t.Sequence[VectorItem] = []
         self._CACHE_SIZE = 10000
+        self._COMPACTION_THRESHOLD = 0.25
+        self._BLOCK_SIZE = kernels.BLOCK_SIZE
+        self._BRUTE_FORCE_SELECTIVITY = 0.1
 
-        self.measure = measure
+        self._measure_name = None
         if isinstance(measure, str):
-            self.measure = measures[measure]
+            self._measure_name = getattr(measure, 'value', measure)
+            measure = measures[measure]
+        self.measure: t.Callable = measure
+
+        self.quantization = quantization
+        self.quantizer = None
+        if quantization is not None:
+            if quantization not in quantizers:
+                raise ValueError(f'Unknown quantization {quantization!r}')
+            if self._measure_name is None:
+                raise ValueError('Quantization requires a named measure')
+            self.quantizer = quantizers[quantization]()
+        self.rerank_factor = rerank_factor if self.quantizer is not None else 0
+
+        self._h: t.Optional[numpy.ndarray] = None
+        self._norms: t.Optional[numpy.ndarray] = None
+        self._exact: t.Optional[numpy.ndarray] = None
+        self._deleted = numpy.zeros(0, dtype=bool)
+        self._size = 0
+        self._n_deleted = 0
+        self.index: t.List[t.Optional[str]] = []
+        self.lookup: t.Dict[str, int] = {}
 
         if h is not None:
             assert index is not None
             self._setup(h, index)
-        else:
-            self.h = None
-            self.index = None
-            self.lookup = None
 
         self.identifier = identifier
 
+    @classmethod
+    def from_component(cls, vi: 'VectorIndex'):
+        """Create a vector searcher from a vector index.
+
+        ``quantization`` and ``rerank_factor`` are read from
+        ``vi.vector_search_config.parameters``.
+
+        :param vi: VectorIndex instance
+        """
+        config = vi.vector_search_config
+        parameters = {
+            k: v
+            for k, v in config.parameters.items()
+            if k in ('quantization', 'rerank_factor')
+        }
+        return cls(
+            identifier=config.id,
+            dimensions=config.dimensions,
+            measure=config.measure,
+            **parameters,
+        )
+
     def __len__(self):
-        if self.h is not None:
-            return self.h.shape[0]
-        else:
-            return 0
+        return len(self.lookup)
+
+    @property
+    def h(self) -> t.Optional[numpy.ndarray]:
+        """Rows of the buffer in use, including tombstoned rows."""
+        if self._h is None:
+            return None
+        return self._h[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the vector buffers."""
+        return sum(
+            x.nbytes for x in (self._h, self._norms, self._exact) if x is not None
+        )
+
+    def _vector(self, i: int) -> numpy.ndarray:
+        assert self._h is not None
+        if self._exact is not None:
+            return self._exact[i]
+        if self.quantizer is not None:
+            return self.quantizer.decode(self._h[i : i + 1])[0]
+        return self._h[i]
 
     def _setup(self, h, index):
         h = numpy.array(h) if not isinstance(h, numpy.ndarray) else h
+        self._clear()
+        self._append(h, list(index))
+
+    def _clear(self):
+        self._h = self._norms = self._exact = None
+        self._deleted = numpy.zeros(0, dtype=bool)
+        self._size = 0
+        self._n_deleted = 0
+        self.index = []
+        self.lookup = {}
+
+    def _reserve(self, n: int, dtype):
+        required = self._size + n
+        if self._h is not None and required <= self._h.shape[0]:
+            return
+        capacity = max(required, 2 * (0 if self._h is None else self._h.shape[0]))
+
+        def grow(buffer, shape, dtype):
+            new = numpy.zeros(shape, dtype=dtype)
+            if buffer is not None:
+                new[: self._size] = buffer[: self._size]
+            return new
+
+        self._h = grow(self._h, (capacity, self.dimensions), dtype)
+        self._deleted = grow(self._deleted, capacity, bool)
+        if self._measure_name is not None:
+            self._norms = grow(self._norms, capacity, numpy.float32)
+        if self.quantizer is not None:
+            if self.rerank_factor:
+                self._exact = grow(
+                    self._exact, (capacity, self.dimensions), numpy.float32
+                )
+
+    def _write(self, rows, h: numpy.ndarray):
+        assert self._h is not None
+        if self.quantizer is None:
+            self._h[rows] = h
+            if self._norms is not None:
+                self._norms[rows] = kernels.squared_norms(self._h[rows])
+            return
+        assert self._norms is not None
+        h = h.astype(numpy.float32)
+        old = copy.copy(self.quantizer)
+        if self.quantizer.fit(h):
+            for i in range(0, self._size, self._BLOCK_SIZE):
+                block = slice(i, min(i + self._BLOCK_SIZE, self._size))
+                self._h[block] = self.quantizer.encode(old.decode(self._h[block]))
+                self._norms[block] = self._squared_norms(self._h[block])
+        self._h[rows] = self.quantizer.encode(h)
+        self._norms[rows] = self._squared_norms(self._h[rows])
+        if self._exact is not None:
+            self._exact[rows] = h
 
-        if self.measure == 'cosine':
-            # Normalization is required for cosine, hence preparing
-            # all vectors in advance.
+    def _squared_norms(self, codes: numpy.ndarray) -> numpy.ndarray:
+        assert self.quantizer is not None
+        decoded = self.quantizer.decode(codes)
+        return (decoded * decoded).sum(axis=-1)
+
+    def _append(self, h: numpy.ndarray, index: t.List[str]):
+        if self.quantizer is not None:
+            dtype = self.quantizer.dtype
+        else:
+            dtype = numpy.result_type(h.dtype, numpy.float32)
+            if self._h is not None:
+                dtype = numpy.result_type(self._h.dtype, dtype)
+        self._reserve(len(index), dtype)
+        assert self._h is not None
+
+        start = self._size
+        self._write(slice(start, start + len(index)), h)
+        self._size += len(index)
+        self.index.extend(index)
+        for i, _id in enumerate(index, start=start):
+            if _id in self.lookup:
+                self._tombstone(self.lookup[_id])
+            self.lookup[_id] = i
+
+    def _tombstone(self, i: int):
+        self._deleted[i] = True
+        self.index[i] = None
+        self._n_deleted += 1
+
+    def _compact(self):
+        assert self._h is not None
+        keep = numpy.flatnonzero(~self._deleted[: self._size])
+        for buffer in (self._h, self._norms, self._exact):
+            if buffer is not None:
+                buffer[: len(keep)] = buffer[keep]
+        self._deleted[:] = False
+        self.index = [self.index[i] for i in keep]
+        self.lookup = dict(zip(self.index, range(len(self.index))))
+        self._size = len(keep)
+        self._n_deleted = 0
+
+    def _mask(self, within_ids) -> numpy.ndarray:
+        # Boolean mask over the rows of the buffer, ids which are not
+        # in the index are ignored.
+        positions = numpy.fromiter(
+            (self.lookup.get(_id, -1) for _id in within_ids), dtype=numpy.intp
+        )
+        mask = numpy.zeros(self._size, dtype=bool)
+        mask[positions[positions >= 0]] = True
+        return mask
+
+    def _similarities(self, h: numpy.ndarray, ix=None) -> numpy.ndarray:
+        rows = self.h
+        assert rows is not None
+        if self._measure_name is None:
+            return self.measure(h, rows if ix is None else rows[ix, :])
+
+        if self.quantizer is None:
+            return kernels.similarities(
+                h,
+                rows,
+                self._measure_name,
+                norms=self._norms,
+                rows=ix,
+                block_size=self._BLOCK_SIZE,
+            )
+
+        # Score against the codes, so that only ``_BLOCK_SIZE`` rows are
+        # ever decoded to ``float32`` at a time.
+        h = h.astype(numpy.float32)
+        measure = self._measure_name
+        if measure == 'cosine':
             h = h / numpy.linalg.norm(h, axis=1)[:, None]
-        self.h = h
-        self.index = index
-        self.lookup = dict(zip(index, range(len(index))))
+            measure = 'dot'
+        q, bias = self.quantizer.prepare(h)
+        return kernels.similarities(
+            q,
+            rows,
+            measure,
+            norms=self._norms,
+            rows=ix,
+            bias=bias,
+            q_norms=(h * h).sum(axis=1),
+            block_size=self._BLOCK_SIZE,
+        )
+
+    def _rescore(self, h: numpy.ndarray, top: numpy.ndarray, vectors: numpy.ndarray):
+        # Exact scores of the selected rows
+        if self._measure_name == 'l2':
+            return kernels.l2_exact(h, vectors[top])
+        return numpy.stack(
+            [self.measure(q[None, :], vectors[row])[0] for q, row in zip(h, top)]
+        )
 
-    def find_nearest_from_id(self, _id, n=100):
+    def _rerank(self, h: numpy.ndarray, top: numpy.ndarray, n: int):
+        assert self._exact is not None
+        scores = self._rescore(h, top, self._exact)
+        order = numpy.argsort(-scores, axis=1)[:, :n]
+        top = numpy.take_along_axis(top, order, axis=1)
+        scores = numpy.take_along_axis(scores, order, axis=1)
+        return top, scores
+
+    def get_vector(self, _id):
+        """Get the vector stored for an id.
+
+        :param _id: ID of the vector
+        """
+        self.post_create()
+        return self._vector(self.lookup[_id])
+
+    def find_nearest_from_id(self, _id, n=100, within_ids=None):
         """Find the nearest vectors to the given ID.
 
         :param _id: ID of the vector
         :param n: number of nearest vectors to return
+        :param within_ids: list of IDs to search within
         """
-        self.post_create()
-        return self.find_nearest_from_array(self.h[self.lookup[_id]], n=n)
+        return self.find_nearest_from_array(
+            self.get_vector(_id), n=n, within_ids=within_ids
+        )
 
     def find_nearest_from_array(self, h, n=100, within_ids=None):
         """Find the nearest vectors to the given vector.
@@ -79,47 +328,141 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
         :param n: number of nearest vectors to return
         :param within_ids: list of IDs to search within
         """
+        h = self.to_numpy(h)[None, :]
+        return self.find_nearest_from_arrays(h, n=n, within_ids=within_ids)[0]
+
+    def find_nearest_from_arrays(self, h, n=100, within_ids=None):
+        """Find the nearest vectors to each of the given vectors.
+
+        All queries are scored together and the top ``n`` of each row is
+        selected with ``numpy.argpartition``. ``l2`` scores of the selected
+        rows are recomputed exactly.
+
+        ``within_ids`` is applied as a boolean mask over the rows. Filters
+        keeping at most ``_BRUTE_FORCE_SELECTIVITY`` of the rows only score
+        the surviving rows.
+
+        :param h: 2-d array of vectors, one query per row
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of IDs to search within
+        """
         self.post_create()
 
-        if self.h is None:
+        h = self.to_numpy(h)
+        scored = self._score(h, within_ids)
+        if scored is None:
+            return [([], []) for _ in range(h.shape[0])]
+        similarities, ix, n_candidates = scored
+
+        k = min(n * max(self.rerank_factor, 1), n_candidates)
+        top = numpy.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        scores = numpy.take_along_axis(similarities, top, axis=1)
+        if ix is not None:
+            top = ix[top]
+        if self.rerank_factor:
+            top, scores = self._rerank(h, top, n)
+        else:
+            if self.quantizer is None and self._measure_name == 'l2':
+                # The norm expansion loses precision for close vectors
+                scores = self._rescore(h, top, self._h)
+            order = numpy.argsort(-scores, axis=1)
+            top = numpy.take_along_axis(top, order, axis=1)
+            scores = numpy.take_along_axis(scores, order, axis=1)
+
+        return [
+            ([self.index[i] for i in row], row_scores)
+            for row, row_scores in zip(top.tolist(), scores.tolist())
+        ]
+
+    def find_in_range_from_arrays(self, h, min_score, n=None, within_ids=None):
+        """Find the vectors scoring at least ``min_score`` with each given vector.
+
+        Rows are selected with a mask over the scores, and only the selected
+        rows are ranked. Scores which ``find_nearest_from_arrays`` would
+        recompute exactly are recomputed before ``min_score`` is applied
+        again.
+
+        :param h: 2-d array of vectors, one query per row
+        :param min_score: minimum score of the results
+        :param n: maximum number of results per query, all if ``None``
+        :param within_ids: list of IDs to search within
+        """
+        self.post_create()
+
+        h = self.to_numpy(h)
+        scored = self._score(h, within_ids)
+        if scored is None:
+            return [([], []) for _ in range(h.shape[0])]
+        similarities, ix, _ = scored
+
+        vectors = self._exact
+        if vectors is None and self.quantizer is None and self._measure_name == 'l2':
+            vectors = self._h
+        # Rows which are recomputed are selected with some slack, so that
+        # rows at the threshold are not lost to rounding
+        slack = 0.0 if vectors is None else 1e-3 * (1 + abs(min_score))
+
+        results = []
+        for q, row in enumerate(similarities):
+            hits = numpy.flatnonzero(row >= min_score - slack)
+            scores = row[hits]
+            rows = hits if ix is None else ix[hits]
+            if vectors is not None and len(rows):
+                scores = self._rescore(h[q : q + 1], rows[None, :], vectors)[0]
+                rows, scores = rows[scores >= min_score], scores[scores >= min_score]
+            if n is not None and len(rows) > n:
+                top = numpy.argpartition(-scores, n - 1)[:n]
+                rows, scores = rows[top], scores[top]
+            order = numpy.argsort(-scores)
+            results.append(
+                ([self.index[i] for i in rows[order].tolist()], scores[order].tolist())
+            )
+        return results
+
+    def _score(self, h, within_ids):
+        # Scores of the queries against the candidate rows, with the
+        # positions of the rows if only those were scored, and the number
+        # of candidates. Rows outside of the candidates score ``-inf``.
+        if not self.lookup:
             logging.error(
                 'Tried to search on an empty vector database',
                 'Vectors are not yet loaded in vector database.',
                 '\nPlease check if model outputs are ready.',
             )
-            return [], []
+            return None
 
-        h = self.to_numpy(h)[None, :]
         if within_ids:
-            ix = list(map(self.lookup.__getitem__, within_ids))
-            similarities = self.measure(h, self.h[ix, :])  # mypy: ignore
+            mask = self._mask(within_ids)
+            n_candidates = int(mask.sum())
         else:
-            similarities = self.measure(h, self.h)  # mypy: ignore
-        similarities = similarities[0, :]
-        logging.debug(similarities)
-        scores = -numpy.sort(-similarities)
-        ## different ways of handling
-        if within_ids:
-            top_n_idxs = numpy.argsort(-similarities)[:n]
-            ix = [ix[i] for i in top_n_idxs]
+            mask = ~self._deleted[: self._size] if self._n_deleted else None
+            n_candidates = len(self.lookup)
+        if not n_candidates:
+            return None
+
+        if mask is not None and (
+            n_candidates <= self._BRUTE_FORCE_SELECTIVITY * self._size
+        ):
+            # Very selective filter: only score the surviving rows
+            ix = numpy.flatnonzero(mask)
+            similarities = self._similarities(h, ix)
         else:
-            ix = numpy.argsort(-similarities)[:n]
-            ix = ix.tolist()
-        scores = scores.tolist()
-        _ids = [self.index[i] for i in ix]
-        return _ids, scores
+            ix = None
+            similarities = self._similarities(h)
+            if mask is not None:
+                similarities[:, ~mask] = -numpy.inf
+        return similarities, ix, n_candidates
 
     def add(self, items: t.Sequence[VectorItem]) -> None:
         """Add vectors to the index.
 
-        Only adds to cache if cache is not full.
+        Vectors are buffered in a cache which is flushed once full.
 
         :param items: List of vectors to add
         """
-        if len(self._cache) < self._CACHE_SIZE:
-            for item in items:
-                self._cache.append(item)
-        else:
+        for item in items:
+            self._cache.append(item)
+        if len(self._cache) >= self._CACHE_SIZE:
             self._add(self._cache)
             self._cache = []
 
@@ -129,17 +472,133 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
             self._add(self._cache)
             self._cache = []
 
+    def drop(self):
+        """Release the buffers of the vectors, also if memory-mapped."""
+        self._cache = []
+        self._clear()
+
     def _add(self, items: t.Sequence[VectorItem]) -> None:
-        index = [item.id for item in items]
-        h = numpy.stack([item.vector for item in items])
+        new = []
+        for item in items:
+            i = self.lookup.get(item.id)
+            if i is None:
+                new.append(item)
+            else:
+                # Upsert in place
+                self._write(slice(i, i + 1), numpy.asarray(item.vector)[None, :])
+
+        if new:
+            self._append(
+                numpy.stack([item.vector for item in new]),
+                [item.id for item in new],
+            )
+
+    def save(self, path: str, **watermark) -> None:
+        """Write a snapshot of the index to the directory ``path``.
+
+        The snapshot consists of the live vectors as a ``float32`` ``.npy``
+        file, the table of ids and a watermark. The watermark is written last,
+        so that an interrupted save is never restored.
+
+        :param path: Snapshot directory
+        :param **watermark: Extra fields to record in the watermark
+        """
+        self.post_create()
+        os.makedirs(path, exist_ok=True)
+        keep = numpy.flatnonzero(~self._deleted[: self._size])
+        ids = [self.index[i] for i in keep]
+
+        # Remove the previous watermark first, so that the snapshot is
+        # invalid until all of its files have been replaced. Files are
+        # written next to the old ones and renamed, since the old vectors
+        # may still be memory-mapped by this or another searcher.
+        if os.path.exists(os.path.join(path, 'watermark.json')):
+            os.remove(os.path.join(path, 'watermark.json'))
+
+        vectors = numpy.lib.format.open_memmap(
+            os.path.join(path, 'vectors.npy.tmp'),
+            mode='w+',
+            dtype=numpy.float32,
+            shape=(len(keep), self.dimensions),
+        )
+        for i in range(0, len(keep), self._BLOCK_SIZE):
+            rows = keep[i : i + self._BLOCK_SIZE]
+            assert self._h is not None
+            if self._exact is not None:
+                vectors[i : i + len(rows)] = self._exact[rows]
+            elif self.quantizer is not None:
+                vectors[i : i + len(rows)] = self.quantizer.decode(self._h[rows])
+            else:
+                vectors[i : i + len(rows)] = self._h[rows]
+        vectors.flush()
+        del vectors
+        os.replace(
+            os.path.join(path, 'vectors.npy.tmp'), os.path.join(path, 'vectors.npy')
+        )
+
+        with open(os.path.join(path, 'ids.json'), 'w') as f:
+            json.dump(ids, f)
+        with open(os.path.join(path, 'watermark.json.tmp'), 'w') as f:
+            json.dump(
+                {
+                    **watermark,
+                    'created_at': datetime.datetime.now().isoformat(),
+                    'count': len(ids),
+                    'dimensions': self.dimensions,
+                },
+                f,
+            )
+        os.replace(
+            os.path.join(path, 'watermark.json.tmp'),
+            os.path.join(path, 'watermark.json'),
+        )
+
+    def load(self, path: str) -> t.Optional[t.Tuple[t.List[str], t.Dict]]:
+        """Restore the index from a snapshot written with ``save``.
+
+        Unquantized vectors are memory-mapped copy-on-write, so that the
+        snapshot file is never modified by later updates. Quantized indices
+        re-encode the vectors on load.
+
+        Returns the restored ids and the watermark, or ``None`` if there is
+        no valid snapshot at ``path``.
+
+        :param path: Snapshot directory
+        """
+        try:
+            with open(os.path.join(path, 'watermark.json')) as f:
+                watermark = json.load(f)
+            with open(os.path.join(path, 'ids.json')) as f:
+                ids = json.load(f)
+            mode: t.Literal['r', 'c'] = 'r' if self.quantizer is not None else 'c'
+            h = numpy.load(os.path.join(path, 'vectors.npy'), mmap_mode=mode)
+        except (OSError, ValueError) as e:
+            logging.warn(f'Could not read vector snapshot at {path}: {e}')
+            return None
+
+        if (
+            watermark.get('dimensions') != self.dimensions
+            or watermark.get('count') != len(ids)
+            or h.shape != (len(ids), self.dimensions)
+        ):
+            logging.warn(f'Ignoring inconsistent vector snapshot at {path}')
+            return None
 
-        if self.h is not None:
-            old_not_in_new = list(set(self.index) - set(index))
-            ix_old = [self.lookup[_id] for _id in old_not_in_new]
-            h = numpy.concatenate((self.h[ix_old], h), axis=0)
-            index = [self.index[i] for i in ix_old] + index
+        self._cache = []
+        if self.quantizer is not None or not ids:
+            self._setup(numpy.asarray(h), ids)
+            return ids, watermark
 
-        return self._setup(h, index)
+        self._h, self._exact = h, None
+        self._norms = None
+        if self._measure_name is not None:
+            self._norms = kernels.squared_norms(h, self._BLOCK_SIZE)
+        self._deleted = numpy.zeros(len(ids), dtype=bool)
+        self._size = len(ids)
+        self._n_deleted = 0
+        self.index = list(ids)
+        self.lookup = dict(zip(ids, range(len(ids))))
+        return ids, watermark
 
     def delete(self, ids):
         """Delete vectors from the index.
@@ -147,7 +606,7 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
         :param ids: List of IDs to delete
         """
         self.post_create()
-        ix = list(map(self.lookup.__getitem__, ids))
-        h = numpy.delete(self.h, ix, axis=0)
-        index = [_id for _id in self.index if _id not in set(ids)]
-        self._setup(h, index)
+        for _id in ids:
+            self._tombstone(self.lookup.pop(_id))
+        if self._n_deleted > self._COMPACTION_THRESHOLD * self._size:
+            self._compact()
@@ -1,26 +1,67 @@
+import threading
 import typing as t
 
 import numpy as np
 
 from superduperdb import CFG
-from superduperdb.misc.server import request_server
+from superduperdb.misc.compat import to_thread
+from superduperdb.misc.server import arequest_server, request_server
 from superduperdb.vector_search.base import BaseVectorSearcher, VectorItem
+from superduperdb.vector_search.server import wire
 
 if t.TYPE_CHECKING:
     from superduperdb.base.datalayer import Datalayer
 
+ResultType = t.Tuple[t.List[str], t.List[float]]
+
+
+def _decode_one(response) -> ResultType:
+    return response['ids'], response['scores']
+
+
+def _decode_first(response: bytes) -> ResultType:
+    return wire.decode_results(response)[0]
+
+
+def _decode_batch(response) -> t.List[ResultType]:
+    return list(zip(response['ids'], response['scores']))
+
+
+def _decode_first_of_batch(response) -> ResultType:
+    return _decode_batch(response)[0]
+
 
 class FastVectorSearcher(BaseVectorSearcher):
     """Fast vector searcher implementation using the server.
 
+    Unless ``CFG.cluster.vector_search.wire_format`` is ``json``, vectors
+    are sent to the server as raw ``float32`` (see ``wire``).
+
+    Once dropped, e.g. when a rebuilt searcher replaces it, the local
+    searcher is released after the calls already using it, and later calls
+    are passed to the searcher of the vector index in ``db``.
+
     :param db: Datalayer instance
     :param vector_searcher: Vector searcher instance
     :param vector_index: Vector index name
+    :param predict_id: Predict id of the outputs in the searcher
     """
 
-    def __init__(self, db: 'Datalayer', vector_searcher, vector_index: str):
+    def __init__(
+        self,
+        db: 'Datalayer',
+        vector_searcher,
+        vector_index: str,
+        predict_id: t.Optional[str] = None,
+    ):
+        self.db = db
         self.searcher = vector_searcher
         self.vector_index = vector_index
+        self.predict_id = predict_id
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._dropped = False
+        self._released = False
 
         if CFG.cluster.vector_search.uri is not None:
             if not db.server_mode:
@@ -34,7 +75,43 @@ class FastVectorSearcher(BaseVectorSearcher):
                 )
 
     def __len__(self):
-        return len(self.searcher)
+        return self._call('__len__')
+
+    def _call(self, method: str, *args, **kwargs):
+        with self._lock:
+            released = self._released
+            if not released:
+                self._calls += 1
+        if released:
+            current = self.db.fast_vector_searchers.get(self.vector_index)
+            if current is None or current is self:
+                raise ValueError(f'Vector-index {self.vector_index!r} was dropped')
+            return getattr(current, method)(*args, **kwargs)
+        try:
+            return getattr(self.searcher, method)(*args, **kwargs)
+        finally:
+            self._end_call()
+
+    def _end_call(self):
+        with self._lock:
+            self._calls -= 1
+            release = self._dropped and not self._calls and not self._released
+            self._released = self._released or release
+        if release:
+            self.searcher.drop()
+
+    def drop(self):
+        """Release the local searcher, once the calls using it have returned."""
+        if CFG.cluster.vector_search.uri is not None:
+            return
+        with self._lock:
+            self._dropped = True
+            self._calls += 1
+        self._end_call()
+
+    @property
+    def _binary(self):
+        return CFG.cluster.vector_search.wire_format == 'binary'
 
     def add(self, items: t.Sequence[VectorItem]) -> None:
         """
@@ -42,7 +119,24 @@ class FastVectorSearcher(BaseVectorSearcher):
 
         :param items: t.Sequence of VectorItems
         """
-        vector_items = [{'vector': i.vector, 'id': i.id} for i in items]
+        if CFG.cluster.vector_search.uri is not None and self._binary:
+            request_server(
+                service='vector_search',
+                data=wire.encode(
+                    np.stack([i.vector for i in items]),
+                    {
+                        'ids': [i.id for i in items],
+                        'sources': [i.source for i in items],
+                    },
+                ),
+                endpoint='add/search/binary',
+                args={'vector_index': self.vector_index},
+            )
+            return
+
+        vector_items = [
+            {'vector': i.vector, 'id': i.id, 'source': i.source} for i in items
+        ]
         if CFG.cluster.vector_search.uri is not None:
             request_server(
                 service='vector_search',
@@ -54,7 +148,7 @@ class FastVectorSearcher(BaseVectorSearcher):
             )
             return
 
-        return self.searcher.add(items)
+        return self._call('add', items)
 
     def delete(self, ids: t.Sequence[str]) -> None:
         """Remove items from the index.
@@ -72,7 +166,79 @@ class FastVectorSearcher(BaseVectorSearcher):
             )
             return
 
-        return self.searcher.delete(ids)
+        return self._call('delete', ids)
+
+    def _args(self, n: t.Optional[int], min_score: t.Optional[float]) -> t.Dict:
+        # The server reads ``n=0`` as no limit on the results of a range search
+        args: t.Dict[str, t.Any] = {'vector_index': self.vector_index, 'n': n or 0}
+        if min_score is not None:
+            args['min_score'] = min_score
+        return args
+
+    def _id_request(
+        self,
+        _id,
+        n: t.Optional[int],
+        within_ids: t.Sequence[str],
+        min_score: t.Optional[float] = None,
+    ) -> t.Dict:
+        request = {
+            'service': 'vector_search',
+            'endpoint': 'query/id/search',
+            'args': {**self._args(n, min_score), 'id': _id},
+        }
+        if within_ids:
+            request['data'] = list(within_ids)
+        return request
+
+    def _array_request(
+        self,
+        h,
+        n: t.Optional[int],
+        within_ids: t.Sequence[str],
+        batch: bool,
+        min_score: t.Optional[float] = None,
+    ) -> t.Tuple[t.Dict, t.Callable]:
+        # Arguments of ``request_server`` for a remote search, and the
+        # function decoding its response
+        args = self._args(n, min_score)
+        if self._binary:
+            data = wire.encode(self.to_numpy(h), {'within_ids': list(within_ids)})
+            endpoint = 'query/batch/search/binary' if batch else 'query/search/binary'
+            decode = wire.decode_results if batch else _decode_first
+        elif batch:
+            data = {'vectors': self.to_list(h), 'within_ids': list(within_ids)}
+            endpoint = 'query/batch/search'
+            decode = _decode_batch
+        elif within_ids:
+            # Only the batch endpoint takes ``within_ids`` with JSON vectors
+            data = {'vectors': [self.to_list(h)], 'within_ids': list(within_ids)}
+            endpoint = 'query/batch/search'
+            decode = _decode_first_of_batch
+        else:
+            data, endpoint, decode = h, 'query/search', _decode_one
+        request = {
+            'service': 'vector_search',
+            'data': data,
+            'endpoint': endpoint,
+            'args': args,
+        }
+        return request, decode
+
+    def get_vector(self, _id: str) -> np.ndarray:
+        """Get the vector stored for an id.
+
+        :param _id: id of the vector
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            response = request_server(
+                service='vector_search',
+                endpoint='query/vector',
+                args={'vector_index': self.vector_index, 'id': _id},
+                type='get',
+            )
+            return np.array(response['vector'])
+        return self._call('get_vector', _id)
 
     def find_nearest_from_id(
         self,
@@ -88,14 +254,9 @@ class FastVectorSearcher(BaseVectorSearcher):
         :param within_ids: list of ids to search within
         """
         if CFG.cluster.vector_search.uri is not None:
-            response = request_server(
-                service='vector_search',
-                endpoint='query/id/search',
-                args={'vector_index': self.vector_index, 'n': n, 'id': _id},
-            )
-            return response['ids'], response['scores']
+            return _decode_one(request_server(**self._id_request(_id, n, within_ids)))
 
-        return self.searcher.find_nearest_from_id(_id, n=n, within_ids=within_ids)
+        return self._call('find_nearest_from_id', _id, n=n, within_ids=within_ids)
 
     def find_nearest_from_array(
         self,
@@ -111,24 +272,185 @@ class FastVectorSearcher(BaseVectorSearcher):
         :param within_ids: list of ids to search within
         """
         if CFG.cluster.vector_search.uri is not None:
-            response = request_server(
-                service='vector_search',
-                data=h,
-                endpoint='query/search',
-                args={'vector_index': self.vector_index, 'n': n},
+            request, decode = self._array_request(h, n, within_ids, batch=False)
+            return decode(request_server(**request))
+
+        return self._call('find_nearest_from_array', h=h, n=n, within_ids=within_ids)
+
+    def find_nearest_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """
+        Find the nearest vectors to each of the given vectors.
+
+        In remote mode all queries are sent in a single request.
+
+        :param h: 2-d array of vectors, one query per row
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            request, decode = self._array_request(h, n, within_ids, batch=True)
+            return decode(request_server(**request))
+
+        return self._call('find_nearest_from_arrays', h=h, n=n, within_ids=within_ids)
+
+    def find_in_range_from_id(
+        self,
+        _id,
+        min_score: float,
+        n: t.Optional[int] = None,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the vectors scoring at least ``min_score`` with the given id.
+
+        :param _id: id of the vector
+        :param min_score: minimum score of the results
+        :param n: maximum number of results, all if ``None``
+        :param within_ids: list of ids to search within
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            return _decode_one(
+                request_server(**self._id_request(_id, n, within_ids, min_score))
             )
-            return response['ids'], response['scores']
 
-        return self.searcher.find_nearest_from_array(h=h, n=n, within_ids=within_ids)
+        return self._call(
+            'find_in_range_from_id', _id, min_score, n=n, within_ids=within_ids
+        )
+
+    def find_in_range_from_array(
+        self,
+        h: np.typing.ArrayLike,
+        min_score: float,
+        n: t.Optional[int] = None,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the vectors scoring at least ``min_score`` with the given vector.
+
+        :param h: vector
+        :param min_score: minimum score of the results
+        :param n: maximum number of results, all if ``None``
+        :param within_ids: list of ids to search within
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            request, decode = self._array_request(
+                h, n, within_ids, batch=False, min_score=min_score
+            )
+            return decode(request_server(**request))
+
+        return self._call(
+            'find_in_range_from_array', h, min_score, n=n, within_ids=within_ids
+        )
+
+    def find_in_range_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        min_score: float,
+        n: t.Optional[int] = None,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """
+        Find the vectors scoring at least ``min_score`` with each given vector.
+
+        :param h: 2-d array of vectors, one query per row
+        :param min_score: minimum score of the results
+        :param n: maximum number of results per query, all if ``None``
+        :param within_ids: list of ids to search within
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            request, decode = self._array_request(
+                h, n, within_ids, batch=True, min_score=min_score
+            )
+            return decode(request_server(**request))
+
+        return self._call(
+            'find_in_range_from_arrays', h, min_score, n=n, within_ids=within_ids
+        )
+
+    async def afind_nearest_from_id(
+        self,
+        _id,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the vector with the given id, asynchronously.
+
+        Remote searches are sent with a pooled asynchronous client, local
+        searches are run in a thread so that they do not block the event loop.
+
+        :param _id: id of the vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            return _decode_one(
+                await arequest_server(**self._id_request(_id, n, within_ids))
+            )
+
+        return await to_thread(
+            self._call, 'find_nearest_from_id', _id, n=n, within_ids=within_ids
+        )
+
+    async def afind_nearest_from_array(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the given vector, asynchronously.
+
+        See ``afind_nearest_from_id``.
+
+        :param h: vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            request, decode = self._array_request(h, n, within_ids, batch=False)
+            return decode(await arequest_server(**request))
+
+        return await to_thread(
+            self._call, 'find_nearest_from_array', h=h, n=n, within_ids=within_ids
+        )
+
+    async def afind_nearest_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """
+        Find the nearest vectors to each of the given vectors, asynchronously.
+
+        See ``afind_nearest_from_id``.
+
+        :param h: 2-d array of vectors, one query per row
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        if CFG.cluster.vector_search.uri is not None:
+            request, decode = self._array_request(h, n, within_ids, batch=True)
+            return decode(await arequest_server(**request))
+
+        return await to_thread(
+            self._call, 'find_nearest_from_arrays', h=h, n=n, within_ids=within_ids
+        )
 
     def post_create(self):
         """Post create method for vector searcher."""
-        if CFG.cluster.is_remote_vector_search:
+        if CFG.cluster.vector_search.uri is not None:
             request_server(
                 service='vector_search',
-                endpoint='query/post_create',
+                endpoint='create/post_create',
                 args={'vector_index': self.vector_index},
                 type='get',
             )
             return
-        self.searcher.post_create()
+        self._call('post_create')
@@ -0,0 +1,97 @@
+import typing as t
+
+import numpy
+
+BLOCK_SIZE = 65536
+
+
+def squared_norms(h: numpy.ndarray, block_size: int = BLOCK_SIZE) -> numpy.ndarray:
+    """Squared euclidean norms of the rows of ``h``, as ``float32``.
+
+    :param h: 2-d array of vectors
+    :param block_size: Number of rows converted to ``float32`` at a time
+    """
+    norms = numpy.empty(h.shape[0], dtype=numpy.float32)
+    for i in range(0, h.shape[0], block_size):
+        block = numpy.asarray(h[i : i + block_size], dtype=numpy.float32)
+        numpy.einsum('ij,ij->i', block, block, out=norms[i : i + block_size])
+    return norms
+
+
+def similarities(
+    q: numpy.ndarray,
+    h: numpy.ndarray,
+    measure: str,
+    norms: t.Optional[numpy.ndarray] = None,
+    rows: t.Optional[numpy.ndarray] = None,
+    bias: t.Optional[numpy.ndarray] = None,
+    q_norms: t.Optional[numpy.ndarray] = None,
+    block_size: int = BLOCK_SIZE,
+) -> numpy.ndarray:
+    """Score queries against the rows of ``h``, ``block_size`` rows at a time.
+
+    Each block is scored with a single matrix product written into the
+    result, so that no temporary larger than a block is allocated. ``l2``
+    is computed as ``-sqrt(|q|^2 + |x|^2 - 2 q.x)`` from the squared norms
+    of the rows, which are computed on the fly unless given in ``norms``.
+    ``cosine`` normalizes the queries only; the rows are expected to be
+    normalized.
+
+    :param q: 2-d array of queries
+    :param h: 2-d array of vectors, or of their codes if ``bias`` is given
+    :param measure: ``l2``, ``dot`` or ``cosine``
+    :param norms: Squared norms of the rows of ``h``
+    :param rows: Indices of the rows of ``h`` to score, all if ``None``
+    :param bias: Per-query offset added to the products, for quantized codes
+    :param q_norms: Squared norms of the queries, if ``q`` was rewritten
+                    for quantized codes
+    :param block_size: Number of rows scored at a time
+    """
+    if measure not in ('l2', 'dot', 'cosine'):
+        raise ValueError(f'Unknown measure {measure!r}')
+    q = numpy.asarray(q)
+    dtype = numpy.result_type(q.dtype, numpy.float32)
+    if bias is None:
+        dtype = numpy.result_type(dtype, h.dtype)
+    q = numpy.asarray(q, dtype=dtype)
+    if measure == 'cosine':
+        q = q / numpy.linalg.norm(q, axis=1)[:, None]
+    if measure == 'l2' and q_norms is None:
+        q_norms = numpy.einsum('ij,ij->i', q, q)
+
+    n_rows = h.shape[0] if rows is None else len(rows)
+    out = numpy.empty((q.shape[0], n_rows), dtype=dtype)
+    for i in range(0, n_rows, block_size):
+        block = slice(i, min(i + block_size, n_rows))
+        index = block if rows is None else rows[block]
+        x = numpy.asarray(h[index], dtype=dtype)
+        scores = out[:, block]
+        numpy.matmul(q, x.T, out=scores)
+        if bias is not None:
+            scores += bias[:, None]
+        if measure == 'l2':
+            if norms is not None:
+                x_norms = norms[index]
+            else:
+                x_norms = numpy.einsum('ij,ij->i', x, x)
+            # -sqrt(max(|q|^2 + |x|^2 - 2 q.x, 0)), in place
+            assert q_norms is not None
+            scores *= -2
+            scores += x_norms
+            scores += q_norms[:, None]
+            numpy.maximum(scores, 0, out=scores)
+            numpy.sqrt(scores, out=scores)
+            numpy.negative(scores, out=scores)
+    return out
+
+
+def l2_exact(q: numpy.ndarray, candidates: numpy.ndarray) -> numpy.ndarray:
+    """Negative euclidean distances of each query to its own candidates.
+
+    Used to re-score the few selected rows without the cancellation error
+    of the norm expansion in ``similarities``.
+
+    :param q: 2-d array of queries
+    :param candidates: 3-d array with the candidate vectors of each query
+    """
+    return -numpy.linalg.norm(candidates - q[:, None, :], axis=2)
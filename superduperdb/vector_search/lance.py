@@ -1,4 +1,5 @@
 import os
+import threading
 import typing as t
 
 import lance
@@ -12,16 +13,41 @@ from superduperdb.vector_search.base import (
     VectorItem,
 )
 
+if t.TYPE_CHECKING:
+    from superduperdb.components.vector_index import VectorIndex
+
 
 class LanceVectorSearcher(BaseVectorSearcher):
     """
     Implementation of a vector index using the ``lance`` library.
 
+    Added vectors are buffered and written as one fragment per
+    ``write_batch_size`` vectors, or before the next read. Small fragments
+    are compacted once there are ``compaction_fragments`` of them, and an
+    ``IVF_PQ`` index is built once the dataset holds ``index_min_rows``
+    vectors. The index is rebuilt when the vectors written since exceed
+    ``index_rebuild_fraction`` of those it covers; until then they are
+    scanned.
+
     :param identifier: Unique string identifier of index
     :param dimensions: Dimension of the vector embeddings in the Lance dataset
     :param h: Seed vectors ``numpy.ndarray``
     :param index: list of IDs
     :param measure: measure to assess similarity
+    :param write_batch_size: Number of added vectors buffered before a write
+    :param compaction_fragments: Number of fragments above which small
+                                 fragments are compacted
+    :param index_min_rows: Number of vectors above which an ``IVF_PQ``
+                           index is built, ``None`` to never build one
+    :param index_rebuild_fraction: Fraction of unindexed vectors above
+                                   which the index is rebuilt
+    :param num_partitions: Number of ``IVF`` partitions, by default the
+                           square root of the number of vectors
+    :param num_sub_vectors: Number of ``PQ`` sub-vectors, by default one
+                            per 8 dimensions
+    :param nprobes: Number of ``IVF`` partitions searched per query
+    :param refine_factor: Candidates per result re-ranked with exact
+                          distances
     """
 
     def __init__(
@@ -31,23 +57,83 @@ class LanceVectorSearcher(BaseVectorSearcher):
         h: t.Optional[np.ndarray] = None,
         index: t.Optional[t.List[str]] = None,
         measure: t.Optional[str] = None,
+        write_batch_size: int = 1024,
+        compaction_fragments: int = 16,
+        index_min_rows: t.Optional[int] = 100_000,
+        index_rebuild_fraction: float = 0.2,
+        num_partitions: t.Optional[int] = None,
+        num_sub_vectors: t.Optional[int] = None,
+        nprobes: int = 20,
+        refine_factor: t.Optional[int] = 5,
     ):
+        self.identifier = identifier
         self.dataset_path = os.path.join(CFG.lance_home, f'{identifier}.lance')
         self.dimensions = dimensions
         self.measure = (
             measure.name if isinstance(measure, VectorIndexMeasureType) else measure
         )
+        self.write_batch_size = write_batch_size
+        self.compaction_fragments = compaction_fragments
+        self.index_min_rows = index_min_rows
+        self.index_rebuild_fraction = index_rebuild_fraction
+        self.num_partitions = num_partitions
+        self.num_sub_vectors = num_sub_vectors
+        self.nprobes = nprobes
+        self.refine_factor = refine_factor
+        self._DELETE_BATCH_SIZE = 1000
+
+        self._dataset = None
+        self._pending: t.List[VectorItem] = []
+        self._lock = threading.RLock()
         if h is not None:
             if not os.path.exists(self.dataset_path):
                 os.makedirs(self.dataset_path, exist_ok=True)
                 self._create_or_append_to_dataset(h, index, mode='create')
+                self._optimize()
+
+    @classmethod
+    def from_component(cls, vi: 'VectorIndex'):
+        """Create a vector searcher from a vector index.
+
+        The write, compaction and index parameters of ``__init__`` are read
+        from ``vi.vector_search_config.parameters``.
+
+        :param vi: VectorIndex instance
+        """
+        config = vi.vector_search_config
+        parameters = {
+            k: v
+            for k, v in config.parameters.items()
+            if k
+            in (
+                'write_batch_size',
+                'compaction_fragments',
+                'index_min_rows',
+                'index_rebuild_fraction',
+                'num_partitions',
+                'num_sub_vectors',
+                'nprobes',
+                'refine_factor',
+            )
+        }
+        return cls(
+            identifier=config.id,
+            dimensions=config.dimensions,
+            measure=config.measure,
+            **parameters,
+        )
 
     @property
     def dataset(self):
-        """Return the Lance dataset."""
-        if not os.path.exists(self.dataset_path):
-            self._create_or_append_to_dataset([], [], mode='create')
-        return lance.dataset(self.dataset_path)
+        """Return the Lance dataset, with all added vectors written."""
+        with self._lock:
+            self._flush()
+            if self._dataset is None:
+                if not os.path.exists(self.dataset_path):
+                    self._create_or_append_to_dataset([], [], mode='create')
+                else:
+                    self._dataset = lance.dataset(self.dataset_path)
+            return self._dataset
 
     def __len__(self):
         return self.dataset.count_rows()
@@ -66,25 +152,105 @@ class LanceVectorSearcher(BaseVectorSearcher):
             dataset.merge_insert(
                 "id"
             ).when_matched_update_all().when_not_matched_insert_all().execute(_table)
+            self._dataset = None
         else:
-            lance.write_dataset(_table, self.dataset_path, mode=mode)
+            # ``write_dataset`` returns a handle on the new version
+            self._dataset = lance.write_dataset(_table, self.dataset_path, mode=mode)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        items, self._pending = self._pending, []
+        mode = 'append' if os.path.exists(self.dataset_path) else 'create'
+        self._create_or_append_to_dataset(
+            [item.vector for item in items], [item.id for item in items], mode=mode
+        )
+        self._optimize()
+
+    def _optimize(self):
+        dataset = self._dataset
+        fragments = dataset.get_fragments()
+        if len(fragments) > self.compaction_fragments:
+            dataset.optimize.compact_files()
+            fragments = dataset.get_fragments()
+
+        if self.index_min_rows is None:
+            return
+        indices = dataset.list_indices()
+        indexed = indices[0]['fragment_ids'] if indices else set()
+        fragment_ids = {fragment.fragment_id for fragment in fragments}
+        unindexed = sum(
+            fragment.count_rows()
+            for fragment in fragments
+            if fragment.fragment_id not in indexed
+        )
+        total = dataset.count_rows()
+        if indices:
+            # Rebuilt when too much is scanned, or when compaction rewrote
+            # fragments covered by the index
+            rebuild = unindexed > self.index_rebuild_fraction * (total - unindexed)
+            rebuild = rebuild or not indexed <= fragment_ids
+        else:
+            rebuild = total >= self.index_min_rows
+        if rebuild:
+            self.create_index()
+
+    def create_index(self):
+        """(Re)build the ``IVF_PQ`` index of the vectors."""
+        with self._lock:
+            dataset = self.dataset
+            num_sub_vectors = self.num_sub_vectors or next(
+                s
+                for s in range(max(self.dimensions // 8, 1), 0, -1)
+                if self.dimensions % s == 0
+            )
+            dataset.create_index(
+                'vector',
+                index_type='IVF_PQ',
+                metric=self.measure or 'l2',
+                replace=True,
+                num_partitions=self.num_partitions
+                or max(int(dataset.count_rows() ** 0.5), 1),
+                num_sub_vectors=num_sub_vectors,
+            )
 
     def add(self, items: t.Sequence[VectorItem]) -> None:
         """Add vectors to the index.
 
         :param items: List of vectors to add
         """
-        ids = [item.id for item in items]
-        vectors = [item.vector for item in items]
-        self._create_or_append_to_dataset(vectors, ids, mode='append')
+        with self._lock:
+            self._pending.extend(items)
+            if len(self._pending) >= self.write_batch_size:
+                self._flush()
 
     def delete(self, ids: t.Sequence[str]) -> None:
         """Delete vectors from the index.
 
         :param ids: List of IDs to delete
         """
-        to_remove = ", ".join(f"'{str(id)}'" for id in ids)
-        self.dataset.delete(f"id IN ({to_remove})")
+        with self._lock:
+            dataset = self.dataset
+            ids = list(ids)
+            for i in range(0, len(ids), self._DELETE_BATCH_SIZE):
+                dataset.delete(_in_filter(ids[i : i + self._DELETE_BATCH_SIZE]))
+
+    def post_create(self):
+        """Write the buffered vectors and update the index."""
+        with self._lock:
+            self._flush()
+
+    def get_vector(self, _id: str) -> np.ndarray:
+        """Get the vector stored for an id.
+
+        :param _id: id of the vector
+        """
+        vectors = self.dataset.to_table(columns=['vector'], filter=_in_filter([_id]))[
+            'vector'
+        ].to_pylist()
+        if not vectors:
+            raise KeyError(_id)
+        return np.array(vectors[0], dtype=np.float32)
 
     def find_nearest_from_id(
         self,
@@ -98,17 +264,9 @@ class LanceVectorSearcher(BaseVectorSearcher):
         :param n: Number of results to return
         :param within_ids: List of IDs to search within
         """
-        # The ``lance`` file format has been specifically designed for fast
-        # random access. The logic to take advantage of this is implemented
-        # by the ``.take`` method.
-
-        # See https://blog.lancedb.com/benchmarking-random-access-in-lance-ed690757a826
-        # for further details.
-
-        vector = self.dataset.take([int(_id)], columns=['vector']).to_pydict()[
-            'vector'
-        ][0]
-        return self.find_nearest_from_array(vector, n=n, within_ids=within_ids)
+        return self.find_nearest_from_array(
+            self.get_vector(_id), n=n, within_ids=within_ids
+        )
 
     def find_nearest_from_array(
         self,
@@ -122,32 +280,61 @@ class LanceVectorSearcher(BaseVectorSearcher):
         :param n: Number of results to return
         :param within_ids: List of IDs to search within
         """
-        # NOTE: filter is currently applied AFTER vector-search
-        # See https://lancedb.github.io/lance/api/python/lance.html#lance.dataset.LanceDataset.scanner
+        return self._search(self.dataset, h, n=n, within_ids=within_ids)
+
+    def find_nearest_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        """Find the nearest vectors to each of the given vectors.
+
+        The dataset is opened once for the whole batch.
+
+        :param h: 2-d array of vectors, one query per row
+        :param n: Number of results to return per query
+        :param within_ids: List of IDs to search within
+        """
+        dataset = self.dataset
+        return [
+            self._search(dataset, x, n=n, within_ids=within_ids)
+            for x in self.to_numpy(h)
+        ]
+
+    def _search(
+        self,
+        dataset,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
         if within_ids:
-            if isinstance(within_ids, (list, set)):
-                within_ids = tuple(within_ids)
-            assert (
-                type(within_ids) == tuple
-            ), 'within_ids must be a [tuple | list | set] for lance sql parser'
-            result = self.dataset.to_table(
+            # Filtered searches are exact: searching the index with a
+            # pre-filter can return ids outside of the filter.
+            result = dataset.to_table(
                 columns=['id'],
                 nearest={
                     'column': 'vector',
                     'q': h,
                     'k': n,
                     'metric': self.measure,
+                    'use_index': False,
                 },
-                filter=f"id in {within_ids}",
+                filter=_in_filter(within_ids),
                 prefilter=True,
-                offset=0,
             )
         else:
-            result = self.dataset.to_table(
-                columns=['id'],
-                nearest={"column": 'vector', "q": h, "k": n, 'metric': self.measure},
-                offset=0,
-            )
+            nearest = {
+                'column': 'vector',
+                'q': h,
+                'k': n,
+                'metric': self.measure,
+                'nprobes': self.nprobes,
+            }
+            if self.refine_factor:
+                nearest['refine_factor'] = self.refine_factor
+            result = dataset.to_table(columns=['id'], nearest=nearest)
         ids = result['id'].to_pylist()
         distances = result['_distance'].to_pylist()
         scores = self._convert_distances_to_scores(distances)
@@ -164,3 +351,9 @@ class LanceVectorSearcher(BaseVectorSearcher):
             scores = distances
 
         return scores
+
+
+def _in_filter(ids: t.Iterable[str]) -> str:
+    # Quotes are escaped by doubling them in ``lance`` SQL
+    quoted = ", ".join("'" + str(_id).replace("'", "''") + "'" for _id in ids)
+    return f"id IN ({quoted})"
@@ -0,0 +1,229 @@
+import math
+import typing as t
+
+import numpy
+import numpy.typing
+
+from superduperdb.vector_search.base import BaseVectorSearcher, VectorItem
+
+ResultType = t.Tuple[t.List[str], t.List[float]]
+
+
+def chunk_id(
+    record: t.Mapping, _id: str, offsets: t.Dict[str, int]
+) -> t.Tuple[str, str]:
+    """Get the ids of a flattened output and of its source document.
+
+    Flattened outputs in ``mongodb`` have their own ``_id``. In SQL the
+    rows of a document share its id, and are numbered in the order in
+    which they are read.
+
+    :param record: Flattened output read from the data backend
+    :param _id: Primary id of ``record``
+    :param offsets: Last number given to the rows of each document
+    """
+    source = str(record.get('_source', _id))
+    if _id != source:
+        return _id, source
+    offsets[source] = offsets.get(source, -1) + 1
+    return f'{source}/{offsets[source]}', source
+
+
+class MultiVectorSearcher(BaseVectorSearcher):
+    """Vector searcher returning source documents of several vectors each.
+
+    Each vector (chunk) is added with the id of its source document in
+    ``VectorItem.source``. Queries rank the chunks with the wrapped
+    searcher and aggregate their scores per source, so that the results
+    are the top ``n`` source documents.
+
+    With ``aggregation='max'`` a source scores as its best chunk, and the
+    results are exact. With ``aggregation='sum'`` the scores of all chunks
+    of the sources found among the best chunks are summed.
+
+    :param searcher: Searcher holding the chunks
+    :param aggregation: ``max`` or ``sum``
+    """
+
+    def __init__(self, searcher: BaseVectorSearcher, aggregation: str = 'max'):
+        if aggregation not in ('max', 'sum'):
+            raise ValueError(f'Unknown aggregation {aggregation!r}')
+        self.identifier = searcher.identifier
+        self.dimensions = searcher.dimensions
+        self.searcher = searcher
+        self.aggregation = aggregation
+        self._FETCH_FACTOR = 2
+        self.sources: t.Dict[str, str] = {}
+        self.chunks: t.Dict[str, t.List[str]] = {}
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def add(self, items: t.Sequence[VectorItem]) -> None:
+        """Add chunks to the index.
+
+        Items without a ``source`` are their own source.
+
+        :param items: t.Sequence of VectorItems
+        """
+        for item in items:
+            source = item.source if item.source is not None else item.id
+            previous = self.sources.get(item.id)
+            if previous == source:
+                continue
+            if previous is not None:
+                self._forget(item.id)
+            self.sources[item.id] = source
+            self.chunks.setdefault(source, []).append(item.id)
+        self.searcher.add(items)
+
+    def _forget(self, chunk: str):
+        source = self.sources.pop(chunk)
+        self.chunks[source].remove(chunk)
+        if not self.chunks[source]:
+            del self.chunks[source]
+
+    def delete(self, ids: t.Sequence[str]) -> None:
+        """Remove source documents with all their chunks, or single chunks.
+
+        :param ids: t.Sequence of ids of sources or chunks
+        """
+        chunks = []
+        for _id in ids:
+            if _id in self.chunks:
+                chunks.extend(self.chunks[_id])
+            elif _id in self.sources:
+                chunks.append(_id)
+        for chunk in chunks:
+            self._forget(chunk)
+        if chunks:
+            self.searcher.delete(chunks)
+
+    def post_create(self):
+        """Post create method of the wrapped searcher."""
+        self.searcher.post_create()
+
+    def drop(self):
+        """Release the vectors of the wrapped searcher."""
+        self.searcher.drop()
+        self.chunks = {}
+
+    def get_vector(self, _id: str) -> numpy.ndarray:
+        """Get the vector of a chunk, or of the first chunk of a source.
+
+        :param _id: id of a chunk or a source
+        """
+        if _id in self.chunks:
+            _id = self.chunks[_id][0]
+        return self.searcher.get_vector(_id)
+
+    def find_nearest_from_id(
+        self,
+        _id,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> ResultType:
+        """
+        Find the nearest sources to a chunk, or to the first chunk of a source.
+
+        :param _id: id of a chunk or a source
+        :param n: number of nearest sources to return
+        :param within_ids: list of source ids to search within
+        """
+        return self.find_nearest_from_array(
+            self.get_vector(_id), n=n, within_ids=within_ids
+        )
+
+    def find_nearest_from_array(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> ResultType:
+        """
+        Find the nearest sources to the given vector.
+
+        :param h: vector
+        :param n: number of nearest sources to return
+        :param within_ids: list of source ids to search within
+        """
+        h = self.to_numpy(h)[None, :]
+        return self.find_nearest_from_arrays(h, n=n, within_ids=within_ids)[0]
+
+    def find_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[ResultType]:
+        """
+        Find the nearest sources to each of the given vectors.
+
+        The wrapped searcher is asked for the best chunks, starting from
+        ``_FETCH_FACTOR`` times the average number of chunks of ``n``
+        sources, and twice as many until ``n`` distinct sources are found.
+
+        :param h: 2-d array of vectors, one query per row
+        :param n: number of nearest sources to return per query
+        :param within_ids: list of source ids to search within
+        """
+        arr: numpy.ndarray = numpy.asarray(self.to_numpy(h))
+        chunk_ids: t.Sequence[str] = ()
+        if within_ids:
+            chunk_ids = [c for s in within_ids for c in self.chunks.get(s, ())]
+            if not chunk_ids:
+                return [([], []) for _ in range(arr.shape[0])]
+            n_chunks, n_sources = len(chunk_ids), len(set(within_ids))
+        else:
+            n_chunks, n_sources = len(self.sources), len(self.chunks)
+        if not n_chunks:
+            return [([], []) for _ in range(arr.shape[0])]
+
+        k = min(
+            n_chunks, math.ceil(self._FETCH_FACTOR * n * n_chunks / max(n_sources, 1))
+        )
+        pending = list(range(arr.shape[0]))
+        results: t.List[t.Any] = [None] * arr.shape[0]
+        while pending:
+            found = self.searcher.find_nearest_from_arrays(
+                arr[pending], n=k, within_ids=chunk_ids
+            )
+            retry = []
+            for q, (chunks, scores) in zip(pending, found):
+                ranked = self._aggregate(chunks, scores)
+                if len(ranked) >= n or len(chunks) < k or k >= n_chunks:
+                    results[q] = ranked
+                else:
+                    retry.append(q)
+            pending, k = retry, min(2 * k, n_chunks)
+
+        if self.aggregation == 'sum':
+            results = [self._sum(arr[q], ranked) for q, ranked in enumerate(results)]
+        results = [ranked[:n] for ranked in results]
+        return [
+            ([source for source, _ in ranked], [score for _, score in ranked])
+            for ranked in results
+        ]
+
+    def _aggregate(self, chunks, scores) -> t.List[t.Tuple[str, float]]:
+        # Chunks are ranked by score, so the first chunk of each source
+        # is its best one
+        best: t.Dict[str, float] = {}
+        for chunk, score in zip(chunks, scores):
+            best.setdefault(self.sources[chunk], score)
+        return list(best.items())
+
+    def _sum(self, h, ranked) -> t.List[t.Tuple[str, float]]:
+        # Score all chunks of the candidate sources, not only those which
+        # were among the best chunks
+        chunk_ids = [c for source, _ in ranked for c in self.chunks[source]]
+        if not chunk_ids:
+            return []
+        chunks, scores = self.searcher.find_nearest_from_array(
+            h, n=len(chunk_ids), within_ids=chunk_ids
+        )
+        totals: t.Dict[str, float] = {}
+        for chunk, score in zip(chunks, scores):
+            source = self.sources[chunk]
+            totals[source] = totals.get(source, 0.0) + score
+        return sorted(totals.items(), key=lambda x: -x[1])
@@ -0,0 +1,112 @@
+import typing as t
+
+import numpy
+
+
+class Float16Quantizer:
+    """Store vectors as half-precision floats."""
+
+    dtype = numpy.float16
+
+    def encode(self, h: numpy.ndarray) -> numpy.ndarray:
+        """Quantize vectors.
+
+        :param h: 2-d array of vectors
+        """
+        return h.astype(numpy.float16)
+
+    def decode(self, codes: numpy.ndarray) -> numpy.ndarray:
+        """Reconstruct ``float32`` vectors from their codes.
+
+        :param codes: 2-d array of quantized vectors
+        """
+        return codes.astype(numpy.float32)
+
+    def fit(self, h: numpy.ndarray) -> bool:
+        """Update the quantization range to cover ``h``.
+
+        Returns ``True`` if previously encoded vectors need to be re-encoded.
+
+        :param h: 2-d array of vectors
+        """
+        return False
+
+    def prepare(self, q: numpy.ndarray):
+        """Rewrite queries so that ``q . x == q' . codes + bias``.
+
+        :param q: 2-d array of queries
+        """
+        return q.astype(numpy.float32), numpy.zeros(q.shape[0], dtype=numpy.float32)
+
+
+class Int8Quantizer:
+    """Store vectors as ``int8`` codes with a per-dimension scale and offset.
+
+    ``x ~= codes * scale + offset``. The range of each dimension widens
+    (with some headroom) when vectors fall outside of it.
+
+    :param headroom: Fraction by which the range is widened on refit
+    """
+
+    dtype = numpy.int8
+
+    def __init__(self, headroom: float = 0.1):
+        self.headroom = headroom
+        self.low: t.Optional[numpy.ndarray] = None
+        self.high: t.Optional[numpy.ndarray] = None
+
+    @property
+    def scale(self) -> numpy.ndarray:
+        """Per-dimension step between two consecutive codes."""
+        assert self.low is not None and self.high is not None, 'Call fit first'
+        return numpy.maximum((self.high - self.low) / 255, 1e-12).astype(numpy.float32)
+
+    @property
+    def offset(self) -> numpy.ndarray:
+        """Per-dimension value of the code ``0``."""
+        assert self.low is not None, 'Call fit first'
+        return (self.low + 128 * self.scale).astype(numpy.float32)
+
+    def encode(self, h: numpy.ndarray) -> numpy.ndarray:
+        """Quantize vectors.
+
+        :param h: 2-d array of vectors
+        """
+        codes = numpy.rint((h - self.offset) / self.scale)
+        return numpy.clip(codes, -128, 127).astype(numpy.int8)
+
+    def decode(self, codes: numpy.ndarray) -> numpy.ndarray:
+        """Reconstruct ``float32`` vectors from their codes.
+
+        :param codes: 2-d array of quantized vectors
+        """
+        return codes.astype(numpy.float32) * self.scale + self.offset
+
+    def fit(self, h: numpy.ndarray) -> bool:
+        """Update the quantization range to cover ``h``.
+
+        Returns ``True`` if previously encoded vectors need to be re-encoded.
+
+        :param h: 2-d array of vectors
+        """
+        low, high = h.min(axis=0), h.max(axis=0)
+        if self.low is None or self.high is None:
+            self.low, self.high = low, high
+            return False
+        if (low >= self.low).all() and (high <= self.high).all():
+            return False
+        margin = self.headroom * (numpy.maximum(high, self.high) - self.low)
+        self.low = numpy.where(low < self.low, low - margin, self.low)
+        self.high = numpy.where(high > self.high, high + margin, self.high)
+        return True
+
+    def prepare(self, q: numpy.ndarray):
+        """Rewrite queries so that ``q . x == q' . codes + bias``.
+
+        :param q: 2-d array of queries
+        """
+        q = q.astype(numpy.float32)
+        return q * self.scale, q @ self.offset
+
+
+quantizers = {'float16': Float16Quantizer, 'int8': Int8Quantizer}
@@ -0,0 +1,168 @@
+import threading
+import time
+import typing as t
+
+from superduperdb import logging
+from superduperdb.vector_search.update_tasks import copy_vectors_to
+
+if t.TYPE_CHECKING:
+    from superduperdb.backends.base.query import CompoundSelect
+    from superduperdb.base.datalayer import Datalayer
+    from superduperdb.components.vector_index import VectorIndex
+    from superduperdb.vector_search.interface import FastVectorSearcher
+
+
+class VectorSearchRebuild:
+    """Shadow build of a vector index, swapped in once it has caught up.
+
+    The new searcher is backfilled from the outputs of ``vi``, while the
+    live searcher keeps serving queries. Vectors copied to or deleted from
+    the live searcher meanwhile are recorded, and replayed on the new
+    searcher from the database once the backfill is complete. When no
+    operations are left to replay, the new searcher and ``vi`` replace the
+    live ones in ``db.fast_vector_searchers`` and ``db.vector_indices``, and
+    the previous searcher is dropped.
+
+    Only the thread of the rebuild writes to the new searcher until the
+    swap, so that the searchers need not be thread-safe.
+
+    :param db: Datalayer instance
+    :param vi: ``VectorIndex`` to build the new searcher from
+    :param searcher: New searcher, empty
+    """
+
+    def __init__(
+        self, db: 'Datalayer', vi: 'VectorIndex', searcher: 'FastVectorSearcher'
+    ):
+        self.db = db
+        self.vi = vi
+        self.searcher = searcher
+        self.status = 'pending'
+        self.error: t.Optional[str] = None
+        self.started: t.Optional[float] = None
+        self.finished: t.Optional[float] = None
+        self.replayed = 0
+        self._progress: t.Dict[str, t.Any] = {'loaded': 0, 'total': None}
+        self._operations: t.List[t.Tuple[str, t.Any, t.Sequence[str]]] = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    @property
+    def identifier(self) -> str:
+        """Identifier of the vector index."""
+        return self.vi.identifier
+
+    @property
+    def progress(self) -> t.Dict[str, t.Any]:
+        """Status and progress of the rebuild."""
+        end = self.finished or time.time()
+        return {
+            'identifier': self.identifier,
+            'predict_id': self.searcher.predict_id,
+            'status': self.status,
+            'loaded': self._progress['loaded'],
+            'total': self._progress['total'],
+            'replayed': self.replayed,
+            'pending': len(self._operations),
+            'seconds': None if self.started is None else end - self.started,
+            'error': self.error,
+        }
+
+    def copy(self, query: 'CompoundSelect', ids: t.Sequence[str]):
+        """Record vectors copied to the live searcher.
+
+        :param query: Query of the documents whose vectors were copied
+        :param ids: Ids of the documents, all documents of ``query`` if empty
+        """
+        self._record('copy', query, ids)
+
+    def delete(self, ids: t.Sequence[str]):
+        """Record vectors deleted from the live searcher.
+
+        :param ids: Ids of the deleted vectors
+        """
+        self._record('delete', None, ids)
+
+    def _record(self, kind, query, ids):
+        with self._lock:
+            if self.status != 'done':
+                self._operations.append((kind, query, list(ids)))
+                return
+        # The operation raced with the swap, and may have been applied to
+        # the previous searcher only
+        self._apply(kind, query, ids)
+
+    def _apply(self, kind, query, ids):
+        if kind == 'delete':
+            self.searcher.delete(ids)
+            return
+        copy_vectors_to(
+            self.searcher, self.vi, self.searcher.predict_id, query, ids, self.db
+        )
+
+    def start(self) -> 'VectorSearchRebuild':
+        """Run the rebuild in a background thread."""
+        self._thread = threading.Thread(
+            target=self._run_in_background,
+            name=f'rebuild-{self.identifier}',
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: t.Optional[float] = None) -> bool:
+        """Wait until the rebuild has finished or failed.
+
+        :param timeout: Seconds to wait for, ``None`` for no limit
+        """
+        return self._done.wait(timeout)
+
+    def _run_in_background(self):
+        try:
+            self.run()
+        except Exception:
+            # Logged and recorded in ``error`` by ``run``
+            pass
+
+    def run(self):
+        """Backfill the new searcher, replay the operations and swap it in."""
+        self.started = time.time()
+        try:
+            self.status = 'building'
+            logging.info(f"Rebuilding vector-index '{self.identifier}'")
+            self.db.backfill_vector_search(
+                self.vi, self.searcher.searcher, progress=self._progress
+            )
+            self.status = 'catching_up'
+            while True:
+                with self._lock:
+                    operations, self._operations = self._operations, []
+                    if not operations:
+                        self._swap()
+                        break
+                for operation in operations:
+                    self._apply(*operation)
+                    self.replayed += 1
+                self.searcher.post_create()
+            logging.info(f"Swapped in the rebuilt vector-index '{self.identifier}'")
+        except Exception as e:
+            self.status = 'failed'
+            self.error = f'{e.__class__.__name__}: {e}'
+            logging.error(f"Rebuild of '{self.identifier}' failed: {self.error}")
+            if self.db.vector_search_rebuilds.get(self.identifier) is self:
+                del self.db.vector_search_rebuilds[self.identifier]
+            raise
+        finally:
+            self.finished = time.time()
+            self._done.set()
+
+    def _swap(self):
+        previous = self.db.fast_vector_searchers.get(self.identifier)
+        self.db.fast_vector_searchers[self.identifier] = self.searcher
+        self.db.vector_indices[self.identifier] = self.vi
+        self.db.invalidate_vector_search(self.identifier)
+        del self.db.vector_search_rebuilds[self.identifier]
+        self.status = 'done'
+        if previous is not None and previous is not self.searcher:
+            previous.drop()
@@ -1,11 +1,15 @@
 import typing as t
 
+from fastapi import Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from superduperdb import CFG, logging
 from superduperdb.base.datalayer import Datalayer
+from superduperdb.misc.server import BINARY_CONTENT_TYPE
 from superduperdb.server.app import DatalayerDependency, SuperDuperApp
-from superduperdb.vector_search.server import service
+from superduperdb.vector_search import base
+from superduperdb.vector_search.server import service, wire
 
 assert (
     CFG.cluster.vector_search.uri is not None
@@ -21,21 +25,31 @@ class VectorItem(BaseModel):
 
     id: str
     vector: service.ListVectorType
+    source: t.Optional[str] = None
+
+
+async def _body(request: Request) -> bytes:
+    return await request.body()
+
+
+def BinaryBody():
+    """Dependency for injecting the raw body of a binary request."""
+    return Depends(_body)
 
 
 @app.add("/create/search", status_code=200, method='get')
-def create_search(vector_index: str, db: Datalayer = DatalayerDependency()):
+async def create_search(vector_index: str, db: Datalayer = DatalayerDependency()):
     """Create a vector index.
 
     :param vector_index: Vector index to create
     :param db: Datalayer instance
     """
-    service.create_search(vector_index=vector_index, db=db)
+    await run_in_threadpool(service.create_search, vector_index=vector_index, db=db)
     return {'message': 'Vector index created successfully'}
 
 
 @app.add("/create/post_create", status_code=200, method='get')
-def post_create(vector_index: str, db: Datalayer = DatalayerDependency()):
+async def post_create(vector_index: str, db: Datalayer = DatalayerDependency()):
     """Post create method for vector searcher.
 
     Performs post create method of vector searcher to incorporate remaining vectors
@@ -44,25 +58,39 @@ def post_create(vector_index: str, db: Datalayer = DatalayerDependency()):
     :param vector_index: Vector index to post create
     :param db: Datalayer instance
     """
-    service.post_create(vector_index=vector_index, db=db)
+    await run_in_threadpool(service.post_create, vector_index=vector_index, db=db)
     return {'message': 'Post create executed successfully'}
 
 
 @app.add("/query/id/search", method='post')
-def query_search_by_id(
-    id: str, vector_index: str, n: int = 100, db: Datalayer = DatalayerDependency()
+async def query_search_by_id(
+    id: str,
+    vector_index: str,
+    n: int = 100,
+    min_score: t.Optional[float] = None,
+    within_ids: t.List[str] = [],
+    db: Datalayer = DatalayerDependency(),
 ):
     """Query the vector index with an id.
 
     :param id: Id to query
     :param vector_index: Vector index to query
-    :param n: Number of results to return
+    :param n: Number of results to return, ``0`` for all results of a range
+              search
+    :param min_score: Minimum score of the results, for a range search
+    :param within_ids: Ids to search within, sent as the request body
     :param db: Datalayer instance
     """
-    ids, scores = service.query_search_from_id(
-        id, vector_index=vector_index, n=n, db=db
+    ids, scores = await run_in_threadpool(
+        service.query_search_from_id,
+        id,
+        vector_index=vector_index,
+        n=n,
+        min_score=min_score,
+        within_ids=within_ids,
+        db=db,
     )
-    if len(ids) == 0:
+    if len(ids) == 0 and min_score is None:
         msg = (
             'Vectors are not yet loaded in vector database.'
             '\nPlease check if model outputs are ready.'
@@ -72,23 +100,31 @@ def query_search_by_id(
 
 
 @app.add("/query/search")
-def query_search_by_array(
+async def query_search_by_array(
     vector: service.ListVectorType,
     vector_index: str,
     n: int = 100,
+    min_score: t.Optional[float] = None,
     db: Datalayer = DatalayerDependency(),
 ):
     """Query the vector index with a vector.
 
     :param vector: Vector to query
     :param vector_index: Vector index to query
-    :param n: Number of results to return
+    :param n: Number of results to return, ``0`` for all results of a range
+              search
+    :param min_score: Minimum score of the results, for a range search
     :param db: Datalayer instance
     """
-    ids, scores = service.query_search_from_array(
-        vector, vector_index=vector_index, n=n, db=db
+    ids, scores = await run_in_threadpool(
+        service.query_search_from_array,
+        vector,
+        vector_index=vector_index,
+        n=n,
+        min_score=min_score,
+        db=db,
     )
-    if len(ids) == 0:
+    if len(ids) == 0 and min_score is None:
         msg = (
             'Vectors are not yet loaded in vector database.'
             '\nPlease check if model outputs are ready.'
@@ -98,8 +134,108 @@ def query_search_by_array(
     return {'ids': ids, 'scores': scores}
 
 
+@app.add("/query/batch/search")
+async def query_search_by_arrays(
+    vectors: t.List[service.ListVectorType],
+    vector_index: str,
+    n: int = 100,
+    within_ids: t.List[str] = [],
+    min_score: t.Optional[float] = None,
+    db: Datalayer = DatalayerDependency(),
+):
+    """Query the vector index with several vectors at once.
+
+    :param vectors: Vectors to query, one per row
+    :param vector_index: Vector index to query
+    :param n: Number of results to return per vector, ``0`` for all results
+              of a range search
+    :param within_ids: Ids to search within
+    :param min_score: Minimum score of the results, for a range search
+    :param db: Datalayer instance
+    """
+    results = await run_in_threadpool(
+        service.query_search_from_arrays,
+        vectors,
+        vector_index=vector_index,
+        n=n,
+        within_ids=within_ids,
+        min_score=min_score,
+        db=db,
+    )
+    return {
+        'ids': [ids for ids, _ in results],
+        'scores': [scores for _, scores in results],
+    }
+
+
+@app.add("/query/search/binary")
+async def query_search_by_array_binary(
+    vector_index: str,
+    n: int = 100,
+    min_score: t.Optional[float] = None,
+    body: bytes = BinaryBody(),
+    db: Datalayer = DatalayerDependency(),
+):
+    """Query the vector index with a vector sent with the binary wire format.
+
+    :param vector_index: Vector index to query
+    :param n: Number of results to return, ``0`` for all results of a range
+              search
+    :param min_score: Minimum score of the results, for a range search
+    :param body: Query vector and ``within_ids``, encoded with ``wire.encode``
+    :param db: Datalayer instance
+    """
+    h, meta = wire.decode(body)
+    results = await run_in_threadpool(
+        service.query_search_from_arrays,
+        h,
+        vector_index=vector_index,
+        n=n,
+        within_ids=meta.get('within_ids', ()),
+        min_score=min_score,
+        db=db,
+    )
+    if len(results[0][0]) == 0 and min_score is None:
+        msg = (
+            'Vectors are not yet loaded in vector database.'
+            '\nPlease check if model outputs are ready.'
+        )
+        return app.raise_error(msg, 404)
+    return Response(wire.encode_results(results), media_type=BINARY_CONTENT_TYPE)
+
+
+@app.add("/query/batch/search/binary")
+async def query_search_by_arrays_binary(
+    vector_index: str,
+    n: int = 100,
+    min_score: t.Optional[float] = None,
+    body: bytes = BinaryBody(),
+    db: Datalayer = DatalayerDependency(),
+):
+    """Query the vector index with vectors sent with the binary wire format.
+
+    :param vector_index: Vector index to query
+    :param n: Number of results to return per vector, ``0`` for all results
+              of a range search
+    :param min_score: Minimum score of the results, for a range search
+    :param body: Query vectors and ``within_ids``, encoded with ``wire.encode``
+    :param db: Datalayer instance
+    """
+    h, meta = wire.decode(body)
+    results = await run_in_threadpool(
+        service.query_search_from_arrays,
+        h,
+        vector_index=vector_index,
+        n=n,
+        within_ids=meta.get('within_ids', ()),
+        min_score=min_score,
+        db=db,
+    )
+    return Response(wire.encode_results(results), media_type=BINARY_CONTENT_TYPE)
+
+
 @app.add("/add/search")
-def add_search(
+async def add_search(
     vectors: t.List[VectorItem],
     vector_index: str,
     db: Datalayer = DatalayerDependency(),
@@ -111,12 +247,56 @@ def add_search(
     :param db: Datalayer instance
     """
     logging.info(f'Adding {len(vectors)} to search')
-    service.add_search(vectors, vector_index=vector_index, db=db)
+    await run_in_threadpool(
+        service.add_search, vectors, vector_index=vector_index, db=db
+    )
+    return {'message': 'Added vectors successfully'}
+
+
+@app.add("/add/search/binary")
+async def add_search_binary(
+    vector_index: str,
+    body: bytes = BinaryBody(),
+    db: Datalayer = DatalayerDependency(),
+):
+    """Add vectors sent with the binary wire format to the vector index.
+
+    :param vector_index: Vector index to add to
+    :param body: Vectors and their ``ids``, encoded with ``wire.encode``
+    :param db: Datalayer instance
+    """
+    h, meta = wire.decode(body)
+    logging.info(f'Adding {len(h)} to search')
+    sources = meta.get('sources') or [None] * len(h)
+    vectors = [
+        base.VectorItem(id=id, vector=v, source=source)
+        for id, v, source in zip(meta['ids'], h, sources)
+    ]
+    await run_in_threadpool(
+        service.add_search, vectors, vector_index=vector_index, db=db
+    )
     return {'message': 'Added vectors successfully'}
 
 
+@app.add("/query/vector", method='get')
+async def get_vector(id: str, vector_index: str, db: Datalayer = DatalayerDependency()):
+    """Get the vector stored for an id.
+
+    :param id: Id of the vector
+    :param vector_index: Vector index holding the vector
+    :param db: Datalayer instance
+    """
+    try:
+        vector = await run_in_threadpool(
+            service.get_vector, id, vector_index=vector_index, db=db
+        )
+    except KeyError:
+        app.raise_error(f'No vector with id {id!r}', 404)
+    return {'vector': vector}
+
+
 @app.add("/delete/search")
-def delete_search(
+async def delete_search(
     ids: t.List[str], vector_index: str, db: Datalayer = DatalayerDependency()
 ):
     """Delete vectors from the vector index.
@@ -125,14 +305,16 @@ def delete_search(
     :param vector_index: Vector index to delete from
     :param db: Datalayer instance
     """
-    service.delete_search(ids, vector_index=vector_index, db=db)
+    await run_in_threadpool(
+        service.delete_search, ids, vector_index=vector_index, db=db
+    )
     return {'message': 'Ids deleted successfully'}
 
 
 @app.add("/list/search")
-def list_search(db: Datalayer = DatalayerDependency()):
+async def list_search(db: Datalayer = DatalayerDependency()):
     """List all the vector indices in the database.
 
     :param db: Datalayer instance
     """
-    return service.list_search(db)
+    return await run_in_threadpool(service.list_search, db)
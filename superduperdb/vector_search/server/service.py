@@ -1,6 +1,7 @@
 import math
 import typing as t
 
+import numpy
 from fastapi import Request
 
 from superduperdb.base.datalayer import Datalayer
@@ -12,21 +13,36 @@ ListVectorType = t.Union[t.List[t.Union[float, int]], t.Dict]
 VectorSearchResultType = t.Tuple[t.List[str], t.List[float]]
 
 
+def _scores(scores: t.Sequence[float]) -> t.List[float]:
+    # Scores which are not a number (e.g. the cosine of a zero vector)
+    # are returned as -1.0
+    return [-1.0 if math.isnan(s) else s for s in scores]
+
+
 def _vector_search(
     x: t.Union[str, ListVectorType],
     n: int,
     vector_index: str,
     db: Datalayer,
     by_array: bool = True,
+    min_score: t.Optional[float] = None,
+    within_ids: t.Sequence[str] = (),
 ) -> VectorSearchResultType:
     vi = db.fast_vector_searchers[vector_index]
     if by_array:
         x = superduperdecode(x, db.datatypes)
-        ids, scores = vi.searcher.find_nearest_from_array(x, n=n)
+    if min_score is not None:
+        find = (
+            vi.searcher.find_in_range_from_array
+            if by_array
+            else vi.searcher.find_in_range_from_id
+        )
+        ids, scores = find(x, min_score, n=n or None, within_ids=within_ids)
+    elif by_array:
+        ids, scores = vi.searcher.find_nearest_from_array(x, n=n, within_ids=within_ids)
     else:
-        ids, scores = vi.searcher.find_nearest_from_id(x, n=n)
-    scores = [-1.0 if math.isnan(s) else s for s in scores]
-    return ids, scores
+        ids, scores = vi.searcher.find_nearest_from_id(x, n=n, within_ids=within_ids)
+    return ids, _scores(scores)
 
 
 def database(request: Request) -> Datalayer:
@@ -64,9 +80,12 @@ def create_search(vector_index: str, db: Datalayer):
     :param vector_index: Vector class to initiate
     :param db: Datalayer instance
     """
+    previous = db.fast_vector_searchers.get(vector_index)
     db.fast_vector_searchers.update(
         {vector_index: db.initialize_vector_searcher(vector_index)}
     )
+    if previous is not None:
+        previous.drop()
 
 
 def query_search_from_array(
@@ -74,28 +93,86 @@ def query_search_from_array(
     vector_index: str,
     db: Datalayer,
     n: int = 100,
+    within_ids: t.Sequence[str] = (),
+    min_score: t.Optional[float] = None,
 ) -> VectorSearchResultType:
     """Perform a vector search with an array.
 
     :param array: Array to perform vector search on index.
     :param vector_index: Vector search index
     :param db: Datalayer instance
-    :param n: Number of nearest neighbors to be returned
+    :param n: Number of nearest neighbors to be returned, ``0`` for all
+              neighbors scoring at least ``min_score``
+    :param within_ids: Ids to search within
+    :param min_score: Minimum score of the neighbors
+    """
+    return _vector_search(
+        array,
+        n=n,
+        vector_index=vector_index,
+        db=db,
+        min_score=min_score,
+        within_ids=within_ids,
+    )
+
+
+def query_search_from_arrays(
+    arrays: t.Union[t.Sequence[ListVectorType], numpy.ndarray],
+    vector_index: str,
+    db: Datalayer,
+    n: int = 100,
+    within_ids: t.Sequence[str] = (),
+    min_score: t.Optional[float] = None,
+) -> t.List[VectorSearchResultType]:
+    """Perform a vector search with several arrays at once.
+
+    :param arrays: Arrays to perform vector search on index, one per query,
+                   or a 2-d array of queries.
+    :param vector_index: Vector search index
+    :param db: Datalayer instance
+    :param n: Number of nearest neighbors to be returned per query, ``0``
+              for all neighbors scoring at least ``min_score``
+    :param within_ids: Ids to search within
+    :param min_score: Minimum score of the neighbors
     """
-    return _vector_search(array, n=n, vector_index=vector_index, db=db)
+    vi = db.fast_vector_searchers[vector_index]
+    h = [superduperdecode(x, db.datatypes) for x in arrays]
+    if min_score is not None:
+        results = vi.searcher.find_in_range_from_arrays(
+            h, min_score, n=n or None, within_ids=within_ids
+        )
+    else:
+        results = vi.searcher.find_nearest_from_arrays(h, n=n, within_ids=within_ids)
+    return [(ids, _scores(scores)) for ids, scores in results]
 
 
 def query_search_from_id(
-    id: str, vector_index: str, db: Datalayer, n: int = 100
+    id: str,
+    vector_index: str,
+    db: Datalayer,
+    n: int = 100,
+    within_ids: t.Sequence[str] = (),
+    min_score: t.Optional[float] = None,
 ) -> VectorSearchResultType:
     """Perform a vector search with an id.
 
     :param id: Identifier for vector
     :param vector_index: Vector search index
     :param db: Datalayer instance
-    :param n: Number of nearest neighbors to be returned
+    :param n: Number of nearest neighbors to be returned, ``0`` for all
+              neighbors scoring at least ``min_score``
+    :param within_ids: Ids to search within
+    :param min_score: Minimum score of the neighbors
     """
-    return _vector_search(id, n=n, vector_index=vector_index, db=db, by_array=False)
+    return _vector_search(
+        id,
+        n=n,
+        vector_index=vector_index,
+        db=db,
+        by_array=False,
+        min_score=min_score,
+        within_ids=within_ids,
+    )
 
 
 def add_search(vector, vector_index: str, db: Datalayer):
@@ -105,12 +182,26 @@ def add_search(vector, vector_index: str, db: Datalayer):
     :param vector_index: Vector index where vector needs to be added.
     :param db: Datalayer instance
     """
-    vector = [VectorItem(id=v.id, vector=v.vector) for v in vector]
+    vector = [
+        VectorItem(id=v.id, vector=v.vector, source=getattr(v, 'source', None))
+        for v in vector
+    ]
 
     vi = db.fast_vector_searchers[vector_index]
     vi.searcher.add(vector)
 
 
+def get_vector(id: str, vector_index: str, db: Datalayer) -> ListVectorType:
+    """Get the vector stored for `id`.
+
+    :param id: Id of the vector.
+    :param vector_index: Vector index holding the vector.
+    :param db: Datalayer instance
+    """
+    vi = db.fast_vector_searchers[vector_index]
+    return numpy.asarray(vi.searcher.get_vector(id)).tolist()
+
+
 def delete_search(ids: t.List[str], vector_index: str, db: Datalayer):
     """Deletes a vector corresponding to `id`.
 
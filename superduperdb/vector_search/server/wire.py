@@ -0,0 +1,68 @@
+import json
+import struct
+import typing as t
+
+import numpy
+import numpy.typing
+
+_MAGIC = b'SDV1'
+_HEADER = struct.Struct('<4sIII')
+
+
+def encode(h: numpy.typing.ArrayLike, meta: t.Optional[t.Dict] = None) -> bytes:
+    """Encode a matrix of vectors and a JSON-serializable ``meta`` dict.
+
+    The layout is a 16 byte header (magic, rows, columns and the length of
+    ``meta``), the vectors as raw little-endian ``float32`` and ``meta`` as
+    UTF-8 encoded JSON.
+
+    :param h: 2-d array of vectors, one per row
+    :param meta: Ids and other fields sent along with the vectors
+    """
+    h = numpy.ascontiguousarray(h, dtype='<f4')
+    if h.ndim == 1:
+        h = h[None, :]
+    rows, columns = h.shape
+    encoded_meta = json.dumps(meta or {}).encode()
+    header = _HEADER.pack(_MAGIC, rows, columns, len(encoded_meta))
+    return b''.join([header, h.tobytes(), encoded_meta])
+
+
+def decode(data: bytes) -> t.Tuple[numpy.ndarray, t.Dict]:
+    """Decode the output of ``encode``.
+
+    The vectors are a read-only view on ``data``.
+
+    :param data: Bytes written by ``encode``
+    """
+    magic, rows, columns, meta_length = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError('Not an encoded vector message')
+    start = _HEADER.size
+    end = start + 4 * rows * columns
+    if len(data) != end + meta_length:
+        raise ValueError('Truncated vector message')
+    h = numpy.frombuffer(data, dtype='<f4', count=rows * columns, offset=start)
+    meta = json.loads(data[end:]) if meta_length else {}
+    return h.reshape(rows, columns), meta
+
+
+def encode_results(results: t.Sequence[t.Tuple[t.List[str], t.List[float]]]):
+    """Encode the results of several vector searches.
+
+    :param results: ``(ids, scores)`` for each query
+    """
+    width = max((len(ids) for ids, _ in results), default=0)
+    scores = numpy.full((len(results), width), numpy.nan, dtype=numpy.float32)
+    for i, (_, row) in enumerate(results):
+        scores[i, : len(row)] = row
+    return encode(scores, {'ids': [list(ids) for ids, _ in results]})
+
+
+def decode_results(data: bytes) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+    """Decode the output of ``encode_results``.
+
+    :param data: Bytes written by ``encode_results``
+    """
+    scores, meta = decode(data)
+    return [(ids, row[: len(ids)].tolist()) for ids, row in zip(meta['ids'], scores)]
@@ -0,0 +1,322 @@
+import contextlib
+import heapq
+import multiprocessing
+import threading
+import typing as t
+import uuid
+import zlib
+from functools import lru_cache
+from multiprocessing.connection import Client, Connection, Listener
+
+import numpy
+import numpy.typing
+
+from superduperdb import logging
+from superduperdb.vector_search.base import BaseVectorSearcher, VectorItem
+
+ResultType = t.Tuple[t.List[str], t.List[float]]
+
+
+class Shard:
+    """Connection to a shard worker holding a partition of the vector indices.
+
+    :param connection: Connection to the worker
+    :param process: The worker process, if it was started locally
+    """
+
+    def __init__(
+        self,
+        connection: Connection,
+        process: t.Optional[multiprocessing.process.BaseProcess] = None,
+    ):
+        self.connection = connection
+        self.process = process
+        self.lock = threading.Lock()
+
+    def send(self, key: str, method: str, *args, **kwargs):
+        """Send a call of ``method`` to the worker, without waiting for it.
+
+        The lock of the shard must be held until the result is received.
+
+        :param key: Key of the partition of the searcher
+        :param method: Method of the searcher to call
+        :param *args: Positional arguments of the call
+        :param **kwargs: Keyword arguments of the call
+        """
+        self.connection.send((key, method, args, kwargs))
+
+    def receive(self):
+        """Receive the result of the last call sent to the worker."""
+        ok, result = self.connection.recv()
+        if not ok:
+            raise result
+        return result
+
+
+def serve(connection: Connection, searchers: t.Dict, lock: threading.Lock):
+    """Answer the calls received on ``connection`` until it is closed.
+
+    Partitions are keyed by ``ShardedVectorSearcher``, so that clients
+    sharing a shard never replace each other's partitions. Partitions are
+    dropped with a ``drop`` call, and those created over ``connection``
+    when it is closed.
+
+    :param connection: Connection to a ``ShardedVectorSearcher``
+    :param searchers: Searchers of this shard, by partition key
+    :param lock: Lock serializing calls to the searchers
+    """
+    created: t.Set[str] = set()
+    while True:
+        try:
+            key, method, args, kwargs = connection.recv()
+        except (EOFError, OSError):
+            with lock:
+                for created_key in created:
+                    searchers.pop(created_key, None)
+            return
+        try:
+            with lock:
+                if method == 'create':
+                    if key in searchers:
+                        raise KeyError(f'Partition {key!r} already exists')
+                    # ``args[0]`` is an empty searcher to hold the partition
+                    searchers[key] = args[0]
+                    created.add(key)
+                    result = None
+                elif method == 'drop':
+                    created.discard(key)
+                    searcher = searchers.pop(key, None)
+                    if searcher is not None:
+                        searcher.drop()
+                    result = None
+                else:
+                    result = getattr(searchers[key], method)(*args, **kwargs)
+        except Exception as e:
+            try:
+                connection.send((False, e))
+            except Exception:
+                connection.send((False, RuntimeError(repr(e))))
+        else:
+            connection.send((True, result))
+
+
+def _run_local(connection: Connection):
+    serve(connection, {}, threading.Lock())
+
+
+def serve_remote(address: str, authkey: str):
+    """Run a shard worker accepting connections at ``host:port``.
+
+    :param address: Address to listen at, as ``host:port``
+    :param authkey: Key which connecting clients must present
+    """
+    host, port = address.rsplit(':', 1)
+    searchers: t.Dict = {}
+    lock = threading.Lock()
+    with Listener((host, int(port)), authkey=authkey.encode()) as listener:
+        logging.info(f'Vector-search shard listening at {address}')
+        while True:
+            connection = listener.accept()
+            threading.Thread(
+                target=serve, args=(connection, searchers, lock), daemon=True
+            ).start()
+
+
+@lru_cache(maxsize=None)
+def connect(
+    n_local: int, uris: t.Tuple[str, ...] = (), authkey: t.Optional[str] = None
+) -> t.List[Shard]:
+    """Start ``n_local`` shard worker processes and connect to ``uris``.
+
+    The shards are shared by all ``ShardedVectorSearcher`` instances of the
+    process.
+
+    :param n_local: Number of local worker processes to start
+    :param uris: Addresses (``host:port``) of remote shard workers
+    :param authkey: Key to present to the remote shard workers
+    """
+    shards = []
+    context = multiprocessing.get_context('spawn')
+    for _ in range(n_local):
+        connection, child = context.Pipe()
+        process = context.Process(target=_run_local, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        shards.append(Shard(connection, process))
+
+    if uris and authkey is None:
+        raise ValueError('An authkey is required to connect to remote shards')
+    for uri in uris:
+        host, port = uri.split('://')[-1].rsplit(':', 1)
+        assert authkey is not None
+        shards.append(Shard(Client((host, int(port)), authkey=authkey.encode())))
+    return shards
+
+
+class ShardedVectorSearcher(BaseVectorSearcher):
+    """Vector searcher partitioned over several shard worker processes.
+
+    Vector ids are hash-partitioned over the shards. ``add`` and ``delete``
+    are routed to the shard owning each id; queries are sent to all shards
+    at once and the per-shard top ``n`` are merged by score.
+
+    :param searcher: Empty searcher which is copied to each shard
+    :param shards: Connections to the shard workers
+    """
+
+    def __init__(self, searcher: BaseVectorSearcher, shards: t.Sequence[Shard]):
+        self.identifier = searcher.identifier
+        self.dimensions = searcher.dimensions
+        self.shards = list(shards)
+        # Each searcher has its own partitions, e.g. a rebuild next to the
+        # live searcher, or other clients of the same remote shards
+        self._key = f'{self.identifier}/{uuid.uuid4().hex}'
+        self._call_all('create', searcher)
+
+    def _owner(self, _id: str) -> int:
+        # ``hash`` is salted per process, ``crc32`` is stable
+        return zlib.crc32(_id.encode()) % len(self.shards)
+
+    def _partition(self, ids: t.Iterable[str]) -> t.Dict[int, t.List[str]]:
+        partition: t.Dict[int, t.List[str]] = {}
+        for _id in ids:
+            partition.setdefault(self._owner(_id), []).append(_id)
+        return partition
+
+    def _call(self, calls: t.Dict[int, t.Tuple]) -> t.Dict[int, t.Any]:
+        # Send every call before waiting for any result, so that the
+        # shards work in parallel. Locks are taken in a fixed order.
+        with contextlib.ExitStack() as stack:
+            for i in sorted(calls):
+                stack.enter_context(self.shards[i].lock)
+            for i, (method, args, kwargs) in calls.items():
+                self.shards[i].send(self._key, method, *args, **kwargs)
+            results, error = {}, None
+            for i in calls:
+                try:
+                    results[i] = self.shards[i].receive()
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def _call_all(self, method: str, *args, **kwargs) -> t.Dict[int, t.Any]:
+        return self._call({i: (method, args, kwargs) for i in range(len(self.shards))})
+
+    def __len__(self):
+        return sum(self._call_all('__len__').values())
+
+    def add(self, items: t.Sequence[VectorItem]) -> None:
+        """Add items to the shards owning their ids.
+
+        :param items: t.Sequence of VectorItems
+        """
+        partition: t.Dict[int, t.List[VectorItem]] = {}
+        for item in items:
+            partition.setdefault(self._owner(item.id), []).append(item)
+        self._call({i: ('add', (batch,), {}) for i, batch in partition.items()})
+
+    def delete(self, ids: t.Sequence[str]) -> None:
+        """Remove items from the shards owning their ids.
+
+        :param ids: t.Sequence of ids of vectors.
+        """
+        partition = self._partition(ids)
+        self._call({i: ('delete', (batch,), {}) for i, batch in partition.items()})
+
+    def post_create(self):
+        """Post create method of the searcher of each shard."""
+        self._call_all('post_create')
+
+    def drop(self):
+        """Drop the partitions of the searcher from the shards."""
+        self._call_all('drop')
+
+    def get_vector(self, _id: str) -> numpy.ndarray:
+        """Get the vector stored for an id.
+
+        :param _id: id of the vector
+        """
+        owner = self._owner(_id)
+        return self._call({owner: ('get_vector', (_id,), {})})[owner]
+
+    def find_nearest_from_id(
+        self,
+        _id,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> ResultType:
+        """
+        Find the nearest vectors to the vector with the given id.
+
+        :param _id: id of the vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        return self.find_nearest_from_array(
+            self.get_vector(_id), n=n, within_ids=within_ids
+        )
+
+    def find_nearest_from_array(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> ResultType:
+        """
+        Find the nearest vectors to the given vector.
+
+        :param h: vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        h = self.to_numpy(h)[None, :]
+        return self.find_nearest_from_arrays(h, n=n, within_ids=within_ids)[0]
+
+    def find_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.List[ResultType]:
+        """
+        Find the nearest vectors to each of the given vectors.
+
+        Each shard returns its top ``n``, of which the top ``n`` are kept.
+
+        :param h: 2-d array of vectors, one query per row
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        queries: numpy.ndarray = numpy.asarray(self.to_numpy(h))
+        if within_ids:
+            # Only shards owning some of the ids are searched; an empty
+            # ``within_ids`` would search the whole shard.
+            calls = {
+                i: (
+                    'find_nearest_from_arrays',
+                    (queries,),
+                    {'n': n, 'within_ids': ids},
+                )
+                for i, ids in self._partition(within_ids).items()
+            }
+        else:
+            calls = {
+                i: ('find_nearest_from_arrays', (queries,), {'n': n})
+                for i in range(len(self.shards))
+            }
+        per_shard = list(self._call(calls).values())
+
+        results = []
+        for q in range(queries.shape[0]):
+            merged = heapq.nlargest(
+                n,
+                (
+                    (score, _id)
+                    for shard_results in per_shard
+                    for _id, score in zip(*shard_results[q])
+                ),
+            )
+            results.append(([_id for _, _id in merged], [s for s, _ in merged]))
+        return results
@@ -6,6 +6,7 @@ from superduperdb.backends.mongodb.data_backend import MongoDataBackend
 from superduperdb.base.serializable import Serializable
 from superduperdb.misc.special_dicts import MongoStyleDict
 from superduperdb.vector_search.base import VectorItem
+from superduperdb.vector_search.multi_vector import chunk_id
 
 if t.TYPE_CHECKING:
     from superduperdb.base.datalayer import Datalayer
@@ -22,7 +23,13 @@ def delete_vectors(
     :param ids: List of ids which were observed as deleted documents.
     :param db: Datalayer instance.
     """
-    return db.fast_vector_searchers[vector_index].delete(ids)
+    # A rebuild swapped in after the delete applies it when recorded, so
+    # that the rebuild is looked up first
+    rebuild = db.vector_search_rebuilds.get(vector_index)
+    db.fast_vector_searchers[vector_index].delete(ids)
+    if rebuild is not None:
+        rebuild.delete(ids)
+    db.invalidate_vector_search(vector_index)
 
 
 def copy_vectors(
@@ -43,34 +50,58 @@ def copy_vectors(
         # ruff: noqa: E501
         query: CompoundSelect = Serializable.decode(query)  # type: ignore[no-redef]
     assert isinstance(query, CompoundSelect)
+    # See ``delete_vectors``
+    rebuild = db.vector_search_rebuilds.get(vi.identifier)
+    searcher = db.fast_vector_searchers[vi.identifier]
+    predict_id = searcher.predict_id or vi.indexing_listener.predict_id
+    copy_vectors_to(searcher, vi, predict_id, query, ids, db)
+    if rebuild is not None:
+        rebuild.copy(query, ids)
+    db.invalidate_vector_search(vi.identifier)
+
+
+def copy_vectors_to(
+    searcher,
+    vi,
+    predict_id: str,
+    query: CompoundSelect,
+    ids: t.Sequence[str],
+    db: 'Datalayer',
+):
+    """Copy the outputs ``predict_id`` of documents of ``query`` to a searcher.
+
+    :param searcher: Searcher to add the vectors to
+    :param vi: ``VectorIndex`` of the searcher
+    :param predict_id: Predict id of the outputs
+    :param query: A query which was used by `db._build_task_workflow` method
+    :param ids: List of ids which were observed as added/updated documents.
+    :param db: Datalayer instance.
+    """
     if not ids:
         select = query
     else:
         select = query.select_using_ids(ids)
+    if vi.multi_vector:
+        return _copy_chunks(searcher, predict_id, select, ids, db)
     docs = db._select(select)
     docs = [doc.unpack() for doc in docs]
-    key = vi.indexing_listener.key
-    if '_outputs.' in key:
-        key = key.split('.')[1]
     # TODO: Refactor the below logic
     vectors = []
     if isinstance(db.databackend, MongoDataBackend):
         vectors = [
             {
-                'vector': MongoStyleDict(doc)[
-                    f'_outputs.{vi.indexing_listener.predict_id}'
-                ],
+                'vector': MongoStyleDict(doc)[f'_outputs.{predict_id}'],
                 'id': str(doc['_id']),
             }
             for doc in docs
         ]
     elif isinstance(db.databackend, IbisDataBackend):
-        docs = db.execute(select.outputs(vi.indexing_listener.predict_id))
+        docs = db.execute(select.outputs(predict_id))
         from superduperdb.backends.ibis.data_backend import INPUT_KEY
 
         vectors = [
             {
-                'vector': doc[f'_outputs.{vi.indexing_listener.predict_id}'],
+                'vector': doc[f'_outputs.{predict_id}'],
                 'id': str(doc[INPUT_KEY]),
             }
             for doc in docs
@@ -80,6 +111,32 @@ def copy_vectors(
             r['vector'] = r['vector'].numpy()
 
     if vectors:
-        db.fast_vector_searchers[vi.identifier].add(
-            [VectorItem(**vector) for vector in vectors]
-        )
+        searcher.add([VectorItem(**vector) for vector in vectors])
+
+
+def _copy_chunks(searcher, predict_id, select: CompoundSelect, ids, db):
+    if isinstance(db.databackend, MongoDataBackend):
+        from bson import ObjectId
+
+        from superduperdb.backends.mongodb.query import Collection
+
+        filter = {'_source': {'$in': [ObjectId(id) for id in ids]}} if ids else {}
+        records = db.execute(Collection(f'_outputs.{predict_id}').find(filter))
+        id_field = '_id'
+    else:
+        records = db.execute(select.outputs(predict_id))
+        id_field = select.table_or_collection.primary_id
+
+    offsets: t.Dict[str, int] = {}
+    items = []
+    for record in records:
+        _id, source = chunk_id(record, str(record[id_field]), offsets)
+        vector = MongoStyleDict(record.unpack())[f'_outputs.{predict_id}']
+        items.append(VectorItem.create(id=_id, vector=vector, source=source))
+
+    # The chunks of the previous outputs of the documents are replaced
+    sources = list({item.source for item in items} | set(ids))
+    if sources:
+        searcher.delete(sources)
+    if items:
+        searcher.add(items)
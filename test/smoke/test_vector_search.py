@@ -54,3 +54,54 @@ def test_basic_workflow(client):
     )
     by_id = json.loads(response.content)
     assert by_id['error'] == 'KeyError'
+
+
+def test_batch_query(client):
+    vector_index = 'test_index'
+    uri = CFG.cluster.vector_search.uri
+
+    data = [
+        {'vector': [100, 100, 100], 'id': '100'},
+        {'vector': [-100, 100, 100], 'id': '101'},
+    ]
+    response = requests.post(f"{uri}/add/search?vector_index={vector_index}", json=data)
+    assert response.status_code == 200
+
+    response = requests.post(
+        f"{uri}/query/batch/search?vector_index={vector_index}&n=1",
+        json={'vectors': [[100, 100, 100], [-100, 100, 100]], 'within_ids': []},
+    )
+    batch = json.loads(response.content)
+    assert batch['ids'] == [['100'], ['101']]
+
+    requests.post(
+        f"{uri}/delete/search?vector_index={vector_index}", json=['100', '101']
+    )
+
+
+def test_binary_query(client):
+    from superduperdb.misc.server import BINARY_CONTENT_TYPE
+    from superduperdb.vector_search.server import wire
+
+    vector_index = 'test_index'
+    uri = CFG.cluster.vector_search.uri
+    headers = {'Content-Type': BINARY_CONTENT_TYPE}
+
+    response = requests.post(
+        f"{uri}/add/search/binary?vector_index={vector_index}",
+        data=wire.encode([[100, 100, 100], [-100, 100, 100]], {'ids': ['100', '101']}),
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = requests.post(
+        f"{uri}/query/batch/search/binary?vector_index={vector_index}&n=1",
+        data=wire.encode([[100, 100, 100], [-100, 100, 100]]),
+        headers=headers,
+    )
+    results = wire.decode_results(response.content)
+    assert [ids for ids, _ in results] == [['100'], ['101']]
+
+    requests.post(
+        f"{uri}/delete/search?vector_index={vector_index}", json=['100', '101']
+    )
@@ -226,3 +226,112 @@ def test_replace_one(db):
     db.execute(collection.replace_one({'_id': r['_id']}, r))
     doc = db.execute(collection.find_one({'_id': r['_id']}))
     assert doc.unpack()['x'].tolist() == new_x.tolist()
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [(DBConfig.mongodb, {'n_data': 50})], indirect=True)
+def test_like_plans(db, monkeypatch):
+    from superduperdb import CFG
+
+    collection = Collection('documents')
+    r = db.execute(collection.find_one())
+    ys = {str(d['_id']): d['y'] for d in db.execute(collection.find({}, {'y': 1}))}
+    like = Document({'x': r['x']})
+    all_ids, all_scores = db.select_nearest(like, vector_index='test_vector_search')
+
+    monkeypatch.setattr(CFG.cluster.vector_search, 'like_max_ids', 5)
+    for min_selectivity, strategy in [(0.01, 'search_then_filter'), (2, None)]:
+        monkeypatch.setattr(
+            CFG.cluster.vector_search, 'like_min_selectivity', min_selectivity
+        )
+        q = collection.find({'y': 1}).like(like, vector_index='test_vector_search', n=5)
+        plan = q.plan(db)
+        assert plan.strategy == (strategy or 'filter_then_search')
+        assert plan.matches > 5
+        assert not plan.exact
+
+        out = db.execute(q)
+        expected = [i for i in all_ids if ys[i] == 1][:5]
+        assert sorted(out.scores, key=lambda i: -out.scores[i]) == expected
+        assert {str(d['_id']) for d in out} == set(expected)
+
+    # Filters matching few documents are applied first
+    q = collection.find({'_id': r['_id']}).like(like, vector_index='test_vector_search')
+    plan = q.plan(db)
+    assert (plan.strategy, plan.matches, plan.exact) == ('filter_then_search', 1, True)
+    assert list(db.execute(q).scores) == [str(r['_id'])]
+
+    # The documents matching a filter are counted once per collection and
+    # filter, until the estimate expires
+    db.like_estimate_cache.clear()
+    for _ in range(2):
+        assert q.plan(db).matches == 1
+    assert db.like_estimate_cache.stats == {'size': 1, 'hits': 1, 'misses': 1}
+    other = Collection('other').find({'_id': r['_id']})
+    other = other.like(like, vector_index='test_vector_search')
+    assert other.plan(db).matches == 0
+    assert db.like_estimate_cache.stats['size'] == 2
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [(DBConfig.mongodb, {'n_data': 50})], indirect=True)
+def test_like_in_range(db):
+    collection = Collection('documents')
+    r = db.execute(collection.find_one())
+    ys = {str(d['_id']): d['y'] for d in db.execute(collection.find({}, {'y': 1}))}
+    like = Document({'x': r['x']})
+    all_ids, all_scores = db.select_nearest(like, vector_index='test_vector_search')
+    min_score = (all_scores[9] + all_scores[10]) / 2
+
+    ids, scores = db.select_nearest(
+        like, vector_index='test_vector_search', n=None, min_score=min_score
+    )
+    assert ids == all_ids[:10]
+    assert scores == pytest.approx(all_scores[:10], rel=1e-5)
+    # The distance of cosine is one minus the score
+    ids, _ = db.select_nearest(
+        like, vector_index='test_vector_search', n=None, max_distance=1 - min_score
+    )
+    assert ids == all_ids[:10]
+    ids, _ = db.select_nearest(
+        like, vector_index='test_vector_search', n=3, min_score=min_score
+    )
+    assert ids == all_ids[:3]
+
+    q = collection.find({'y': 1}).like(
+        like, vector_index='test_vector_search', n=None, min_score=min_score
+    )
+    assert q.plan(db).strategy == 'filter_then_search'
+    out = db.execute(q)
+    expected = [i for i in all_ids[:10] if ys[i] == 1]
+    assert sorted(out.scores, key=lambda i: -out.scores[i]) == expected
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [(DBConfig.mongodb, {'n_data': 50})], indirect=True)
+def test_like_fused(db):
+    collection = Collection('documents')
+    r = db.execute(collection.find_one())
+    ys = {str(d['_id']): d['y'] for d in db.execute(collection.find({}, {'y': 1}))}
+    like = Document({'x': r['x']})
+    expected, _ = db.select_nearest(like, vector_index='test_vector_search', n=10)
+
+    # The same index twice ranks as the index itself
+    indices = ['test_vector_search', 'test_vector_search']
+    for fusion in ('rrf', 'weighted_sum'):
+        ids, _ = db.select_nearest_fused(like, indices, n=10, fusion=fusion)
+        assert ids == expected
+
+    q = collection.find({'y': 1}).like(like, vector_index=indices, n=10)
+    assert q.plan(db).strategy == 'filter_then_search'
+    out = db.execute(q)
+    filtered, _ = db.select_nearest(
+        like,
+        vector_index='test_vector_search',
+        ids=[i for i, y in ys.items() if y == 1],
+        n=10,
+    )
+    assert sorted(out.scores, key=lambda i: -out.scores[i]) == filtered
+
+    with pytest.raises(ValueError, match='thresholds are not supported'):
+        db.execute(collection.like(like, vector_index=indices, n=None).find())
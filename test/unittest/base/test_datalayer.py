@@ -1,8 +1,10 @@
+import asyncio
 import time
 from typing import Any, ClassVar, Optional, Sequence
 
 import numpy
 import pytest
+from bson import ObjectId
 
 try:
     import torch
@@ -37,6 +39,7 @@ from superduperdb.components.datatype import (
 from superduperdb.components.listener import Listener
 from superduperdb.components.model import ObjectModel
 from superduperdb.components.schema import Schema
+from superduperdb.vector_search.base import VectorItem
 
 n_data_points = 250
 
@@ -703,4 +706,339 @@ def test_dataset(db):
     assert len(dataset.data) == len(list(db.execute(dataset.select)))
 
 
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb, DBConfig.sqldb], indirect=True)
+def test_select_nearest_many(db):
+    if isinstance(db.databackend, MongoDataBackend):
+        records = list(Collection('documents').find().limit(3).execute(db))
+    else:
+        table = db.load('table', 'documents')
+        records = list(table.select('id', 'x').limit(3).execute(db))
+    likes = [{'x': r['x']} for r in records]
+
+    results = db.select_nearest_many(likes, vector_index='test_vector_search', n=5)
+
+    assert len(results) == 3
+    for like, (ids, scores) in zip(likes, results):
+        expected_ids, expected_scores = db.select_nearest(
+            like, vector_index='test_vector_search', n=5
+        )
+        assert ids == expected_ids
+        assert scores == pytest.approx(expected_scores, rel=1e-4)
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb, DBConfig.sqldb], indirect=True)
+def test_aselect_nearest(db):
+    if isinstance(db.databackend, MongoDataBackend):
+        records = list(Collection('documents').find().limit(3).execute(db))
+    else:
+        table = db.load('table', 'documents')
+        records = list(table.select('id', 'x').limit(3).execute(db))
+    likes = [{'x': r['x']} for r in records]
+
+    async def search():
+        return await asyncio.gather(
+            *[
+                db.aselect_nearest(like, vector_index='test_vector_search', n=5)
+                for like in likes
+            ]
+        )
+
+    results = asyncio.run(search())
+    for like, (ids, scores) in zip(likes, results):
+        expected_ids, expected_scores = db.select_nearest(
+            like, vector_index='test_vector_search', n=5
+        )
+        assert ids == expected_ids
+        assert scores == pytest.approx(expected_scores, rel=1e-4)
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb, DBConfig.sqldb], indirect=True)
+def test_query_cache(db):
+    if isinstance(db.databackend, MongoDataBackend):
+        r = Collection('documents').find_one().execute(db)
+    else:
+        table = db.load('table', 'documents')
+        r = list(table.select('id', 'x').limit(1).execute(db))[0]
+    like = {'x': r['x']}
+    vi = db.vector_indices['test_vector_search']
+    model = db.models[vi.indexing_listener.model.identifier]
+
+    with patch.object(model, 'predict_one', wraps=model.predict_one) as predict:
+        expected = db.select_nearest(like, vector_index='test_vector_search', n=5)
+        assert db.select_nearest(like, vector_index='test_vector_search', n=5) == (
+            expected
+        )
+        db.select_nearest_many([like], vector_index='test_vector_search', n=5)
+        assert predict.call_count == 1
+    assert db.query_cache.hits == 2
+
+    db.replace(model)
+    assert len(db.query_cache) == 0
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb, DBConfig.sqldb], indirect=True)
+def test_result_cache(db):
+    from superduperdb.misc.cache import LRUCache
+    from superduperdb.vector_search.update_tasks import delete_vectors
+
+    if isinstance(db.databackend, MongoDataBackend):
+        r = Collection('documents').find_one().execute(db)
+    else:
+        table = db.load('table', 'documents')
+        r = list(table.select('id', 'x').limit(1).execute(db))[0]
+    like = {'x': r['x']}
+    db.result_cache = LRUCache(16)
+    vi = db.vector_indices['test_vector_search']
+
+    with patch.object(vi, 'get_nearest', wraps=vi.get_nearest) as search:
+        ids, scores = db.select_nearest(like, vector_index='test_vector_search', n=5)
+        assert db.select_nearest(like, vector_index='test_vector_search', n=5) == (
+            ids,
+            scores,
+        )
+        assert search.call_count == 1
+        # ``n`` and ``ids`` are part of the key
+        db.select_nearest(like, vector_index='test_vector_search', n=3)
+        db.select_nearest(like, vector_index='test_vector_search', n=5, ids=ids[:2])
+        assert search.call_count == 3
+
+        # Writes to the vector index invalidate its results
+        generation = db.vector_search_generations.get('test_vector_search', 0)
+        delete_vectors('test_vector_search', ids[:1], db=db)
+        assert db.vector_search_generations['test_vector_search'] == generation + 1
+        new_ids, _ = db.select_nearest(like, vector_index='test_vector_search', n=5)
+        assert search.call_count == 4
+        assert ids[0] not in new_ids
+
+    assert db.result_cache.stats == {'size': 4, 'hits': 1, 'misses': 4}
+    assert db.result_cache.hit_rate == 0.2
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb, DBConfig.sqldb], indirect=True)
+def test_vector_search_snapshot(db, tmp_path, monkeypatch):
+    import datetime
+
+    from superduperdb import CFG
+    from superduperdb.vector_search.in_memory import InMemoryVectorSearcher
+
+    monkeypatch.setattr(CFG.cluster.vector_search, 'snapshot_dir', str(tmp_path))
+    monkeypatch.setattr(db, '_REPLAY_MARGIN', datetime.timedelta(0))
+    vi = db.vector_indices['test_vector_search']
+    select = vi.indexing_listener.select
+    predict_id = vi.indexing_listener.predict_id
+    path = str(tmp_path / 'test_vector_search')
+
+    searcher = db.initialize_vector_searcher('test_vector_search').searcher
+    ids = sorted(searcher.lookup)
+
+    # Make the snapshot stale: one vector which was deleted since, and one
+    # whose output is written again after the snapshot was read
+    stale = InMemoryVectorSearcher.from_component(vi)
+    _, watermark = stale.load(path)
+    assert watermark['predict_id'] == predict_id
+    stale.add([VectorItem(id='deleted', vector=stale._vector(stale.lookup[ids[2]]))])
+    stale.save(path, **watermark)
+    mongodb = isinstance(db.databackend, MongoDataBackend)
+    if mongodb:
+        collection = db.databackend.db['documents']
+        raw = collection.find_one({"_id": ObjectId(ids[1])})
+        select.table_or_collection.model_update(
+            db,
+            ids=[ids[0]],
+            predict_id=predict_id,
+            outputs=[raw['_outputs'][predict_id]],
+        )
+        # Write times are recorded out of the documents
+        assert '_outputs_time' not in collection.find_one({"_id": ObjectId(ids[0])})
+        times = db.databackend.db[f'_outputs_time.{predict_id}']
+        assert times.count_documents({}) == len(ids)
+
+    with patch.object(db, '_load_vectors', wraps=db._load_vectors) as load:
+        restored = db.initialize_vector_searcher('test_vector_search').searcher
+
+    assert load.call_count == 1
+    if mongodb:
+        # Only the output written since the snapshot is loaded
+        assert load.call_args.kwargs['total'] == 1
+        assert numpy.allclose(
+            restored._vector(restored.lookup[ids[0]]),
+            searcher._vector(searcher.lookup[ids[1]]),
+        )
+    else:
+        # Output tables do not record write times, vectors are reloaded
+        assert load.call_args.args[2] == [select.select_ids.outputs(predict_id)]
+    assert sorted(restored.lookup) == ids
+    query = searcher._vector(searcher.lookup[ids[3]])
+    assert restored.find_nearest_from_array(query, n=1)[0] == [ids[3]]
+    assert set(InMemoryVectorSearcher.from_component(vi).load(path)[0]) == set(ids)
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb, DBConfig.sqldb], indirect=True)
+def test_rebuild_vector_search(db):
+    import threading
+
+    from superduperdb.vector_search.update_tasks import delete_vectors
+
+    live = db.fast_vector_searchers['test_vector_search']
+    ids = sorted(live.searcher.lookup)
+    query = live.searcher._vector(live.searcher.lookup[ids[0]])
+
+    # SQLite connections cannot be shared with the thread of the rebuild
+    background = isinstance(db.databackend, MongoDataBackend)
+    backfilled = threading.Event()
+    resume = threading.Event()
+    backfill = db.backfill_vector_search
+
+    def blocking_backfill(*args, **kwargs):
+        backfill(*args, **kwargs)
+        if background:
+            backfilled.set()
+            resume.wait(10)
+
+    with patch.object(db, 'backfill_vector_search', blocking_backfill):
+        rebuild = db.rebuild_vector_search('test_vector_search', background=background)
+        if background:
+            assert backfilled.wait(10)
+            # Deletions during the rebuild apply to both searchers
+            assert db.vector_search_rebuilds['test_vector_search'] is rebuild
+            assert db.fast_vector_searchers['test_vector_search'] is live
+            delete_vectors('test_vector_search', ids[:1], db=db)
+            assert ids[0] not in live.searcher.lookup
+            assert rebuild.progress['pending'] == 1
+            resume.set()
+        assert rebuild.wait(10)
+
+    progress = rebuild.progress
+    assert progress['status'] == 'done', progress['error']
+    assert progress['loaded'] == len(ids)
+    # Estimated from the metadata of MongoDB collections, unknown otherwise
+    assert progress['total'] == (len(ids) if background else None)
+    assert progress['replayed'] == (1 if background else 0)
+    assert 'test_vector_search' not in db.vector_search_rebuilds
+    assert db.fast_vector_searchers['test_vector_search'] is rebuild.searcher
+    assert db.vector_indices['test_vector_search'] is rebuild.vi
+
+    expected = ids[1:] if background else ids
+    assert sorted(rebuild.searcher.searcher.lookup) == expected
+    # The replaced searcher is released, and passes calls to the new one
+    assert not live.searcher.lookup and not live.searcher.nbytes
+    assert rebuild.searcher.find_nearest_from_array(query, n=5)[0] == (
+        live.find_nearest_from_array(query, n=5)[0]
+    )
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb], indirect=True)
+def test_remove_vector_index_drops_searcher(db):
+    live = db.fast_vector_searchers['test_vector_search']
+    assert live.searcher.lookup
+
+    db.remove('vector_index', 'test_vector_search', force=True)
+    assert 'test_vector_search' not in db.fast_vector_searchers
+    assert not live.searcher.lookup and not live.searcher.nbytes
+
+
+@pytest.mark.skipif(not torch, reason='Torch not installed')
+@pytest.mark.parametrize("db", [DBConfig.mongodb], indirect=True)
+def test_rebuild_vector_search_delete_during_swap(db):
+    import threading
+
+    from superduperdb.vector_search.update_tasks import delete_vectors
+
+    live = db.fast_vector_searchers['test_vector_search']
+    ids = sorted(live.searcher.lookup)
+    backfilled = threading.Event()
+    resume = threading.Event()
+    backfill = db.backfill_vector_search
+
+    def blocking_backfill(*args, **kwargs):
+        backfill(*args, **kwargs)
+        backfilled.set()
+        resume.wait(10)
+
+    with patch.object(db, 'backfill_vector_search', blocking_backfill):
+        rebuild = db.rebuild_vector_search('test_vector_search', background=True)
+        assert backfilled.wait(10)
+
+    delete = live.searcher.delete
+
+    def delete_after_swap(ids):
+        # The rebuild swaps in its searcher while the live one is written
+        resume.set()
+        assert rebuild.wait(10)
+        delete(ids)
+
+    with patch.object(live.searcher, 'delete', delete_after_swap):
+        delete_vectors('test_vector_search', ids[:1], db=db)
+
+    assert rebuild.progress['status'] == 'done', rebuild.progress['error']
+    assert db.fast_vector_searchers['test_vector_search'] is rebuild.searcher
+    assert sorted(rebuild.searcher.searcher.lookup) == ids[1:]
+    # Released once the delete returned
+    assert not live.searcher.lookup
+
+
+@pytest.mark.parametrize(
+    "db", [DBConfig.mongodb_empty, DBConfig.sqldb_empty], indirect=True
+)
+def test_multi_vector_search(db):
+    from superduperdb.components.vector_index import VectorIndex
+    from superduperdb.ext.numpy import array
+
+    if isinstance(db.databackend, MongoDataBackend):
+        select = Collection('docs').find()
+        db.execute(
+            Collection('docs').insert_many([Document({'x': i}) for i in range(5)])
+        )
+        kwargs = {'model_update_kwargs': {'document_embedded': False}}
+    else:
+        schema = Schema('docs', fields={'id': dtype(str), 'x': dtype(int)})
+        table = Table('docs', schema=schema)
+        db.apply(table)
+        db.execute(table.insert([Document({'id': str(i), 'x': i}) for i in range(5)]))
+        select = table.to_query().select('id', 'x')
+        kwargs = {}
+    id_field = select.table_or_collection.primary_id
+    ids = {r['x']: str(r[id_field]) for r in db.execute(select)}
+
+    # Three chunks per document, at x, x + 1 and x + 2
+    model = ObjectModel(
+        'chunks',
+        object=lambda x: [numpy.full(4, x + i, dtype='float32') for i in range(3)],
+        flatten=True,
+        datatype=array('float32', shape=(4,)),
+        **kwargs,
+    )
+    listener = Listener(model=model, select=select, key='x', identifier='chunks')
+    db.add(listener)
+    db.add(
+        VectorIndex(
+            'chunks', indexing_listener=listener, measure='l2', multi_vector='max'
+        )
+    )
+    searcher = db.fast_vector_searchers['chunks'].searcher
+    assert len(searcher) == 5
+    assert len(searcher.sources) == 15
+
+    # Documents 2, 3 and 4 all have a chunk at 4
+    res, scores = searcher.find_nearest_from_array(numpy.full(4, 4.1), n=3)
+    assert sorted(res) == [ids[2], ids[3], ids[4]]
+    assert scores == sorted(scores, reverse=True)
+    res, _ = searcher.find_nearest_from_array(
+        numpy.full(4, 4.1), n=2, within_ids=[ids[0], ids[1]]
+    )
+    assert res == [ids[1], ids[0]]
+
+    searcher.delete([ids[3]])
+    assert len(searcher.sources) == 12
+    res, _ = searcher.find_nearest_from_array(numpy.full(4, 4.1), n=3)
+    assert sorted(res) == [ids[1], ids[2], ids[4]]
+
+
 # TODO: add UT for task workflow
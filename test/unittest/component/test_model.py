@@ -1,4 +1,5 @@
 import dataclasses as dc
+import os
 from test.db_config import DBConfig
 from unittest.mock import MagicMock, patch
 
@@ -136,6 +137,8 @@ def test_pm_create_predict_job(mock_job, predict_mixin):
             'max_chunk_size': max_chunk_size,
             'in_memory': in_memory,
             'overwrite': overwrite,
+            'pipeline_depth': 0,
+            'stream_ids': False,
         },
         compute_kwargs={},
     )
@@ -222,6 +225,281 @@ def test_pm_predict_with_select_ids(monkeypatch, predict_mixin):
             assert kwargs.get('outputs') == [str({'out': 2}) for _ in range(10)]
 
 
+def test_pm_predict_pipelined(predict_mixin):
+    import threading
+
+    docs = {i: Document({'x': np.random.randn(4)}) for i in range(10)}
+    select = MagicMock(spec=Select)
+    select.select_using_ids.side_effect = lambda ids: ids
+    db = MagicMock(spec=Datalayer)
+    db.databackend = MagicMock(spec=BaseDataBackend)
+    predict_mixin.db = db
+
+    fetched = []
+    predicted = []
+    condition = threading.Condition()
+
+    def predict(dataset):
+        predicted.append(threading.current_thread())
+        # The next chunk is fetched while this one is predicted on
+        with condition:
+            assert condition.wait_for(
+                lambda: len(fetched) >= min(len(predicted) + 1, 4), timeout=1
+            )
+        return [len(dataset)] * len(dataset)
+
+    def execute(ids):
+        with condition:
+            fetched.append(ids)
+            condition.notify_all()
+        return [docs[i] for i in ids]
+
+    db.execute.side_effect = execute
+    with (
+        patch.object(predict_mixin, 'predict', side_effect=predict),
+        patch.object(select, 'model_update') as model_update,
+    ):
+        predict_mixin._predict_with_select_and_ids(
+            X='x',
+            db=db,
+            select=select,
+            ids=list(range(10)),
+            predict_id='test',
+            max_chunk_size=3,
+            pipeline_depth=1,
+        )
+    assert threading.current_thread() not in predicted
+    calls = [call.kwargs for call in model_update.call_args_list]
+    assert [c['ids'] for c in calls] == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+    assert [c['outputs'] for c in calls] == [[3] * 3, [3] * 3, [3] * 3, [1]]
+
+
+@pytest.mark.parametrize(
+    "db", [DBConfig.mongodb_empty, DBConfig.sqldb_empty], indirect=True
+)
+def test_predict_in_db_stream_ids(db):
+    from superduperdb.backends.ibis.query import Table
+    from superduperdb.backends.mongodb.data_backend import MongoDataBackend
+    from superduperdb.components.schema import Schema
+
+    if isinstance(db.databackend, MongoDataBackend):
+        collection = Collection('documents')
+        db.execute(collection.insert_many([Document({'x': i}) for i in range(10)]))
+        select = collection.find()
+        filtered = collection.find({'x': {'$gt': 2}})
+    else:
+        schema = Schema(
+            'schema', fields={'id': FieldType('str'), 'x': FieldType('int64')}
+        )
+        _, table = db.add(Table('documents', schema=schema))
+        db.execute(table.insert([Document({'id': str(i), 'x': i}) for i in range(10)]))
+        select = table.select('id', 'x')
+        filtered = table.filter(table.x > 2).select('id', 'x')
+
+    predicted = []
+
+    def double(x):
+        predicted.append(x)
+        return 2 * x
+
+    model = ObjectModel('test', object=double)
+    kwargs = {'predict_id': 'test', 'max_chunk_size': 3, 'stream_ids': True}
+    # Pages of the ids of ``filtered`` hold documents it filters out
+    model.predict_in_db('x', db=db, select=filtered, pipeline_depth=1, **kwargs)
+    assert sorted(predicted) == list(range(3, 10))
+
+    # Only the ids of missing outputs are read
+    model.predict_in_db('x', db=db, select=select, **kwargs)
+    assert sorted(predicted) == list(range(10))
+    assert not list(db.execute(select.select_ids_of_missing_outputs('test')))
+    xs = {str(r[select.primary_id]): r['x'] for r in db.execute(select)}
+    for r in db.execute(select.outputs('test')):
+        output = r['_outputs']['test'] if '_outputs' in r else r['_outputs.test']
+        assert output == 2 * xs[str(r[select.primary_id])]
+
+    with pytest.raises(ValueError):
+        model.predict_in_db(
+            'x', db=db, select=select, predict_id='test', stream_ids=True
+        )
+
+
+@pytest.mark.parametrize(
+    "db", [DBConfig.mongodb_empty, DBConfig.sqldb_empty], indirect=True
+)
+def test_predict_in_db_stream_ids_reads_pages(db):
+    from superduperdb.backends.ibis.query import Table
+    from superduperdb.backends.mongodb.data_backend import MongoDataBackend
+    from superduperdb.components.schema import Schema
+
+    missing = [0, 5, 9]
+    if isinstance(db.databackend, MongoDataBackend):
+        collection = Collection('documents')
+        db.execute(collection.insert_many([Document({'x': i}) for i in range(10)]))
+        select = collection.find()
+        filtered = collection.find({'x': {'$nin': missing}})
+    else:
+        schema = Schema(
+            'schema', fields={'id': FieldType('str'), 'x': FieldType('int64')}
+        )
+        _, table = db.add(Table('documents', schema=schema))
+        db.execute(table.insert([Document({'id': str(i), 'x': i}) for i in range(10)]))
+        select = table.select('id', 'x')
+        filtered = table.filter(table.x.notin(missing)).select('id', 'x')
+
+    model = ObjectModel('test', object=lambda x: 2 * x)
+    model.predict_in_db(
+        'x', db=db, select=filtered, predict_id='test', max_chunk_size=3
+    )
+
+    select = model._prepare_select_for_predict(select, db)
+    query = model._get_ids_query(select=select, db=db, ids=None, predict_id='test')
+    documents = model._get_documents_query(
+        select=select, db=db, ids=None, predict_id='test'
+    )
+    execute = db.execute
+    read = []
+
+    def execute_and_count(query, *args, **kwargs):
+        result = list(execute(query, *args, **kwargs))
+        read.append(len(result))
+        return result
+
+    with patch.object(db, 'execute', side_effect=execute_and_count):
+        chunks = list(
+            model._chunks_from_id_pages(
+                'x',
+                db=db,
+                select=select,
+                query=query,
+                documents=documents,
+                page_size=2,
+            )
+        )
+
+    # Pages of ids alternate with the reads of their documents, whose id
+    # ranges span 6 and 1 documents of the collection, but only those
+    # without outputs are read
+    assert read == [2, 2, 1, 1]
+    assert [[args[0] for args, _ in inputs] for _, inputs in chunks] == [
+        [0, 5],
+        [9],
+    ]
+
+
+@pytest.mark.parametrize(
+    "db", [DBConfig.mongodb_empty, DBConfig.sqldb_empty], indirect=True
+)
+def test_predict_in_db_prediction_cache(db):
+    from superduperdb.backends.ibis.query import Table
+    from superduperdb.backends.mongodb.data_backend import MongoDataBackend
+    from superduperdb.components.schema import Schema
+
+    # Only 3 distinct inputs
+    data = [{'id': str(i), 'x': i % 3} for i in range(10)]
+    if isinstance(db.databackend, MongoDataBackend):
+        collection = Collection('documents')
+        db.execute(collection.insert_many([Document({'x': r['x']}) for r in data]))
+        select = collection.find()
+    else:
+        schema = Schema(
+            'schema', fields={'id': FieldType('str'), 'x': FieldType('int64')}
+        )
+        _, table = db.add(Table('documents', schema=schema))
+        db.execute(table.insert([Document(r) for r in data]))
+        select = table.select('id', 'x')
+
+    predicted = []
+
+    def double(x):
+        predicted.append(x)
+        return 2 * x
+
+    model = ObjectModel('test', object=double, prediction_cache='db://_cache')
+    model.predict_in_db('x', db=db, select=select, predict_id='test')
+    assert sorted(predicted) == [0, 1, 2]
+
+    # Chunks are looked up in the calling thread when pipelined
+    model.predict_in_db(
+        'x',
+        db=db,
+        select=select,
+        predict_id='test',
+        overwrite=True,
+        max_chunk_size=4,
+        pipeline_depth=1,
+    )
+    assert sorted(predicted) == [0, 1, 2]
+
+    xs = {str(r[select.primary_id]): r['x'] for r in db.execute(select)}
+    for r in db.execute(select.outputs('test')):
+        output = r['_outputs']['test'] if '_outputs' in r else r['_outputs.test']
+        assert output == 2 * xs[str(r[select.primary_id])]
+
+
+def test_predict_one_batched():
+    from concurrent.futures import ThreadPoolExecutor
+
+    model = ObjectModel(
+        'test', object=lambda x: 2 * x, signature='singleton', micro_batch_size=8
+    )
+    with (
+        patch.object(model, 'predict', wraps=model.predict) as predict,
+        patch.object(model, 'predict_one', wraps=model.predict_one) as predict_one,
+    ):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            outputs = list(pool.map(model.predict_one_batched, range(16)))
+        assert outputs == [2 * i for i in range(16)]
+        assert 2 <= predict.call_count < 16
+        assert predict_one.call_count == 0
+
+        # Arguments which do not match the signature are not batched
+        assert model.predict_one_batched(x=3) == 6
+        assert predict_one.call_count == 1
+
+    model = ObjectModel('test', object=lambda x: 2 * x)
+    with patch.object(model, 'predict') as predict:
+        assert model.predict_one_batched(3) == 6
+        predict.assert_not_called()
+
+
+@pytest.mark.parametrize("db", [DBConfig.mongodb_empty], indirect=True)
+def test_predict_num_workers(db):
+    model = ObjectModel(
+        'test',
+        object=lambda x: (2 * x, os.getpid()),
+        signature='singleton',
+        num_workers=2,
+    )
+    outputs = model.predict(list(range(10))) + model.predict(list(range(10)))
+    assert [x for x, _ in outputs] == 2 * [2 * i for i in range(10)]
+    # Workers are started once, and kept between calls
+    assert len({pid for _, pid in outputs}) <= 2
+    assert os.getpid() not in {pid for _, pid in outputs}
+
+    # Workers run a copy of the object, started again when it changes
+    model.object = lambda x: (3 * x, os.getpid())
+    assert [x for x, _ in model.predict([1, 2])] == [3, 6]
+
+    db.add(model)
+
+    def start_workers(model):
+        model.predict([1, 2])
+        workers = list(model._worker_pool._pool._pool)
+        assert all(worker.is_alive() for worker in workers)
+        return workers
+
+    # The workers of a cached model are stopped when it is replaced
+    workers = start_workers(db.models['test'])
+    reloaded = db.load('model', 'test')
+    assert not any(worker.is_alive() for worker in workers)
+
+    # and when it is removed
+    workers = start_workers(reloaded)
+    db.remove('model', 'test', force=True)
+    assert not any(worker.is_alive() for worker in workers)
+    assert reloaded._worker_pool is None
+
+
 def test_model_append_metrics():
     @dc.dataclass
     class _Tmp(ObjectModel, _Fittable):
@@ -0,0 +1,49 @@
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from superduperdb.misc.batching import MicroBatcher
+
+
+def test_micro_batcher():
+    batches = []
+    release = threading.Event()
+
+    def double(items):
+        release.wait(1)
+        batches.append(list(items))
+        return [2 * x for x in items]
+
+    batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futures = [pool.submit(batcher, i) for i in range(10)]
+        release.set()
+        assert [f.result() for f in futures] == [2 * i for i in range(10)]
+
+    assert sorted(x for batch in batches for x in batch) == list(range(10))
+    assert max(len(batch) for batch in batches) == 4
+    assert len(batches) < 10
+    assert batcher.mean_batch_size == 10 / len(batches)
+
+    # Copies start their own thread
+    other = copy.deepcopy(batcher)
+    assert other(5) == 10
+    assert other._thread is not batcher._thread
+
+
+def test_micro_batcher_errors():
+    def fail(items):
+        raise ValueError('failed')
+
+    batcher = MicroBatcher(fail, max_wait_ms=1)
+    with pytest.raises(ValueError, match='failed'):
+        batcher(1)
+
+    batcher = MicroBatcher(lambda items: items[:-1], max_wait_ms=1)
+    with pytest.raises(ValueError, match='Expected 1 outputs'):
+        batcher(1)
+
+    with pytest.raises(ValueError):
+        MicroBatcher(fail, max_batch_size=0)
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from superduperdb.misc.cache import LRUCache
+from superduperdb.misc.hash import hash_item
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats == {'size': 2, 'hits': 2, 'misses': 1}
+    assert cache.hit_rate == pytest.approx(2 / 3)
+
+    cache.invalidate(lambda key: key == 'a')
+    assert cache.get('a', 'missing') == 'missing'
+
+    cache = LRUCache(maxsize=2, ttl=0.05)
+    cache.put('a', 1)
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+    cache = LRUCache(maxsize=0)
+    assert cache.hit_rate == 0.0
+    cache.put('a', 1)
+    assert cache.get('a') is None
+
+
+def test_lru_cache_threads():
+    cache = LRUCache(maxsize=50)
+
+    def work(offset):
+        for i in range(1000):
+            cache.put(offset + i % 100, i)
+            cache.get(offset + (i + 1) % 100)
+
+    threads = [threading.Thread(target=work, args=(i * 100,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 50
+    assert cache.hits + cache.misses == 4000
+
+
+def test_hash_item():
+    x = np.arange(6, dtype='float32').reshape(2, 3)
+    assert hash_item({'a': x, 'b': [1, 'c']}) == hash_item({'b': [1, 'c'], 'a': x})
+    assert hash_item(x) != hash_item(x.reshape(3, 2))
+    assert hash_item(x) != hash_item(x.astype('float64'))
+    # ``str`` of a large array is truncated, its hash is not
+    y = np.zeros(10000)
+    z = y.copy()
+    z[5000] = 1
+    assert str(y) == str(z)
+    assert hash_item(y) != hash_item(z)
+    assert hash_item(1) != hash_item('1')
+    assert hash_item([1]) != hash_item((1,))
+
+    with pytest.raises(TypeError):
+        hash_item(object())
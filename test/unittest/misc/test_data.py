@@ -0,0 +1,33 @@
+import threading
+
+import pytest
+
+from superduperdb.misc.data import ibatch, pipeline
+
+
+def test_pipeline():
+    threads = set()
+    out = []
+
+    def double(x):
+        threads.add(threading.get_ident())
+        return 2 * x
+
+    pipeline(ibatch(range(10), 3), lambda b: [double(x) for x in b], out.extend)
+
+    assert out == [2 * x for x in range(10)]
+    assert threading.get_ident() not in threads
+
+
+def test_pipeline_error():
+    seen = []
+
+    def fail(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+
+    with pytest.raises(ValueError):
+        pipeline(range(100), fail, seen.append, maxsize=1)
+
+    assert set(seen) <= {0, 1, 2}
@@ -0,0 +1,69 @@
+from test.db_config import DBConfig
+
+import numpy as np
+import pytest
+
+from superduperdb.misc.prediction_cache import (
+    CacheLookup,
+    DatabackendPredictionCache,
+    DiskPredictionCache,
+    InMemoryPredictionCache,
+    get_prediction_cache,
+)
+
+
+@pytest.mark.parametrize('kind', ['memory', 'disk'])
+def test_prediction_cache(kind, tmp_path):
+    if kind == 'memory':
+        cache = InMemoryPredictionCache(maxsize=2)
+    else:
+        cache = DiskPredictionCache(str(tmp_path))
+    cache.put_many({'a': np.ones(3), 'b': None})
+    found = cache.get_many(['a', 'b', 'c'])
+    assert set(found) == {'a', 'b'}
+    assert found['b'] is None
+    assert (found['a'] == np.ones(3)).all()
+
+
+@pytest.mark.parametrize(
+    "db", [DBConfig.mongodb_empty, DBConfig.sqldb_empty], indirect=True
+)
+def test_databackend_prediction_cache(db):
+    cache = DatabackendPredictionCache(db, '_cache')
+    cache.put_many({'a': 1, 'b': 2})
+    cache.put_many({'a': 3})
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 3, 'b': 2}
+
+    # Outputs put again replace their rows
+    if cache.mongodb:
+        rows = db.databackend.db['_cache'].count_documents({})
+    else:
+        rows = db.databackend.conn.table('_cache').count().execute()
+    assert rows == 2
+
+
+def test_cache_lookup():
+    cache = InMemoryPredictionCache()
+    assert CacheLookup(cache, 'm/1', ['x']).merge(['X']) == ['X']
+
+    dataset = ['x', 'y', 'y', {1, 2}, 'z']
+    lookup = CacheLookup(cache, 'm/1', dataset)
+    # ``x`` is cached, ``y`` is predicted on once and sets are not hashed
+    assert lookup.missing == [1, 3, 4]
+    assert lookup.merge(['Y', 'S', 'Z']) == ['X', 'Y', 'Y', 'S', 'Z']
+
+    lookup = CacheLookup(cache, 'm/1', dataset)
+    assert lookup.missing == [3]
+    # Other versions of the model do not share outputs
+    assert len(CacheLookup(cache, 'm/2', dataset).missing) == 4
+
+
+def test_get_prediction_cache(tmp_path):
+    cache = get_prediction_cache('memory://10', db=None)
+    assert cache is get_prediction_cache('memory://10', db=None)
+    assert cache.cache.maxsize == 10
+    assert isinstance(
+        get_prediction_cache(f'file://{tmp_path}', None), DiskPredictionCache
+    )
+    with pytest.raises(ValueError):
+        get_prediction_cache('redis://localhost', db=None)
@@ -0,0 +1,47 @@
+import copy
+import os
+
+import pytest
+
+from superduperdb.misc.worker_pool import WorkerPool
+
+
+def test_worker_pool():
+    pool = WorkerPool(lambda x: (2 * x, os.getpid()), processes=2, chunksize=3)
+    assert not pool.running
+    assert pool.map([]) == []
+    assert not pool.running
+
+    outputs = pool.map(list(range(10)))
+    assert [x for x, _ in outputs] == [2 * i for i in range(10)]
+    pids = {pid for _, pid in outputs}
+    assert os.getpid() not in pids
+
+    # Workers are kept between calls
+    outputs = pool.map(list(range(20)))
+    assert [x for x, _ in outputs] == [2 * i for i in range(20)]
+    assert len(pids | {pid for _, pid in outputs}) <= 2
+    assert pool.running
+
+    # Copies start their own workers
+    other = copy.deepcopy(pool)
+    assert not other.running
+    assert [x for x, _ in other.map([1, 2])] == [2, 4]
+    other.close()
+
+    pool.close()
+    assert not pool.running
+    assert [x for x, _ in pool.map([3])] == [6]
+    pool.close()
+
+
+def test_worker_pool_limits_threads():
+    def threads(_):
+        return os.environ['OMP_NUM_THREADS']
+
+    pool = WorkerPool(threads, processes=1, threads_per_worker=2)
+    assert pool.map([0]) == ['2']
+    pool.close()
+
+    with pytest.raises(ValueError):
+        WorkerPool(threads, processes=0)
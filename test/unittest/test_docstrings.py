@@ -247,7 +247,7 @@ def extract_docstrings(*directory):
                         class_test_cases.append((file_path, node))
                         for item in node.body:
                             if isinstance(
-                                item, ast.FunctionDef
+                                item, (ast.FunctionDef, ast.AsyncFunctionDef)
                             ) and not item.name.startswith('_'):
                                 skip = False
                                 for decorator in item.decorator_list:
@@ -260,9 +260,9 @@ def extract_docstrings(*directory):
                                     method_test_cases.append(
                                         (file_path, node.name, item)
                                     )
-                    elif isinstance(node, ast.FunctionDef) and not node.name.startswith(
-                        '_'
-                    ):
+                    elif isinstance(
+                        node, (ast.FunctionDef, ast.AsyncFunctionDef)
+                    ) and not node.name.startswith('_'):
                         function_test_cases.append((file_path, node))
             except SyntaxError as e:
                 print(f"Syntax error in file {file_path}: {e}")
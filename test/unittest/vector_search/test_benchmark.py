@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from superduperdb.vector_search.benchmark import (
+    clustered_embeddings,
+    ground_truth,
+    run_benchmark,
+)
+
+
+def test_ground_truth():
+    h = clustered_embeddings(200, 8, clusters=5)
+    q = clustered_embeddings(3, 8, seed=1)
+    truth = ground_truth(h, q, 4, 'l2')
+    expected = np.argsort(np.linalg.norm(h[None] - q[:, None], axis=2), axis=1)
+    assert (truth == expected[:, :4]).all()
+
+
+def test_run_benchmark(tmp_path):
+    output = str(tmp_path / 'report.json')
+    report = run_benchmark(
+        searchers=['in_memory', 'lance'],
+        sizes=[500],
+        dimensions=[8],
+        concurrency=[1, 2],
+        queries=10,
+        updates=50,
+        output=output,
+    )
+    with open(output) as f:
+        assert json.load(f) == report
+
+    assert [r['type'] for r in report['results']] == ['in_memory', 'lance']
+    for result in report['results']:
+        assert result['build_seconds'] > 0
+        assert [s['concurrency'] for s in result['searches']] == [1, 2]
+        for search in result['searches']:
+            # Both searchers are exact on small indices
+            assert search['recall'] == 1.0
+            assert 0 < search['p50_ms'] <= search['p99_ms']
+            assert search['qps'] > 0
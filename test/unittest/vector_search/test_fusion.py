@@ -0,0 +1,31 @@
+import pytest
+
+from superduperdb.vector_search.fusion import fuse, normalize_scores
+
+
+def test_normalize_scores():
+    assert normalize_scores([1.0, 0.0, -1.0], 'cosine') == [1.0, 0.5, 0.0]
+    assert normalize_scores([0.0, -1.0, -3.0], 'l2') == [1.0, 0.5, 0.25]
+    assert normalize_scores([4.0, 3.0, 2.0], 'dot') == [1.0, 0.5, 0.0]
+    assert normalize_scores([2.0, 2.0], 'dot') == [1.0, 1.0]
+    assert normalize_scores([], 'dot') == []
+
+
+def test_fuse():
+    results = [(['a', 'b', 'c'], [0.9, 0.8, 0.1]), (['c', 'b'], [0.9, 0.5])]
+
+    ids, scores = fuse(results, ['cosine', 'cosine'], rrf_k=0)
+    # c: 1/3 + 1, a: 1, b: 1/2 + 1/2, ties in the order first found
+    assert ids == ['c', 'a', 'b']
+    assert scores == pytest.approx([4 / 3, 1.0, 1.0])
+    ids, _ = fuse(results, ['cosine', 'cosine'], weights=[3, 1], rrf_k=0, n=2)
+    assert ids == ['a', 'b']
+
+    ids, scores = fuse(results, ['cosine', 'cosine'], fusion='weighted_sum')
+    assert ids == ['b', 'c', 'a']
+    assert scores == pytest.approx([0.9 + 0.75, 0.55 + 0.95, 0.95])
+
+    with pytest.raises(ValueError):
+        fuse(results, ['cosine', 'cosine'], fusion='max')
+    with pytest.raises(ValueError):
+        fuse(results, ['cosine'])
@@ -0,0 +1,150 @@
+from test.db_config import DBConfig
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from superduperdb import CFG
+from superduperdb.misc.server import BINARY_CONTENT_TYPE
+from superduperdb.vector_search.server import wire
+
+
+def test_wire_roundtrip():
+    h = np.random.default_rng(0).normal(size=(3, 4))
+    data = wire.encode(h, {'ids': ['a', 'b', 'c']})
+    assert len(data) == 16 + 4 * 12 + len('{"ids": ["a", "b", "c"]}')
+
+    decoded, meta = wire.decode(data)
+    assert decoded.dtype == np.float32
+    assert np.allclose(decoded, h, atol=1e-6)
+    assert meta == {'ids': ['a', 'b', 'c']}
+
+    with pytest.raises(ValueError):
+        wire.decode(data[:-1])
+
+    results = [(['a', 'b'], [1.0, 0.5]), (['c'], [0.25]), ([], [])]
+    assert wire.decode_results(wire.encode_results(results)) == results
+
+
+def test_query_search_nan_scores():
+    from superduperdb.vector_search.server import service
+
+    db = MagicMock()
+    db.datatypes = {}
+    searcher = db.fast_vector_searchers['my-index'].searcher
+    searcher.find_nearest_from_arrays.return_value = [
+        (['a', 'b', 'c'], [0.5, float('nan'), 0.25]),
+        (['d'], [float('nan')]),
+    ]
+    searcher.find_nearest_from_array.return_value = (
+        ['a', 'b', 'c'],
+        [0.5, float('nan'), 0.25],
+    )
+    # Both endpoints return the scores which are not a number as -1.0
+    results = service.query_search_from_arrays(
+        np.zeros((2, 4)), vector_index='my-index', db=db, n=3
+    )
+    assert results == [(['a', 'b', 'c'], [0.5, -1.0, 0.25]), (['d'], [-1.0])]
+    result = service.query_search_from_array(
+        [0.0] * 4, vector_index='my-index', db=db, n=3
+    )
+    assert result == results[0]
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(CFG.cluster.vector_search, 'uri', 'http://localhost:8000')
+    from superduperdb.vector_search.server import app
+
+    db.server_mode = True
+    app.app.app.state.pool = db
+    yield TestClient(app.app.app)
+
+
+@pytest.mark.parametrize("db", [DBConfig.mongodb], indirect=True)
+def test_binary_endpoints(client):
+    vector_index = 'test_vector_search'
+    h = np.random.default_rng(0).normal(size=(2, 16)).astype('float32')
+    headers = {'Content-Type': BINARY_CONTENT_TYPE}
+
+    response = client.post(
+        f'/add/search/binary?vector_index={vector_index}',
+        content=wire.encode(h, {'ids': ['new-0', 'new-1']}),
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        f'/query/batch/search/binary?vector_index={vector_index}&n=1',
+        content=wire.encode(h),
+        headers=headers,
+    )
+    assert response.headers['content-type'] == BINARY_CONTENT_TYPE
+    results = wire.decode_results(response.content)
+    assert [ids for ids, _ in results] == [['new-0'], ['new-1']]
+
+    response = client.get(f'/query/vector?vector_index={vector_index}&id=new-1')
+    assert response.json()['vector'] == pytest.approx(h[1].tolist(), rel=1e-5)
+    response = client.get(f'/query/vector?vector_index={vector_index}&id=missing')
+    assert response.status_code == 404
+
+    # The JSON endpoints return the same results
+    response = client.post(
+        f'/query/search?vector_index={vector_index}&n=3', json=h[0].tolist()
+    )
+    expected = response.json()
+    response = client.post(
+        f'/query/search/binary?vector_index={vector_index}&n=3',
+        content=wire.encode(h[0]),
+        headers=headers,
+    )
+    [(ids, scores)] = wire.decode_results(response.content)
+    assert ids == expected['ids']
+    assert scores == pytest.approx(expected['scores'], rel=1e-5)
+
+    response = client.post(
+        f'/query/search/binary?vector_index={vector_index}&n=3',
+        content=wire.encode(h[0], {'within_ids': ['new-1']}),
+        headers=headers,
+    )
+    [(ids, _)] = wire.decode_results(response.content)
+    assert ids == ['new-1']
+
+
+@pytest.mark.parametrize("db", [DBConfig.mongodb], indirect=True)
+@pytest.mark.parametrize("wire_format", ['binary', 'json'])
+def test_remote_searches_within_ids(client, monkeypatch, wire_format):
+    from superduperdb.misc.server import _encode
+    from superduperdb.vector_search import interface
+
+    def request_server(service, endpoint, args, data=None, type='post'):
+        if isinstance(data, bytes):
+            headers = {'Content-Type': BINARY_CONTENT_TYPE}
+            response = client.post(
+                f'/{endpoint}', params=args, content=data, headers=headers
+            )
+        else:
+            response = client.post(f'/{endpoint}', params=args, json=_encode(data))
+        assert response.status_code == 200, response.text
+        if response.headers['content-type'] == BINARY_CONTENT_TYPE:
+            return response.content
+        return response.json()
+
+    monkeypatch.setattr(interface, 'request_server', request_server)
+    monkeypatch.setattr(CFG.cluster.vector_search, 'wire_format', wire_format)
+
+    db = client.app.state.pool
+    local = db.fast_vector_searchers['test_vector_search'].searcher
+    ids = sorted(local.lookup)
+    query = local.get_vector(ids[0])
+    within_ids = ids[2:5]
+
+    searcher = interface.FastVectorSearcher(db, local, 'test_vector_search')
+    for found, _ in [
+        searcher.find_nearest_from_id(ids[0], n=10, within_ids=within_ids),
+        searcher.find_nearest_from_array(query, n=10, within_ids=within_ids),
+        searcher.find_in_range_from_id(ids[0], -1e9, within_ids=within_ids),
+        searcher.find_in_range_from_array(query, -1e9, within_ids=within_ids),
+    ]:
+        assert sorted(found) == within_ids
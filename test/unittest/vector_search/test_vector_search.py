@@ -1,3 +1,4 @@
+import asyncio
 import tempfile
 import uuid
 
@@ -5,9 +6,22 @@ import numpy as np
 import pytest
 
 from superduperdb import CFG
-from superduperdb.vector_search.base import VectorItem
+from superduperdb.vector_search import kernels
+from superduperdb.vector_search.base import (
+    BaseVectorSearcher,
+    VectorItem,
+    score_threshold,
+)
+from superduperdb.vector_search.hnsw import HnswVectorSearcher
 from superduperdb.vector_search.in_memory import InMemoryVectorSearcher
 from superduperdb.vector_search.lance import LanceVectorSearcher
+from superduperdb.vector_search.multi_vector import MultiVectorSearcher
+from superduperdb.vector_search.sharded import (
+    Shard,
+    ShardedVectorSearcher,
+    connect,
+    serve_remote,
+)
 
 
 @pytest.fixture
@@ -20,7 +34,8 @@ def index_data(monkeypatch):
 
 
 @pytest.mark.parametrize(
-    "vector_index_cls", [InMemoryVectorSearcher, LanceVectorSearcher]
+    "vector_index_cls",
+    [InMemoryVectorSearcher, LanceVectorSearcher, HnswVectorSearcher],
 )
 @pytest.mark.parametrize("measure", ['l2', 'dot', 'cosine'])
 def test_index(index_data, measure, vector_index_cls):
@@ -39,3 +54,562 @@ def test_index(index_data, measure, vector_index_cls):
     res, _ = h.find_nearest_from_array(y, 1)
 
     assert res[0] == 'new'
+
+
+@pytest.mark.parametrize("measure", ['l2', 'dot', 'cosine'])
+def test_hnsw_recall(measure):
+    rng = np.random.default_rng(42)
+    h = rng.normal(size=(1000, 16)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    hnsw = HnswVectorSearcher(
+        'hnsw',
+        dimensions=16,
+        h=h,
+        index=ids,
+        measure=measure,
+        M=8,
+        ef_construction=64,
+        seed=0,
+    )
+    normed = h / np.linalg.norm(h, axis=1)[:, None]
+
+    hits = 0
+    for q in rng.normal(size=(20, 16)):
+        if measure == 'l2':
+            scores = -np.linalg.norm(h - q, axis=1)
+        elif measure == 'dot':
+            scores = h @ q
+        else:
+            scores = normed @ q
+        expected = [ids[i] for i in np.argsort(-scores)[:10]]
+        actual, actual_scores = hnsw.find_nearest_from_array(q, n=10)
+        assert actual_scores == sorted(actual_scores, reverse=True)
+        hits += len(set(expected) & set(actual))
+    assert hits / 200 > 0.9
+
+
+def test_hnsw_delete_and_upsert():
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(200, 8))
+    ids = [str(i) for i in range(h.shape[0])]
+    hnsw = HnswVectorSearcher('hnsw', dimensions=8, h=h, index=ids, seed=0)
+
+    hnsw.delete(['0', '1'])
+    assert len(hnsw) == 198
+    res, _ = hnsw.find_nearest_from_array(h[0], n=5)
+    assert '0' not in res
+
+    hnsw.add([VectorItem(id='1', vector=h[0])])
+    res, _ = hnsw.find_nearest_from_id('1', n=1)
+    assert res == ['1']
+
+    res, _ = hnsw.find_nearest_from_array(h[0], n=2, within_ids=['5', '6'])
+    assert set(res) == {'5', '6'}
+
+
+def test_in_memory_upsert_and_delete():
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(100, 8))
+    ids = [str(i) for i in range(h.shape[0])]
+    searcher = InMemoryVectorSearcher('my-index', dimensions=8, measure='l2')
+    searcher._CACHE_SIZE = 7
+
+    for i in range(0, 100, 10):
+        searcher.add(
+            [VectorItem(id=_id, vector=v) for _id, v in zip(ids[i : i + 10], h[i:])]
+        )
+    searcher.post_create()
+    assert len(searcher) == 100
+
+    # Upsert in place
+    searcher.add([VectorItem(id='0', vector=h[1])])
+    searcher.post_create()
+    assert len(searcher) == 100
+    assert searcher.h.shape[0] == 100
+
+    # Tombstones are masked out of the results
+    searcher.delete(['1', '2'])
+    assert len(searcher) == 98
+    res, scores = searcher.find_nearest_from_array(h[1], n=3)
+    assert res[0] == '0'
+    assert '1' not in res and '2' not in res
+    assert len(scores) == 3
+
+    # Compaction once enough rows are tombstoned
+    searcher.delete([str(i) for i in range(3, 40)])
+    assert searcher.h.shape[0] == 61
+    res, _ = searcher.find_nearest_from_array(h[50], n=100)
+    assert len(res) == 61
+    assert res[0] == '50'
+    expected = np.argsort(np.linalg.norm(h[40:] - h[50], axis=1))[:5]
+    res, _ = searcher.find_nearest_from_array(h[50], n=5)
+    assert res == [str(40 + i) for i in expected]
+
+
+@pytest.mark.parametrize("quantization", [None, 'int8'])
+def test_in_memory_cosine(quantization):
+    # Rows are not normalized, so that cosine ranks by the dot product of
+    # the normalized query with the rows, as the index always did
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(100, 8)) * rng.uniform(1, 10, size=(100, 1))
+    searcher = InMemoryVectorSearcher(
+        'my-index', dimensions=8, measure='cosine', quantization=quantization
+    )
+    searcher.add([VectorItem(id=str(i), vector=v) for i, v in enumerate(h)])
+    searcher.post_create()
+
+    q = rng.normal(size=8)
+    expected = h @ q / np.linalg.norm(q)
+    res, scores = searcher.find_nearest_from_array(q, n=5)
+    assert res == [str(i) for i in np.argsort(-expected)[:5]]
+    assert scores == pytest.approx(np.sort(expected)[::-1][:5], rel=0.05)
+
+
+@pytest.mark.parametrize(
+    "vector_index_cls",
+    [InMemoryVectorSearcher, LanceVectorSearcher, HnswVectorSearcher],
+)
+@pytest.mark.parametrize("measure", ['l2', 'dot', 'cosine'])
+def test_find_nearest_from_arrays(index_data, measure, vector_index_cls):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(50, 3)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    searcher = vector_index_cls(
+        identifier='my-index', h=h, index=ids, measure=measure, dimensions=3
+    )
+    queries = rng.normal(size=(4, 3)).astype('float32')
+
+    results = searcher.find_nearest_from_arrays(queries, n=5)
+    assert len(results) == 4
+    for q, (res, scores) in zip(queries, results):
+        expected_res, expected_scores = searcher.find_nearest_from_array(q, n=5)
+        assert res == expected_res
+        assert scores == pytest.approx(expected_scores, rel=1e-5)
+
+    results = searcher.find_nearest_from_arrays(queries, n=5, within_ids=ids[:10])
+    for res, _ in results:
+        assert set(res) <= set(ids[:10])
+
+
+@pytest.mark.parametrize("measure", ['l2', 'dot', 'cosine'])
+def test_kernels(measure):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(100, 8)).astype('float32')
+    q = rng.normal(size=(3, 8)).astype('float32')
+    if measure == 'l2':
+        expected = -np.linalg.norm(h[None, :, :] - q[:, None, :], axis=2)
+    elif measure == 'dot':
+        expected = q @ h.T
+    else:
+        expected = (q / np.linalg.norm(q, axis=1)[:, None]) @ h.T
+
+    norms = kernels.squared_norms(h, block_size=7)
+    assert norms == pytest.approx((h * h).sum(axis=1), rel=1e-5)
+    for kwargs in ({}, {'norms': norms, 'block_size': 7}):
+        actual = kernels.similarities(q, h, measure, **kwargs)
+        assert actual.dtype == np.float32
+        assert np.allclose(actual, expected, atol=1e-4)
+    rows = np.array([5, 3, 99])
+    actual = kernels.similarities(q, h, measure, norms=norms, rows=rows, block_size=2)
+    assert np.allclose(actual, expected[:, rows], atol=1e-4)
+
+
+def test_in_memory_custom_measure():
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(50, 8))
+    ids = [str(i) for i in range(h.shape[0])]
+
+    def manhattan(x, y):
+        return -np.abs(x[:, None, :] - y[None, :, :]).sum(axis=2)
+
+    searcher = InMemoryVectorSearcher(
+        'my-index', dimensions=8, h=h, index=ids, measure=manhattan
+    )
+    res, scores = searcher.find_nearest_from_array(h[3] + 0.01, n=3)
+    assert res[0] == '3'
+    assert scores[0] == pytest.approx(-0.08)
+
+
+@pytest.mark.parametrize("quantization", ['float16', 'int8'])
+@pytest.mark.parametrize("measure", ['l2', 'dot', 'cosine'])
+def test_in_memory_quantization(measure, quantization):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(2000, 32)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    # float64 is what the searcher stores unquantized list input as
+    exact = InMemoryVectorSearcher(
+        'exact', dimensions=32, h=h.astype('float64'), index=ids, measure=measure
+    )
+    quantized = InMemoryVectorSearcher(
+        'quantized', dimensions=32, measure=measure, quantization=quantization
+    )
+    reranked = InMemoryVectorSearcher(
+        'reranked',
+        dimensions=32,
+        measure=measure,
+        quantization=quantization,
+        rerank_factor=4,
+    )
+    # Added in batches to exercise range updates of the int8 quantizer
+    for searcher in (quantized, reranked):
+        for i in range(0, 2000, 500):
+            searcher.add(
+                [VectorItem(id=ids[j], vector=h[j]) for j in range(i, i + 500)]
+            )
+        searcher.post_create()
+
+    # 4x smaller, plus one float32 squared norm per row
+    assert quantized.nbytes <= exact.nbytes / 4 + 4 * 2000
+
+    queries = rng.normal(size=(20, 32)).astype('float32')
+    expected = exact.find_nearest_from_arrays(queries, n=10)
+    for searcher, min_recall in ((quantized, 0.8), (reranked, 0.95)):
+        found = searcher.find_nearest_from_arrays(queries, n=10)
+        recall = np.mean(
+            [len(set(e[0]) & set(f[0])) / 10 for e, f in zip(expected, found)]
+        )
+        assert recall >= min_recall
+
+    res, scores = reranked.find_nearest_from_id('3', n=1)
+    assert res == ['3']
+
+
+@pytest.mark.parametrize("quantization", [None, 'int8'])
+def test_in_memory_snapshot(tmp_path, quantization):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(100, 8))
+    ids = [str(i) for i in range(h.shape[0])]
+    searcher = InMemoryVectorSearcher(
+        'my-index', dimensions=8, measure='l2', quantization=quantization
+    )
+    searcher.add([VectorItem(id=_id, vector=v) for _id, v in zip(ids, h)])
+    searcher.delete(['0'])
+    searcher.save(str(tmp_path), predict_id='my-model')
+
+    restored = InMemoryVectorSearcher(
+        'my-index', dimensions=8, measure='l2', quantization=quantization
+    )
+    restored_ids, watermark = restored.load(str(tmp_path))
+    assert restored_ids == ids[1:]
+    assert watermark['predict_id'] == 'my-model'
+    assert watermark['count'] == 99
+    assert isinstance(restored._h, np.memmap) == (quantization is None)
+    res, scores = restored.find_nearest_from_array(h[5], n=5)
+    expected_res, expected_scores = searcher.find_nearest_from_array(h[5], n=5)
+    assert res == expected_res
+    assert scores == pytest.approx(expected_scores, abs=1e-5)
+
+    # Updates of the restored index do not modify the snapshot
+    restored.add([VectorItem(id='5', vector=h[6])])
+    restored.delete(['6'])
+    restored.post_create()
+    assert InMemoryVectorSearcher('my-index', dimensions=8).load(str(tmp_path))[0] == (
+        ids[1:]
+    )
+    assert np.allclose(np.load(str(tmp_path / 'vectors.npy'))[4], h[5], atol=0.1)
+
+    # An interrupted save is never restored
+    (tmp_path / 'watermark.json').unlink()
+    assert InMemoryVectorSearcher('my-index', dimensions=8).load(str(tmp_path)) is None
+
+
+@pytest.mark.parametrize(
+    "vector_index_cls", [InMemoryVectorSearcher, HnswVectorSearcher]
+)
+@pytest.mark.parametrize("fraction", [0.02, 0.5])
+def test_filtered_search(vector_index_cls, fraction):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(500, 8)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    searcher = vector_index_cls('my-index', dimensions=8, h=h, index=ids, measure='l2')
+    searcher.delete(['0'])
+
+    within = [i for i in range(h.shape[0]) if rng.random() < fraction and i != 0]
+    q = rng.normal(size=8).astype('float32')
+    expected = np.argsort(np.linalg.norm(h[within] - q, axis=1))[:5]
+
+    # Deleted and unknown ids are ignored
+    within_ids = [ids[i] for i in within] + ['0', 'unknown']
+    res, scores = searcher.find_nearest_from_array(q, n=5, within_ids=within_ids)
+    assert res == [ids[within[i]] for i in expected]
+    assert scores == sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize("generic", [False, True])
+@pytest.mark.parametrize("measure", ['l2', 'dot', 'cosine'])
+def test_find_in_range(monkeypatch, measure, generic):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(500, 8)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    searcher = InMemoryVectorSearcher(
+        'my-index', dimensions=8, h=h, index=ids, measure=measure
+    )
+    if generic:
+        # Search the nearest vectors, doubling from 8 of them
+        monkeypatch.setattr(searcher, '_RANGE_FETCH', 8)
+        monkeypatch.setattr(
+            searcher,
+            'find_in_range_from_arrays',
+            lambda *args, **kwargs: BaseVectorSearcher.find_in_range_from_arrays(
+                searcher, *args, **kwargs
+            ),
+        )
+    queries = rng.normal(size=(3, 8)).astype('float32')
+    if measure == 'l2':
+        exact = -np.linalg.norm(h[None, :, :] - queries[:, None, :], axis=2)
+    elif measure == 'cosine':
+        # Only the queries are normalized
+        exact = queries @ h.T / np.linalg.norm(queries, axis=1)[:, None]
+    else:
+        exact = queries @ h.T
+    # Half way between the 40th and 41st scores of the first query
+    ranked = np.sort(exact[0])[::-1]
+    min_score = float(ranked[39] + ranked[40]) / 2
+
+    results = searcher.find_in_range_from_arrays(queries, min_score)
+    for row, (res, scores) in zip(exact, results):
+        assert set(res) == {ids[i] for i in np.flatnonzero(row >= min_score)}
+        assert scores == sorted(scores, reverse=True)
+        assert all(score >= min_score for score in scores)
+    assert len(results[0][0]) == 40
+
+    res, scores = searcher.find_in_range_from_array(queries[0], min_score, n=5)
+    assert res == searcher.find_nearest_from_array(queries[0], n=5)[0]
+
+    within_ids = ids[::2]
+    res, _ = searcher.find_in_range_from_array(
+        queries[0], min_score, within_ids=within_ids
+    )
+    assert set(res) == set(results[0][0]) & set(within_ids)
+
+    res, _ = searcher.find_in_range_from_id(ids[0], 0.999 if measure != 'l2' else 0)
+    assert ids[0] in res
+    assert searcher.find_in_range_from_array(queries[0], np.inf) == ([], [])
+
+
+def test_score_threshold():
+    assert score_threshold('l2', max_distance=2.0) == -2.0
+    assert score_threshold('cosine', max_distance=0.25) == 0.75
+    assert score_threshold('cosine', min_score=0.9, max_distance=0.25) == 0.9
+    assert score_threshold('dot', min_score=3.0) == 3.0
+    assert score_threshold('dot') is None
+    with pytest.raises(ValueError):
+        score_threshold('dot', max_distance=1.0)
+
+
+def test_sharded_search():
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(300, 8)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    expected = InMemoryVectorSearcher('my-index', dimensions=8, measure='l2')
+    searcher = ShardedVectorSearcher(
+        InMemoryVectorSearcher('my-index', dimensions=8, measure='l2'), connect(2)
+    )
+    for s in (expected, searcher):
+        s.add([VectorItem(id=_id, vector=v) for _id, v in zip(ids, h)])
+        s.delete(ids[:10])
+        s.post_create()
+
+    assert len(searcher) == 290
+    assert all(searcher._call_all('__len__').values())
+
+    queries = rng.normal(size=(5, 8)).astype('float32')
+    for (res, scores), (expected_res, expected_scores) in zip(
+        searcher.find_nearest_from_arrays(queries, n=10),
+        expected.find_nearest_from_arrays(queries, n=10),
+    ):
+        assert res == expected_res
+        assert scores == pytest.approx(expected_scores, rel=1e-5)
+
+    assert searcher.find_nearest_from_id('20', n=3) == expected.find_nearest_from_id(
+        '20', n=3
+    )
+    res, _ = searcher.find_nearest_from_array(h[20], n=5, within_ids=ids[20:23])
+    assert res[0] == '20'
+    assert set(res) == set(ids[20:23])
+    assert searcher.get_vector('20') == pytest.approx(h[20])
+
+    # The partitions are dropped from the shards, which stay connected
+    searcher.drop()
+    with pytest.raises(KeyError):
+        len(searcher)
+
+
+def test_sharded_search_clients_of_remote_shard():
+    import socket
+    import threading
+    import time
+    from multiprocessing.connection import Client
+
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        port = sock.getsockname()[1]
+    threading.Thread(
+        target=serve_remote, args=(f'localhost:{port}', 'secret'), daemon=True
+    ).start()
+
+    def connect_client():
+        for _ in range(50):
+            try:
+                return [Shard(Client(('localhost', port), authkey=b'secret'))]
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+        raise TimeoutError
+
+    def searcher():
+        return ShardedVectorSearcher(
+            InMemoryVectorSearcher('my-index', dimensions=2, measure='l2'),
+            connect_client(),
+        )
+
+    first = searcher()
+    first.add([VectorItem(id=str(i), vector=np.array([i, 0.0])) for i in range(3)])
+    first.post_create()
+
+    # Another client, or the same one reconnecting, has its own partition
+    second = searcher()
+    assert len(second) == 0
+    second.add([VectorItem(id='x', vector=np.array([0.0, 1.0]))])
+    second.post_create()
+    assert len(first) == 3
+    assert first.find_nearest_from_array(np.array([0.0, 1.0]), n=1)[0] == ['0']
+    assert second.find_nearest_from_array(np.array([0.0, 1.0]), n=1)[0] == ['x']
+
+
+def test_lance_index_and_compaction(index_data):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(2000, 16)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    searcher = LanceVectorSearcher(
+        'my-index',
+        dimensions=16,
+        measure='l2',
+        write_batch_size=100,
+        compaction_fragments=4,
+        index_min_rows=1000,
+        num_partitions=8,
+        refine_factor=20,
+    )
+    # Small appends are buffered into fragments of ``write_batch_size``
+    for i in range(0, 2000, 10):
+        searcher.add([VectorItem(id=ids[j], vector=h[j]) for j in range(i, i + 10)])
+    searcher.post_create()
+    dataset = searcher.dataset
+    assert dataset is searcher.dataset
+    assert len(searcher) == 2000
+    assert len(dataset.get_fragments()) <= 5
+    assert dataset.list_indices()
+
+    queries = rng.normal(size=(20, 16)).astype('float32')
+    hits = 0
+    for q in queries:
+        expected = np.argsort(np.linalg.norm(h - q, axis=1))[:10]
+        res, scores = searcher.find_nearest_from_array(q, n=10)
+        assert scores == sorted(scores, reverse=True)
+        hits += len(set(res) & {ids[i] for i in expected})
+    assert hits / 200 > 0.8
+
+    searcher.delete(ids[:1500] + ["it's"])
+    assert len(searcher) == 500
+    res, _ = searcher.find_nearest_from_id('1600', n=5, within_ids=ids[1590:1610])
+    assert res[0] == '1600'
+    assert set(res) <= set(ids[1590:1610])
+
+
+@pytest.mark.parametrize("aggregation", ['max', 'sum'])
+def test_multi_vector_searcher(aggregation):
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(300, 8)).astype('float32')
+    # 100 documents with 1 to 5 chunks each
+    sources = [str(i) for i in rng.integers(0, 100, size=h.shape[0])]
+    searcher = MultiVectorSearcher(
+        InMemoryVectorSearcher('my-index', dimensions=8, measure='dot'), aggregation
+    )
+    searcher.add(
+        [
+            VectorItem(id=f'{s}/{i}', vector=v, source=s)
+            for i, (s, v) in enumerate(zip(sources, h))
+        ]
+    )
+    searcher.post_create()
+
+    q = rng.normal(size=8).astype('float32')
+    totals: dict = {}
+    for s, score in zip(sources, h @ q):
+        if aggregation == 'max':
+            totals[s] = max(totals.get(s, -np.inf), score)
+        else:
+            totals[s] = totals.get(s, 0) + score
+    expected = sorted(totals, key=lambda s: -totals[s])[:10]
+
+    res, scores = searcher.find_nearest_from_array(q, n=10)
+    assert len(set(res)) == 10
+    assert scores == pytest.approx([totals[s] for s in res], rel=1e-4)
+    if aggregation == 'max':
+        assert res == expected
+    else:
+        assert len(set(res) & set(expected)) >= 8
+
+
+@pytest.mark.parametrize("wire_format", ['binary', 'json'])
+def test_fast_vector_searcher_async(monkeypatch, wire_format):
+    from superduperdb.vector_search import interface
+    from superduperdb.vector_search.server import wire
+
+    rng = np.random.default_rng(0)
+    h = rng.normal(size=(100, 8)).astype('float32')
+    ids = [str(i) for i in range(h.shape[0])]
+    local = InMemoryVectorSearcher('my-index', dimensions=8, measure='dot')
+    local.add([VectorItem(id=id, vector=v) for id, v in zip(ids, h)])
+    searcher = interface.FastVectorSearcher(None, local, 'my-index')
+    q = rng.normal(size=(3, 8)).astype('float32')
+
+    async def search():
+        return await asyncio.gather(
+            searcher.afind_nearest_from_id('0', n=5),
+            searcher.afind_nearest_from_array(q[0], n=5),
+            searcher.afind_nearest_from_arrays(q, n=5, within_ids=ids[:50]),
+        )
+
+    expected = [
+        local.find_nearest_from_id('0', n=5),
+        local.find_nearest_from_array(q[0], n=5),
+        local.find_nearest_from_arrays(q, n=5, within_ids=ids[:50]),
+    ]
+    assert asyncio.run(search()) == expected
+
+    # Remote mode: the searches are sent to the server, which is faked here
+    endpoints = []
+
+    async def arequest_server(service, endpoint, args, data=None):
+        endpoints.append(endpoint)
+        n = args['n']
+        if endpoint == 'query/id/search':
+            found, scores = local.find_nearest_from_id(args['id'], n=n)
+            return {'ids': found, 'scores': scores}
+        if endpoint.endswith('binary'):
+            x, meta = wire.decode(data)
+            results = local.find_nearest_from_arrays(
+                x, n=n, within_ids=meta['within_ids']
+            )
+            return wire.encode_results(results)
+        if endpoint == 'query/search':
+            found, scores = local.find_nearest_from_array(data, n=n)
+            return {'ids': found, 'scores': scores}
+        results = local.find_nearest_from_arrays(
+            np.array(data['vectors']), n=n, within_ids=data['within_ids']
+        )
+        return {
+            'ids': [found for found, _ in results],
+            'scores': [scores for _, scores in results],
+        }
+
+    monkeypatch.setattr(interface, 'arequest_server', arequest_server)
+    monkeypatch.setattr(CFG.cluster.vector_search, 'uri', 'http://localhost:8000')
+    monkeypatch.setattr(CFG.cluster.vector_search, 'wire_format', wire_format)
+
+    results = asyncio.run(search())
+    assert [found for found, _ in results[:2]] == [found for found, _ in expected[:2]]
+    assert [found for found, _ in results[2]] == [found for found, _ in expected[2]]
+    assert results[2][0][1] == pytest.approx(expected[2][0][1], rel=1e-5)
+    assert len(endpoints) == 3